@@ -1,20 +1,43 @@
 import cv2
 import numpy as np
-from deepface import DeepFace
-from typing import List, Dict, Any, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import asyncio
+import threading
+import time
 import uuid
 import logging
-import tempfile
-import os
 from ..models.schemas import FaceInfo, FaceRecognitionResult
+from ..utils.image_context import ImageContext
+from ..utils.face_gallery import FaceGallery
+from ..utils.face_pool import FaceWorkerPool
+from ..utils.lbp import lbp_histogram
+from ..utils.face_tiling import plan_tiles, detect_faces_tiled
+from ..utils.anonymize import anonymize_regions, encode_image
+from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class FaceRecognitionAgent:
-    def __init__(self):
+    def __init__(self, gallery: Optional[FaceGallery] = None, pool: Optional[FaceWorkerPool] = None):
         self.logger = logging.getLogger(__name__)
+        self.gallery = gallery
+        # With a pool, detection, encoding and inference run in worker processes
+        self.pool = pool
         
-        # Initialize face detection models
+        # DeepFace pulls in TensorFlow, so it is imported on first use
+        self._deepface = None
+        self._deepface_lock = threading.Lock()
+        self.model_status = {"state": "not_loaded", "error": None, "load_seconds": None}
+        
+        # Face boxes by image digest, so anonymizing an analyzed image skips detection
+        self._detections: "OrderedDict[str, List[Tuple[int, int, int, int]]]" = OrderedDict()
+        self._detections_lock = threading.Lock()
+        
+        # Initialize face detection models; a cv2.dnn.Net keeps its input and
+        # outputs between setInput() and forward(), so threads take turns on it
+        self._detector_lock = threading.Lock()
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         
         # Try to load DNN face detection model (more accurate)
@@ -36,17 +59,99 @@ class FaceRecognitionAgent:
             self.logger.warning("OpenCV face recognition module not available")
             self.use_face_recognizer = False
     
+    def _get_deepface(self):
+        """Import DeepFace (and TensorFlow) on first use"""
+        if self._deepface is not None:
+            return self._deepface
+        with self._deepface_lock:
+            if self._deepface is None:
+                self.model_status.update(state="loading", error=None)
+                start_time = time.time()
+                try:
+                    from deepface import DeepFace
+                except Exception as e:
+                    self.model_status.update(state="failed", error=str(e))
+                    raise
+                self._deepface = DeepFace
+                self.model_status.update(state="imported", load_seconds=time.time() - start_time)
+                self.logger.info(f"Imported DeepFace in {self.model_status['load_seconds']:.2f} seconds")
+        return self._deepface
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """Load the attribute models and run one dummy inference so the first request is fast"""
+        start_time = time.time()
+        if self.pool is not None:
+            self.model_status.update(state="loading", error=None)
+            try:
+                self.model_status.update(self.pool.warm_up())
+            except Exception as e:
+                self.logger.error(f"Face worker warm-up failed: {str(e)}")
+                self.model_status.update(state="failed", error=str(e))
+            self.model_status["load_seconds"] = time.time() - start_time
+            return self.model_status
+        
+        try:
+            DeepFace = self._get_deepface()
+            self.model_status["state"] = "loading"
+            DeepFace.analyze(
+                img_path=np.zeros((224, 224, 3), dtype=np.uint8),
+                actions=['age', 'gender', 'emotion'],
+                enforce_detection=False,
+                detector_backend='skip',
+                silent=True
+            )
+            self.model_status.update(state="ready", error=None, load_seconds=time.time() - start_time)
+            self.logger.info(f"Face models warmed up in {self.model_status['load_seconds']:.2f} seconds")
+        except Exception as e:
+            self.logger.error(f"Face model warm-up failed: {str(e)}")
+            self.model_status.update(state="failed", error=str(e))
+        return self.model_status
+    
+    def detect_faces(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """Detect faces using the best available method"""
+        if self.use_dnn:
+            return self._detect_faces_dnn(image)
+        return self._detect_faces_haar(image)
+    
+    def _remember_detections(self, digest: str, boxes: List[Tuple[int, int, int, int]]):
+        with self._detections_lock:
+            self._detections[digest] = boxes
+            self._detections.move_to_end(digest)
+            while len(self._detections) > settings.FACE_DETECTION_CACHE_SIZE:
+                self._detections.popitem(last=False)
+    
+    def _cached_detections(self, digest: str) -> Optional[List[Tuple[int, int, int, int]]]:
+        with self._detections_lock:
+            boxes = self._detections.get(digest)
+            if boxes is not None:
+                self._detections.move_to_end(digest)
+            return boxes
+    
     def _detect_faces_dnn(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Detect faces using DNN model (more accurate)"""
         h, w = image.shape[:2]
+        if settings.FACE_DETECTION_TILING:
+            # Whole image plus finer tiles on large images, in one batched forward pass
+            start_time = time.time()
+            tiles = plan_tiles(h, w, settings.FACE_TILE_SIZE, settings.FACE_TILE_OVERLAP, settings.FACE_MAX_TILES)
+            with self._detector_lock:
+                faces = detect_faces_tiled(
+                    self.net, image, tiles,
+                    confidence=settings.FACE_DETECTION_CONFIDENCE,
+                    nms_threshold=settings.FACE_NMS_THRESHOLD
+                )
+            self.logger.info(f"Detected {len(faces)} faces over {len(tiles)} tiles in {time.time() - start_time:.3f} seconds")
+            return faces
+        
         blob = cv2.dnn.blobFromImage(image, 1.0, (300, 300), [104, 117, 123])
-        self.net.setInput(blob)
-        detections = self.net.forward()
+        with self._detector_lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
         
         faces = []
         for i in range(detections.shape[2]):
             confidence = detections[0, 0, i, 2]
-            if confidence > 0.5:  # Confidence threshold
+            if confidence > settings.FACE_DETECTION_CONFIDENCE:  # Confidence threshold
                 x1 = int(detections[0, 0, i, 3] * w)
                 y1 = int(detections[0, 0, i, 4] * h)
                 x2 = int(detections[0, 0, i, 5] * w)
@@ -60,12 +165,13 @@ class FaceRecognitionAgent:
     def _detect_faces_haar(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Detect faces using Haar cascades"""
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.1, 
-            minNeighbors=5, 
-            minSize=(30, 30)
-        )
+        with self._detector_lock:
+            faces = self.face_cascade.detectMultiScale(
+                gray, 
+                scaleFactor=1.1, 
+                minNeighbors=5, 
+                minSize=(30, 30)
+            )
         
         # Convert from (x, y, w, h) to (top, right, bottom, left) format
         face_locations = []
@@ -103,32 +209,8 @@ class FaceRecognitionAgent:
         try:
             face_resized = cv2.resize(face_gray, (64, 64))
             
-            # Calculate LBP
-            radius = 1
-            n_points = 8 * radius
-            lbp = np.zeros_like(face_resized)
-            
-            for i in range(radius, face_resized.shape[0] - radius):
-                for j in range(radius, face_resized.shape[1] - radius):
-                    center = face_resized[i, j]
-                    binary_string = []
-                    
-                    for k in range(n_points):
-                        angle = 2 * np.pi * k / n_points
-                        x = int(i + radius * np.cos(angle))
-                        y = int(j + radius * np.sin(angle))
-                        
-                        if 0 <= x < face_resized.shape[0] and 0 <= y < face_resized.shape[1]:
-                            binary_string.append(1 if face_resized[x, y] > center else 0)
-                        else:
-                            binary_string.append(0)
-                    
-                    # Convert binary to decimal
-                    lbp[i, j] = sum([binary_string[k] * (2 ** k) for k in range(len(binary_string))])
-            
-            # Calculate histogram
-            hist, _ = np.histogram(lbp.ravel(), bins=256, range=(0, 256))
-            return hist.astype(np.float32)
+            # Uniform LBP histograms over a 4x4 grid keep the spatial layout of the face
+            return lbp_histogram(face_resized, radius=1, points=8, uniform=True, grid=(4, 4))
             
         except Exception as e:
             self.logger.warning(f"LBP feature extraction failed: {e}")
@@ -155,28 +237,61 @@ class FaceRecognitionAgent:
         confidence = min(0.9, max(0.3, normalized_area * 10))
         return confidence
     
-    async def analyze_faces(self, image_path: str) -> Dict[str, Any]:
+    async def analyze_faces(self, image_context: ImageContext, consent_id: Optional[str] = None,
+                            consent_expires_at: Optional[datetime] = None) -> Dict[str, Any]:
         """
         Comprehensive face analysis with consent verification
+        
+        The CPU-bound work runs in the worker pool, or on a thread without one,
+        so the event loop stays free. Faces are matched against the gallery,
+        and stored in it when the analysis is covered by a known consent
+        (consent_id and its expiry).
         """
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image from {image_path}")
-            
-            # Detect faces using the best available method
-            if self.use_dnn:
-                face_locations = self._detect_faces_dnn(image)
+            # Decoded once per request and shared with the other agents
+            image = await asyncio.to_thread(lambda: image_context.array)
+            if self.pool is not None:
+                analysis = await self.pool.analyze(image)
             else:
-                face_locations = self._detect_faces_haar(image)
+                analysis = await asyncio.to_thread(self.analyze_faces_sync, image)
+            
+            faces_detected = [FaceInfo(**face) for face in analysis["faces_detected"]]
+            processing_notes = analysis["processing_notes"]
+            self._remember_detections(image_context.digest, [
+                (box["top"], box["right"], box["bottom"], box["left"])
+                for box in (face.bounding_box for face in faces_detected)
+            ])
+            await asyncio.to_thread(
+                self._match_gallery, image_context, faces_detected, consent_id, consent_expires_at, processing_notes
+            )
+            
+            return to_python_type({
+                "total_faces": len(faces_detected),
+                "faces_detected": [face.dict() for face in faces_detected],
+                "consent_verified": True,
+                "processing_notes": processing_notes
+            })
+            
+        except Exception as e:
+            self.logger.error(f"Face analysis failed: {str(e)}")
+            return {
+                "total_faces": 0,
+                "faces_detected": [],
+                "consent_verified": False,
+                "processing_notes": [f"Analysis failed: {str(e)}"]
+            }
+    
+    def analyze_faces_sync(self, image: np.ndarray) -> Dict[str, Any]:
+        """Detect faces and compute encodings and attributes for a BGR image (blocking)"""
+        try:
+            face_locations = self.detect_faces(image)
             
             faces_detected = []
             processing_notes = []
             
-            for i, face_location in enumerate(face_locations):
-                face_id = str(uuid.uuid4())
-                
+            # Crop every face first so attributes come from one batched pass
+            face_crops = []
+            for face_location in face_locations:
                 # Extract face region for detailed analysis
                 top, right, bottom, left = face_location
                 
@@ -190,24 +305,20 @@ class FaceRecognitionAgent:
                 
                 if face_image.size == 0:
                     continue
-                
-                # Save face region temporarily for DeepFace analysis
-                with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_face:
-                    cv2.imwrite(temp_face.name, face_image)
-                    temp_face_path = temp_face.name
-                
+                face_crops.append((str(uuid.uuid4()), (top, right, bottom, left), face_image))
+            
+            # Age, gender and emotion for all faces from in-memory crops
+            face_attributes = self._analyze_attributes([face_image for _, _, face_image in face_crops])
+            
+            for (face_id, (top, right, bottom, left), face_image), attributes in zip(face_crops, face_attributes):
                 try:
                     # Generate face encoding
                     face_encoding = self._generate_face_encoding(face_image)
                     
                     # Calculate confidence
-                    confidence = self._calculate_face_confidence(face_location, image.shape)
+                    confidence = self._calculate_face_confidence((top, right, bottom, left), image.shape)
                     
-                    # Demographic analysis using DeepFace
-                    demographic_info = self._analyze_demographics(temp_face_path)
-                    
-                    # Emotion analysis
-                    emotion_info = self._analyze_emotions(temp_face_path)
+                    demographic_info = attributes["demographics"]
                     
                     # Create face info object
                     face_info = FaceInfo(
@@ -219,7 +330,7 @@ class FaceRecognitionAgent:
                         confidence=float(confidence),
                         age_estimate=demographic_info.get('age'),
                         gender_estimate=demographic_info.get('gender'),
-                        emotion_analysis=emotion_info,
+                        emotion_analysis=attributes["emotions"],
                         face_encoding=face_encoding.tolist(),
                         similar_faces_found=[]
                     )
@@ -252,102 +363,130 @@ class FaceRecognitionAgent:
                             face_encoding=[]
                         )
                         faces_detected.append(minimal_face_info)
-                
-                finally:
-                    # Clean up temporary face file
-                    if os.path.exists(temp_face_path):
-                        os.unlink(temp_face_path)
             
             return to_python_type({
-                "total_faces": len(faces_detected),
                 "faces_detected": [face.dict() for face in faces_detected],
-                "consent_verified": True,
                 "processing_notes": processing_notes
             })
             
         except Exception as e:
-            self.logger.error(f"Face analysis failed: {str(e)}")
-            return {
-                "total_faces": 0,
-                "faces_detected": [],
-                "consent_verified": False,
-                "processing_notes": [f"Analysis failed: {str(e)}"]
-            }
+            self.logger.error(f"Face detection failed: {str(e)}")
+            raise
     
-    def _analyze_demographics(self, face_image_path: str) -> Dict[str, Any]:
-        """Analyze age and gender using DeepFace"""
+    def _match_gallery(self, image_context: ImageContext, faces: List[FaceInfo], consent_id: Optional[str],
+                       consent_expires_at: Optional[datetime], processing_notes: List[str]):
+        """Fill similar_faces_found from the gallery, then enroll consented faces"""
+        if self.gallery is None:
+            return
+        faces = [face for face in faces if face.face_encoding]
+        if not faces:
+            return
+        
         try:
-            result = DeepFace.analyze(
-                img_path=face_image_path,
-                actions=['age', 'gender'],
-                enforce_detection=False
-            )
+            # Faces are grouped by encoding length, since fallback encodings differ in size
+            groups: Dict[int, List[FaceInfo]] = {}
+            for face in faces:
+                groups.setdefault(len(face.face_encoding), []).append(face)
             
-            if isinstance(result, list):
-                result = result[0]
+            for group in groups.values():
+                encodings = [face.face_encoding for face in group]
+                matches = self.gallery.search(
+                    encodings, top_k=settings.FACE_MATCH_TOP_K, threshold=settings.FACE_MATCH_THRESHOLD
+                )
+                for face, face_matches in zip(group, matches):
+                    face.similar_faces_found = [face_id for face_id, _ in face_matches]
+                
+                if consent_id and consent_expires_at:
+                    self.gallery.add(
+                        encodings,
+                        [face.face_id for face in group],
+                        expires_at=consent_expires_at.timestamp(),
+                        consent_id=consent_id,
+                        image_digest=image_context.digest
+                    )
             
-            return {
-                "age": {
-                    "estimated_age": result.get('age', 'unknown'),
-                    "confidence": 0.8
-                },
-                "gender": {
-                    "predicted_gender": result.get('dominant_gender', 'unknown'),
-                    "confidence": result.get('gender', {}).get(result.get('dominant_gender', ''), 0.5)
-                }
-            }
+            if not (consent_id and consent_expires_at):
+                processing_notes.append("Faces not stored in the gallery: no active consent record")
         except Exception as e:
-            self.logger.warning(f"Demographic analysis failed: {str(e)}")
-            return {"age": None, "gender": None}
+            self.logger.error(f"Face gallery matching failed: {str(e)}")
+            processing_notes.append(f"Face gallery matching failed: {str(e)}")
     
-    def _analyze_emotions(self, face_image_path: str) -> Dict[str, float]:
-        """Analyze emotions using DeepFace"""
+    def _analyze_attributes(self, face_images: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """Age, gender and emotion for every face crop in a single DeepFace pass"""
+        empty = [{"demographics": {"age": None, "gender": None}, "emotions": {}} for _ in face_images]
+        if not face_images:
+            return empty
+        
         try:
-            result = DeepFace.analyze(
-                img_path=face_image_path,
-                actions=['emotion'],
-                enforce_detection=False
+            DeepFace = self._get_deepface()
+            # Crops are already faces, so DeepFace skips its own detection
+            results = DeepFace.analyze(
+                img_path=face_images,
+                actions=['age', 'gender', 'emotion'],
+                enforce_detection=False,
+                detector_backend='skip',
+                silent=True
             )
-            
-            if isinstance(result, list):
-                result = result[0]
-            
-            return result.get('emotion', {})
         except Exception as e:
-            self.logger.warning(f"Emotion analysis failed: {str(e)}")
-            return {}
+            self.logger.warning(f"Face attribute analysis failed: {str(e)}")
+            return empty
+        
+        if len(results) != len(face_images):
+            self.logger.warning(f"Face attribute analysis returned {len(results)} results for {len(face_images)} faces")
+            return empty
+        
+        attributes = []
+        for result in results:
+            # Batched input yields one list of faces per crop
+            if isinstance(result, list):
+                result = result[0] if result else {}
+            attributes.append({
+                "demographics": self._parse_demographics(result),
+                "emotions": result.get('emotion', {})
+            })
+        return attributes
     
-    def anonymize_faces(self, image_path: str, output_path: str) -> bool:
-        """Blur or mask faces in the image for privacy protection"""
-        try:
-            image = cv2.imread(image_path)
-            if image is None:
-                return False
-            
-            # Detect faces
-            if self.use_dnn:
-                face_locations = self._detect_faces_dnn(image)
-            else:
-                face_locations = self._detect_faces_haar(image)
-            
-            for (top, right, bottom, left) in face_locations:
-                # Ensure coordinates are within bounds
-                top = max(0, top)
-                left = max(0, left)
-                bottom = min(image.shape[0], bottom)
-                right = min(image.shape[1], right)
-                
-                if bottom > top and right > left:
-                    face_region = image[top:bottom, left:right]
-                    blurred_face = cv2.GaussianBlur(face_region, (99, 99), 30)
-                    image[top:bottom, left:right] = blurred_face
-            
-            cv2.imwrite(output_path, image)
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Face anonymization failed: {str(e)}")
-            return False
+    def _parse_demographics(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Age and gender estimates from a DeepFace analysis result"""
+        if not result:
+            return {"age": None, "gender": None}
+        return {
+            "age": {
+                "estimated_age": result.get('age', 'unknown'),
+                "confidence": 0.8
+            },
+            "gender": {
+                "predicted_gender": result.get('dominant_gender', 'unknown'),
+                "confidence": result.get('gender', {}).get(result.get('dominant_gender', ''), 0.5)
+            }
+        }
+    
+    async def anonymize_faces(self, image_context: ImageContext, mode: str = "blur",
+                              output_format: str = "jpeg") -> Tuple[bytes, Dict[str, Any]]:
+        """Blur or pixelate faces for privacy protection; returns the encoded image and details
+        
+        Reuses the boxes from an earlier analyze_faces of the same image when
+        they are still cached, and only runs detection otherwise. Everything
+        happens in memory, off the event loop.
+        """
+        image = await asyncio.to_thread(lambda: image_context.array)
+        boxes = self._cached_detections(image_context.digest)
+        detection_source = "cached"
+        if boxes is None:
+            boxes = await asyncio.to_thread(self.detect_faces, image)
+            detection_source = "detected"
+            self._remember_detections(image_context.digest, boxes)
+        
+        def render() -> Tuple[bytes, str]:
+            # The decoded array is shared with other agents, so draw on a copy
+            return encode_image(anonymize_regions(image.copy(), boxes, mode), output_format)
+        
+        encoded, media_type = await asyncio.to_thread(render)
+        return encoded, {
+            "faces_anonymized": len(boxes),
+            "detection_source": detection_source,
+            "media_type": media_type
+        }
     
     def compare_faces(self, encoding1: List[float], encoding2: List[float], 
                      threshold: float = 0.6) -> bool:
@@ -1,29 +1,51 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema.messages import HumanMessage
-import base64
+import asyncio
 import json
 import logging
+from typing import Optional
+from ..utils.llm_cache import LLMResponseCache
+from ..utils.image_utils import LLMImagePayload
+from ..utils.image_context import ImageContext
 
 logger = logging.getLogger(__name__)
 
 class GeolocatorAgent:
-    def __init__(self, llm: ChatGoogleGenerativeAI):
+    # Bump whenever the prompt changes so memoized responses are not reused
+    PROMPT_VERSION = "1"
+    
+    def __init__(self, llm: ChatGoogleGenerativeAI, cache: Optional[LLMResponseCache] = None):
         self.llm = llm
+        self.cache = cache
     
-    async def locate(self, image_path: str, metadata: dict, image_analysis: dict) -> dict:
-        """Attempt to geolocate the image using various techniques"""
+    async def locate(self, image: ImageContext, metadata: dict, image_analysis: dict,
+                     visual_geolocation: Optional[dict] = None,
+                     payload: Optional[LLMImagePayload] = None) -> dict:
+        """Attempt to geolocate the image using various techniques
+        
+        visual_geolocation is the raw geolocation section of a combined vision
+        call; when present it is used instead of a separate LLM request.
+        """
         location_info = {}
         
         # First, check if GPS coordinates are available in metadata
-        if 'gps_coordinates' in metadata and metadata['gps_coordinates']:
+        if not self.needs_visual_geolocation(metadata):
             location_info = await self._process_gps_coordinates(metadata['gps_coordinates'])
         
         # If no GPS data, try visual geolocation using LLM
         if not location_info.get('latitude'):
-            location_info = await self._visual_geolocation(image_path, image_analysis)
+            if visual_geolocation:
+                location_info = self._build_geolocation_result(visual_geolocation)
+            if not location_info:
+                location_info = await self._visual_geolocation(image, image_analysis, payload)
         
         return location_info
     
+    def needs_visual_geolocation(self, metadata: dict) -> bool:
+        """Whether the metadata lacks the GPS coordinates needed to skip visual geolocation"""
+        gps_coords = metadata.get('gps_coordinates')
+        return not (gps_coords and 'latitude' in gps_coords and 'longitude' in gps_coords)
+    
     async def _process_gps_coordinates(self, gps_coords: dict) -> dict:
         """Process GPS coordinates from metadata"""
         try:
@@ -48,12 +70,21 @@ class GeolocatorAgent:
         
         return {}
     
-    async def _visual_geolocation(self, image_path: str, image_analysis: dict) -> dict:
+    async def _visual_geolocation(self, image: ImageContext, image_analysis: dict,
+                                  payload: Optional[LLMImagePayload] = None) -> dict:
         """Use AI to identify location from visual cues"""
         try:
-            # Encode image to base64
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode()
+            if payload is None:
+                payload = await asyncio.to_thread(image.llm_payload)
+            
+            # Keyed on the image alone, so toggling other pipeline options reuses it
+            cache_key = LLMResponseCache.make_key(
+                "geolocator", self.llm.model, self.PROMPT_VERSION, payload.cache_digest
+            )
+            if self.cache:
+                cached_location = self.cache.get(cache_key)
+                if cached_location is not None:
+                    return cached_location
             
             prompt = """Analyze this image for geolocation clues. Look for:
 
@@ -86,11 +117,14 @@ Note: Only provide latitude/longitude if you can identify a specific landmark or
             response = await self.llm.ainvoke([
                 HumanMessage(content=[
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
+                    {"type": "image_url", "image_url": {"url": payload.data_url}}
                 ])
             ])
             
-            return self._parse_geolocation_response(response.content)
+            location = self._parse_geolocation_response(response.content)
+            if self.cache and location:
+                self.cache.put(cache_key, location)
+            return location
             
         except Exception as e:
             logger.error(f"Visual geolocation failed: {str(e)}")
@@ -136,7 +170,18 @@ Note: Only provide latitude/longitude if you can identify a specific landmark or
                 json_str = response
             
             parsed_data = json.loads(json_str)
+            return self._build_geolocation_result(parsed_data)
             
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse geolocation response as JSON: {str(e)}")
+            return {}
+        except Exception as e:
+            logger.error(f"Error parsing geolocation response: {str(e)}")
+            return {}
+    
+    def _build_geolocation_result(self, parsed_data: dict) -> dict:
+        """Build the geolocation result from parsed visual analysis"""
+        try:
             # Build response ensuring proper coordinate handling
             result = {
                 'address': parsed_data.get('estimated_location', 'Unknown'),
@@ -155,9 +200,6 @@ Note: Only provide latitude/longitude if you can identify a specific landmark or
             
             return result
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse geolocation response as JSON: {str(e)}")
-            return {}
         except Exception as e:
-            logger.error(f"Error parsing geolocation response: {str(e)}")
+            logger.error(f"Error building geolocation result: {str(e)}")
             return {}
\ No newline at end of file
@@ -1,22 +1,42 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema.messages import HumanMessage
-import base64
+import asyncio
 from PIL import Image
 import json
 import logging
+from typing import Optional
+from ..utils.llm_cache import LLMResponseCache
+from ..utils.image_utils import LLMImagePayload
+from ..utils.image_context import ImageContext
 
 logger = logging.getLogger(__name__)
 
 class ImageAnalyzerAgent:
-    def __init__(self, llm: ChatGoogleGenerativeAI):
+    # Bump whenever a prompt changes so memoized responses are not reused
+    PROMPT_VERSION = "1"
+    COMBINED_PROMPT_VERSION = "1"
+    
+    def __init__(self, llm: ChatGoogleGenerativeAI, cache: Optional[LLMResponseCache] = None):
         self.llm = llm
+        self.cache = cache
     
-    async def analyze(self, image_path: str) -> dict:
-        """Analyze image using Gemini vision model"""
+    async def analyze(self, image: ImageContext, payload: Optional[LLMImagePayload] = None) -> dict:
+        """Analyze image using Gemini vision model
+        
+        payload is the request's shared, pre-encoded image; the context's
+        default payload is used when not provided.
+        """
         try:
-            # Encode image to base64
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode()
+            if payload is None:
+                payload = await asyncio.to_thread(image.llm_payload)
+            
+            cache_key = LLMResponseCache.make_key(
+                "image_analyzer", self.llm.model, self.PROMPT_VERSION, payload.cache_digest
+            )
+            if self.cache:
+                cached_analysis = self.cache.get(cache_key)
+                if cached_analysis is not None:
+                    return cached_analysis
             
             # Create vision prompt for Gemini
             prompt = """Analyze this image for OSINT purposes. Provide detailed information about:
@@ -48,15 +68,113 @@ Return the analysis as a JSON object with the following structure:
             response = await self.llm.ainvoke([
                 HumanMessage(content=[
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
+                    {"type": "image_url", "image_url": {"url": payload.data_url}}
                 ])
             ])
             
-            return self._parse_analysis_response(response.content)
+            analysis = self._parse_analysis_response(response.content)
+            # Only memoize responses that parsed as JSON
+            if self.cache and "raw_response" not in analysis:
+                self.cache.put(cache_key, analysis)
+            return analysis
         except Exception as e:
             logger.error(f"Image analysis failed: {str(e)}")
             return {"error": f"Analysis failed: {str(e)}"}
     
+    async def analyze_with_geolocation(self, image: ImageContext,
+                                       payload: Optional[LLMImagePayload] = None) -> dict:
+        """Analyze content and visual geolocation clues in a single vision call
+        
+        Returns {"analysis": ..., "geolocation": ...} with the geolocation part
+        in the raw schema that GeolocatorAgent expects, or an empty dict when the
+        combined response could not be used so callers can fall back.
+        """
+        try:
+            if payload is None:
+                payload = await asyncio.to_thread(image.llm_payload)
+            
+            cache_key = LLMResponseCache.make_key(
+                "image_analyzer_combined", self.llm.model, self.COMBINED_PROMPT_VERSION,
+                payload.cache_digest
+            )
+            if self.cache:
+                cached_result = self.cache.get(cache_key)
+                if cached_result is not None:
+                    return cached_result
+            
+            prompt = """Analyze this image for OSINT purposes and for geolocation clues.
+
+For the content analysis, provide information about:
+1. Objects and items detected in the image
+2. People present (count only, no identification)
+3. Text visible in the image (signs, documents, etc.)
+4. Scene description and context
+5. Notable features for identification purposes
+6. Image quality assessment
+7. Time/season indicators if visible
+8. Any suspicious or notable elements
+
+For the geolocation, look at architectural styles, street signs, license plates,
+text languages, landscape features, cultural and climate indicators and any
+recognizable landmarks to estimate the most likely country/region and city.
+
+Return a single JSON object with the following structure:
+{
+    "analysis": {
+        "objects_detected": ["list of objects"],
+        "people_count": number,
+        "text_extracted": ["list of visible text"],
+        "scene_description": "detailed description",
+        "location_indicators": ["list of location clues"],
+        "time_indicators": ["list of time/date clues"],
+        "image_quality": "assessment",
+        "notable_features": ["list of distinctive elements"],
+        "potential_risks": ["list of privacy/security concerns"]
+    },
+    "geolocation": {
+        "estimated_location": "Country/Region, City if identifiable",
+        "latitude": null or estimated_latitude_as_number,
+        "longitude": null or estimated_longitude_as_number,
+        "confidence": 0.0-1.0,
+        "indicators": ["list of visual clues"],
+        "landmarks": ["any recognizable landmarks"]
+    }
+}
+
+Note: Only provide latitude/longitude if you can identify a specific landmark or location with reasonable confidence. Otherwise, leave as null."""
+            
+            response = await self.llm.ainvoke([
+                HumanMessage(content=[
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": payload.data_url}}
+                ])
+            ])
+            
+            result = self._parse_combined_response(response.content)
+            if self.cache and result:
+                self.cache.put(cache_key, result)
+            return result
+        except Exception as e:
+            logger.error(f"Combined image analysis failed: {str(e)}")
+            return {}
+    
+    def _parse_combined_response(self, response: str) -> dict:
+        """Parse the combined response, returning {} unless both sections are present"""
+        try:
+            if "```json" in response:
+                json_str = response.split("```json")[1].split("```")[0].strip()
+            else:
+                json_str = response
+            
+            parsed_data = json.loads(json_str)
+            if isinstance(parsed_data.get("analysis"), dict) and isinstance(parsed_data.get("geolocation"), dict):
+                return {"analysis": parsed_data["analysis"], "geolocation": parsed_data["geolocation"]}
+        except (json.JSONDecodeError, AttributeError):
+            pass
+        
+        logger.warning("Combined vision response was incomplete, falling back to separate calls")
+        return {}
+    
     def _parse_analysis_response(self, response: str) -> dict:
         """Parse the Gemini response into structured format"""
         try:
@@ -1,32 +1,49 @@
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
-import exifread
+from PIL.ExifTags import GPSTAGS
 from datetime import datetime
+import exifread
 import logging
+from ..utils.image_context import ImageContext
+from ..utils.image_metadata import icc_profile_description
+from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class MetadataExtractorAgent:
-    async def extract(self, image_path: str) -> dict:
+    async def extract(self, image: ImageContext) -> dict:
         """Extract EXIF and other metadata from image"""
         metadata = {}
         
         try:
+            # One pass over the header segments; no pixel data is read
+            header = image.metadata
+            
             # Extract EXIF data
-            with open(image_path, 'rb') as f:
-                tags = exifread.process_file(f)
-                metadata['exif'] = self._process_exif_tags(tags)
+            metadata['exif'] = self._process_exif_tags(
+                {**header.exif, **{f"GPS {tag}": value for tag, value in header.gps.items()}}
+            )
             
             # Extract basic image info
-            with Image.open(image_path) as img:
-                metadata['image_size'] = {'width': img.width, 'height': img.height}
-                metadata['format'] = img.format
-                metadata['mode'] = img.mode
-                
-                # Extract additional EXIF data using PIL
-                exif_dict = img._getexif()
-                if exif_dict:
-                    metadata.update(self._process_pil_exif(exif_dict))
+            if header.width and header.height:
+                metadata['image_size'] = {'width': header.width, 'height': header.height}
+            metadata['format'] = header.format
+            metadata['mode'] = header.mode
+            
+            metadata.update(self._process_header_exif(header.exif, header.gps))
+            
+            # XMP, IPTC, ICC profile and the embedded thumbnail from the same pass
+            if header.xmp:
+                metadata['xmp'] = header.xmp
+            if header.iptc:
+                metadata['iptc'] = header.iptc
+            if header.icc_profile:
+                metadata['icc_profile'] = icc_profile_description(header.icc_profile) or "embedded"
+            if header.thumbnail:
+                # Where the JPEG thumbnail sits in the file, not its bytes, so the metadata stays JSON-safe
+                metadata['thumbnail'] = {'size_bytes': len(header.thumbnail), 'offset': header.thumbnail_offset}
+            
+            # MakerNotes are vendor-specific and slow to decode, so only on request
+            if settings.METADATA_MAKER_NOTES:
+                metadata['maker_note'] = self._process_maker_note(image)
         
         except Exception as e:
             logger.error(f"Metadata extraction failed: {str(e)}")
@@ -42,34 +59,47 @@ class MetadataExtractorAgent:
             tag_str = str(tag)
             if 'GPS' in tag_str:
                 processed[tag_str] = self._process_gps_data(tag_str, value)
+            elif isinstance(value, bytes) and len(value) > 64:
+                # Opaque blobs (e.g. PrintIM) are only summarized
+                processed[tag_str] = f"<{len(value)} bytes>"
             else:
                 processed[tag_str] = str(value)
         
         return processed
     
-    def _process_pil_exif(self, exif_dict: dict) -> dict:
-        """Process PIL EXIF data"""
+    def _process_header_exif(self, exif: dict, gps: dict) -> dict:
+        """Pick the camera, date and location fields out of named EXIF tags"""
         processed = {}
         
-        for tag_id, value in exif_dict.items():
-            tag = TAGS.get(tag_id, tag_id)
-            
-            if tag == 'Make':
-                processed['camera_make'] = str(value)
-            elif tag == 'Model':
-                processed['camera_model'] = str(value)
-            elif tag == 'DateTime':
-                try:
-                    processed['date_taken'] = datetime.strptime(str(value), '%Y:%m:%d %H:%M:%S')
-                except:
-                    processed['date_taken'] = str(value)
-            elif tag == 'Software':
-                processed['software'] = str(value)
-            elif tag == 'GPSInfo':
-                processed['gps_coordinates'] = self._process_gps_info(value)
+        if 'Image Make' in exif:
+            processed['camera_make'] = str(exif['Image Make'])
+        if 'Image Model' in exif:
+            processed['camera_model'] = str(exif['Image Model'])
+        if 'Image Software' in exif:
+            processed['software'] = str(exif['Image Software'])
+        
+        # Capture time when present, otherwise the file's last modification
+        date_value = exif.get('EXIF DateTimeOriginal') or exif.get('Image DateTime')
+        if date_value:
+            try:
+                processed['date_taken'] = datetime.strptime(str(date_value), '%Y:%m:%d %H:%M:%S')
+            except:
+                processed['date_taken'] = str(date_value)
+        
+        if gps:
+            processed['gps_coordinates'] = self._process_gps_info(gps)
         
         return processed
     
+    def _process_maker_note(self, image: ImageContext) -> dict:
+        """Decode vendor MakerNote tags with exifread (a second, full parse)"""
+        try:
+            tags = exifread.process_file(image.stream(), details=True)
+            return {str(tag): str(value) for tag, value in tags.items() if str(tag).startswith('MakerNote')}
+        except Exception as e:
+            logger.error(f"MakerNote parsing failed: {str(e)}")
+            return {}
+    
     def _process_gps_data(self, tag: str, value) -> str:
         """Process GPS coordinate data"""
         try:
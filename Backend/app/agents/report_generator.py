@@ -2,12 +2,19 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema.messages import HumanMessage
 import json
 import logging
+import xxhash
+from typing import Optional
+from ..utils.llm_cache import LLMResponseCache
 
 logger = logging.getLogger(__name__)
 
 class ReportGeneratorAgent:
-    def __init__(self, llm: ChatGoogleGenerativeAI):
+    # Bump whenever the prompt changes so memoized reports are not reused
+    PROMPT_VERSION = "1"
+    
+    def __init__(self, llm: ChatGoogleGenerativeAI, cache: Optional[LLMResponseCache] = None):
         self.llm = llm
+        self.cache = cache
     
     async def generate(self, state: dict) -> str:
         """Generate comprehensive OSINT report"""
@@ -15,6 +22,16 @@ class ReportGeneratorAgent:
             # Prepare data summary for the LLM
             analysis_summary = self._prepare_analysis_summary(state)
             
+            # Identical summaries produce the same report
+            cache_key = LLMResponseCache.make_key(
+                "report_generator", self.llm.model, self.PROMPT_VERSION,
+                xxhash.xxh3_128_hexdigest(analysis_summary.encode())
+            )
+            if self.cache:
+                cached_report = self.cache.get(cache_key)
+                if cached_report is not None:
+                    return cached_report
+            
             prompt = f"""Generate a comprehensive OSINT analysis report based on the following data:
 
 {analysis_summary}
@@ -38,6 +55,8 @@ Include confidence levels for various findings and note any limitations in the a
 """
             
             response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            if self.cache and response.content:
+                self.cache.put(cache_key, response.content)
             return response.content
             
         except Exception as e:
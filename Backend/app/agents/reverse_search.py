@@ -1,73 +1,139 @@
-import requests
+import asyncio
 import logging
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import httpx
 from ..models.schemas import ReverseSearchResult
-import http.client
-import json
 from ..config.settings import settings
+from ..utils.image_context import ImageContext
+from ..utils.http_client import HTTPClient
+from .search_engines import SearchEngine, create_engines
 
 
 logger = logging.getLogger(__name__)
 
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "ref", "ref_src", "igshid", "si"}
+
+# Weight of a single top-ranked hit; hits from several engines combine towards 1.0
+ENGINE_HIT_WEIGHT = 0.8
+
 class ReverseSearchAgent:
-    def __init__(self):
-        self.search_engines = ['google']
+    def __init__(self, http_client: Optional[HTTPClient] = None,
+                 engines: Optional[List[SearchEngine]] = None):
+        self.http_client = http_client or HTTPClient()
+        if engines is None:
+            engines = create_engines(settings.REVERSE_SEARCH_ENGINES, self.http_client)
+        self.search_engines = engines
     
-    async def search(self, image_path: str) -> List[Dict]:
+    async def search(self, image: ImageContext) -> List[Dict]:
         """Perform reverse image search using multiple engines"""
-        results = []
+        results, _ = await self.search_with_stats(image)
+        return results
+    
+    async def search_with_stats(self, image: ImageContext) -> Tuple[List[Dict], Dict]:
+        """Query every engine concurrently and merge their hits
         
-        try:
-            # Google Images reverse search
-            google_results = await self._search_google_images(image_path)
-            results.extend(google_results)
+        Each engine gets its own deadline; engines that miss it are dropped
+        and listed in the returned stats along with per-engine latency.
+        """
+        outcomes = await asyncio.gather(*(self._run_engine(engine, image) for engine in self.search_engines))
         
-            
-        except Exception as e:
-            logger.error(f"Reverse search failed: {str(e)}")
+        stats = {"engines": {}, "late_engines": [], "failed_engines": []}
+        ranked_hits = {}
+        for engine, (status, hits, latency) in zip(self.search_engines, outcomes):
+            stats["engines"][engine.name] = {
+                "status": status,
+                "latency_ms": round(latency * 1000, 1),
+                "results": len(hits)
+            }
+            if status == "timeout":
+                stats["late_engines"].append(engine.name)
+            elif status == "error":
+                stats["failed_engines"].append(engine.name)
+            ranked_hits[engine.name] = hits
         
-        return results
+        results = self._merge_results(ranked_hits)
+        logger.info(
+            f"Reverse search merged {sum(len(hits) for hits in ranked_hits.values())} hits "
+            f"into {len(results)} results from {len(self.search_engines)} engines"
+        )
+        return results, stats
     
-    async def _search_google_images(self, image_path: str) -> List[Dict]:
-        """Search Google Images (placeholder implementation)"""
-        #IMAGE path to URL conversion 
-        #upload to imgbb
-        def upload_image(image_path):
-            with open(image_path, "rb") as file:
-                url = "https://api.imgbb.com/1/upload"
-                payload = {
-                    "key": settings.IMG_BB_API_KEY,
-                }
-                response = requests.post(url, payload, files={"image": file})
-                return response.json()
-        image_url = upload_image(image_path)
-
-        
-        conn = http.client.HTTPSConnection("google.serper.dev")
-        payload = json.dumps({
-            "url": image_url["data"]["url"]
-        })
-        headers = {
-            'X-API-KEY': settings.SERPER_API_KEY,
-            'Content-Type': 'application/json'
-        }
-        conn.request("POST", "/lens", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
+    async def _run_engine(self, engine: SearchEngine, image: ImageContext) -> Tuple[str, List[Dict], float]:
+        start_time = time.perf_counter()
+        timeout = settings.REVERSE_SEARCH_ENGINE_TIMEOUT_SECONDS
         try:
-            json_data = json.loads(data)
-        except json.JSONDecodeError:
-            return []
-
-        # Extract results from the "organic" key
+            hits = await asyncio.wait_for(engine.search(image), timeout=timeout)
+            return "ok", hits, time.perf_counter() - start_time
+        except asyncio.TimeoutError:
+            logger.warning(f"Reverse search engine {engine.name} missed its {timeout}s deadline")
+            return "timeout", [], time.perf_counter() - start_time
+        except Exception as e:
+            logger.error(f"Reverse search engine {engine.name} failed: {self._describe_error(e)}")
+            return "error", [], time.perf_counter() - start_time
+    
+    @staticmethod
+    def _describe_error(error: Exception) -> str:
+        """Error summary safe to log: httpx messages carry the full URL, API key parameters included"""
+        if isinstance(error, httpx.HTTPStatusError):
+            return f"HTTP {error.response.status_code} from {error.request.url.host}"
+        if isinstance(error, httpx.RequestError):
+            try:
+                return f"{type(error).__name__} from {error.request.url.host}"
+            except RuntimeError:
+                # Raised before the request was attached
+                return type(error).__name__
+        return str(error)
+    
+    def _merge_results(self, ranked_hits: Dict[str, List[Dict]]) -> List[Dict]:
+        """Deduplicate hits by normalized URL and score them by rank
+        
+        A hit at 0-based rank r counts as ENGINE_HIT_WEIGHT / (1 + r / 5).
+        Hits from different engines are combined as independent evidence, so
+        a page several engines return near the top scores close to 1.0. The
+        result is exposed as similarity_score, but it only reflects rank and
+        engine agreement; the engines do not report a visual similarity.
+        """
+        merged = {}
+        for engine_name, hits in ranked_hits.items():
+            for rank, hit in enumerate(hits):
+                if not hit.get("url"):
+                    continue
+                key = self._normalize_url(hit["url"])
+                entry = merged.setdefault(key, {
+                    "source": hit.get("source") or engine_name,
+                    "url": hit["url"],
+                    "title": hit.get("title"),
+                    "engines": [],
+                    "miss_probability": 1.0
+                })
+                if engine_name in entry["engines"]:
+                    continue
+                entry["engines"].append(engine_name)
+                entry["miss_probability"] *= 1 - ENGINE_HIT_WEIGHT / (1 + rank / 5)
+                if not entry["title"]:
+                    entry["title"] = hit.get("title")
+        
         results = []
-        for item in json_data.get("organic", []):
-            results.append({
-                "source": item.get("source", "Google Images"),
-                "url": item.get("link"),
-                "title": item.get("title"),
-                "similarity_score": 0.85  
-            })
-
+        for entry in merged.values():
+            entry["similarity_score"] = round(1 - entry.pop("miss_probability"), 4)
+            results.append(ReverseSearchResult(**entry).model_dump())
+        results.sort(key=lambda result: result["similarity_score"], reverse=True)
         return results
     
+    @staticmethod
+    def _normalize_url(url: str) -> str:
+        """Canonical form of a URL for deduplication"""
+        parts = urlsplit(url.strip())
+        host = parts.netloc.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        path = parts.path.rstrip("/") or "/"
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+        ))
+        # http and https copies of a page are the same result
+        return urlunsplit(("", host, path, query, ""))
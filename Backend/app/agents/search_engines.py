@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Type
+from ..config.settings import settings
+from ..utils.image_context import ImageContext
+from ..utils.http_client import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+class SearchEngine:
+    """One reverse image search provider.
+
+    search() returns raw hits in rank order as dicts with "url", "title" and
+    "source"; ranking, merging and scoring are done by ReverseSearchAgent.
+    """
+    name = "engine"
+
+    def __init__(self, http_client: HTTPClient, image_host: "ImageHost"):
+        self.http_client = http_client
+        self.image_host = image_host
+
+    def is_configured(self) -> bool:
+        """Whether the credentials this engine needs are present"""
+        return True
+
+    async def search(self, image: ImageContext) -> List[Dict]:
+        raise NotImplementedError
+
+
+# Engine classes by the name used in REVERSE_SEARCH_ENGINES
+ENGINE_REGISTRY: Dict[str, Type[SearchEngine]] = {}
+
+def register_engine(name: str) -> Callable[[Type[SearchEngine]], Type[SearchEngine]]:
+    """Class decorator adding a SearchEngine to the registry"""
+    def decorator(engine_class: Type[SearchEngine]) -> Type[SearchEngine]:
+        engine_class.name = name
+        ENGINE_REGISTRY[name] = engine_class
+        return engine_class
+    return decorator
+
+def create_engines(names: List[str], http_client: HTTPClient) -> List[SearchEngine]:
+    """Instantiate the named engines, skipping unknown or unconfigured ones"""
+    image_host = ImageHost(http_client)
+    engines = []
+    for name in names:
+        engine_class = ENGINE_REGISTRY.get(name)
+        if engine_class is None:
+            logger.warning(f"Unknown reverse search engine: {name}")
+            continue
+        engine = engine_class(http_client, image_host)
+        if not engine.is_configured():
+            logger.warning(f"Reverse search engine {name} is missing its API key, skipping")
+            continue
+        engines.append(engine)
+    return engines
+
+
+class ImageHost:
+    """Uploads images to imgbb for engines that search by URL
+
+    Engines querying the same image concurrently share one upload, keyed by
+    the image digest.
+    """
+
+    def __init__(self, http_client: HTTPClient, max_entries: int = 128):
+        self.http_client = http_client
+        self.max_entries = max_entries
+        self._uploads: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+
+    async def url_for(self, image: ImageContext) -> str:
+        """Public URL of the image, uploading it on first request"""
+        upload = self._uploads.get(image.digest)
+        if upload is None or (upload.done() and upload.exception() is not None):
+            upload = asyncio.ensure_future(self._upload(image))
+            self._uploads[image.digest] = upload
+            while len(self._uploads) > self.max_entries:
+                self._uploads.popitem(last=False)
+        # Shielded so one engine hitting its deadline does not cancel the upload for the others
+        return await asyncio.shield(upload)
+
+    async def _upload(self, image: ImageContext) -> str:
+        response = await self.http_client.post(
+            f"{settings.IMGBB_BASE_URL}/1/upload",
+            data={"key": settings.IMG_BB_API_KEY or ""},
+            # Bytes rather than a stream, so a retried upload sends the image again
+            files={"image": ("image", image.data.tobytes())}
+        )
+        image_url = response.json().get("data", {}).get("url")
+        if not image_url:
+            raise ValueError("imgbb response did not include an image URL")
+        return image_url
+
+
+@register_engine("google")
+class GoogleLensEngine(SearchEngine):
+    """Google Lens through Serper"""
+
+    def is_configured(self) -> bool:
+        return bool(settings.SERPER_API_KEY)
+
+    async def search(self, image: ImageContext) -> List[Dict]:
+        image_url = await self.image_host.url_for(image)
+        response = await self.http_client.post(
+            f"{settings.SERPER_BASE_URL}/lens",
+            json={"url": image_url},
+            headers={"X-API-KEY": settings.SERPER_API_KEY or ""}
+        )
+        return [
+            {"url": item.get("link"), "title": item.get("title"), "source": item.get("source", "Google Images")}
+            for item in response.json().get("organic", [])
+        ]
+
+
+@register_engine("yandex")
+class YandexImagesEngine(SearchEngine):
+    """Yandex reverse image search through SerpApi"""
+
+    def is_configured(self) -> bool:
+        return bool(settings.SERPAPI_API_KEY)
+
+    async def search(self, image: ImageContext) -> List[Dict]:
+        image_url = await self.image_host.url_for(image)
+        response = await self.http_client.get(
+            f"{settings.SERPAPI_BASE_URL}/search.json",
+            params={"engine": "yandex_images", "url": image_url, "api_key": settings.SERPAPI_API_KEY}
+        )
+        return [
+            {"url": item.get("link"), "title": item.get("title"), "source": item.get("source", "Yandex Images")}
+            for item in response.json().get("image_results", [])
+        ]
@@ -9,7 +9,134 @@ class Settings:
     SERPER_API_KEY = os.getenv("SERPER_API_KEY")
     IMG_BB_API_KEY = os.getenv("IMG_BB_API_KEY")
     
-
+    # External service endpoints, overridable to point at local stand-ins
+    IMGBB_BASE_URL = os.getenv("IMGBB_BASE_URL", "https://api.imgbb.com")
+    SERPER_BASE_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+    
+    SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+    SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+    
+    # Reverse search engines queried concurrently, each with its own deadline
+    REVERSE_SEARCH_ENGINES = [
+        name.strip() for name in os.getenv("REVERSE_SEARCH_ENGINES", "google,yandex").split(",") if name.strip()
+    ]
+    REVERSE_SEARCH_ENGINE_TIMEOUT_SECONDS = float(os.getenv("REVERSE_SEARCH_ENGINE_TIMEOUT_SECONDS", "20"))
+    
+    # Shared outbound HTTP client
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+    HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+    HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    
+    # Uploads are read in chunks and rejected once they exceed this size
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    
+    # Pipeline version, bump to invalidate cached analysis results
+    PIPELINE_VERSION = os.getenv("PIPELINE_VERSION", "1")
+    
+    # Result cache (the on-disk tier is disabled unless a directory is set)
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+    RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+    
+    # Perceptual-hash near-duplicate index (unset path keeps it in memory only).
+    # Matches within PHASH_SHORT_CIRCUIT_DISTANCE bits on both hashes reuse the
+    # earlier cached image analysis and reverse search instead of calling Gemini
+    # and the search engines; metadata and faces always come from the upload
+    PHASH_INDEX_PATH = os.getenv("PHASH_INDEX_PATH", "phash_index.db")
+    PHASH_MATCH_DISTANCE = int(os.getenv("PHASH_MATCH_DISTANCE", "10"))
+    PHASH_SHORT_CIRCUIT = os.getenv("PHASH_SHORT_CIRCUIT", "true").lower() == "true"
+    PHASH_SHORT_CIRCUIT_DISTANCE = int(os.getenv("PHASH_SHORT_CIRCUIT_DISTANCE", "4"))
+    
+    # Per-agent LLM response memoization
+    LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    
+    # Ask for content analysis and visual geolocation in one vision call
+    COMBINED_VISION_PASS = os.getenv("COMBINED_VISION_PASS", "true").lower() == "true"
+    
+    # Image payload sent to vision models
+    LLM_IMAGE_MAX_EDGE = int(os.getenv("LLM_IMAGE_MAX_EDGE", "1536"))
+    LLM_IMAGE_QUALITY = int(os.getenv("LLM_IMAGE_QUALITY", "85"))
+    LLM_IMAGE_HIGH_DETAIL = os.getenv("LLM_IMAGE_HIGH_DETAIL", "false").lower() == "true"
+    
+    # Concurrent calls allowed per pipeline stage, across all requests
+    LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+    REVERSE_SEARCH_CONCURRENCY = int(os.getenv("REVERSE_SEARCH_CONCURRENCY", "4"))
+    FACE_RECOGNITION_CONCURRENCY = int(os.getenv("FACE_RECOGNITION_CONCURRENCY", "2"))
+    
+    # Batch analysis: images analyzed at once, request size and image count limits
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+    BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "1000"))
+    
+    # Face embedding gallery (disabled unless a directory is set). Faces are only
+    # stored under an active consent and erased when that consent is revoked
+    FACE_GALLERY_DIR = os.getenv("FACE_GALLERY_DIR", "")
+    FACE_GALLERY_DIM = int(os.getenv("FACE_GALLERY_DIM", "256"))
+    FACE_GALLERY_DTYPE = os.getenv("FACE_GALLERY_DTYPE", "float32")
+    FACE_MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.9"))
+    FACE_MATCH_TOP_K = int(os.getenv("FACE_MATCH_TOP_K", "5"))
+    
+    # Load the face attribute models at startup instead of on the first
+    # face recognition request; /ready reports not ready until they are loaded
+    FACE_MODEL_WARMUP = os.getenv("FACE_MODEL_WARMUP", "false").lower() == "true"
+    
+    # Worker processes for face detection, encoding and inference (0 runs
+    # them on a thread in the API process) and the per-image time limit
+    FACE_POOL_WORKERS = int(os.getenv("FACE_POOL_WORKERS", "2"))
+    FACE_TASK_TIMEOUT_SECONDS = float(os.getenv("FACE_TASK_TIMEOUT_SECONDS", "60"))
+    
+    # DNN face detection: with tiling, large images are also scanned in
+    # overlapping tiles (at most FACE_MAX_TILES inputs, one batched pass)
+    FACE_DETECTION_TILING = os.getenv("FACE_DETECTION_TILING", "true").lower() == "true"
+    FACE_TILE_SIZE = int(os.getenv("FACE_TILE_SIZE", "600"))
+    FACE_TILE_OVERLAP = float(os.getenv("FACE_TILE_OVERLAP", "0.2"))
+    FACE_MAX_TILES = int(os.getenv("FACE_MAX_TILES", "32"))
+    FACE_DETECTION_CONFIDENCE = float(os.getenv("FACE_DETECTION_CONFIDENCE", "0.5"))
+    FACE_NMS_THRESHOLD = float(os.getenv("FACE_NMS_THRESHOLD", "0.3"))
+    
+    # Images whose face boxes are kept for the anonymization endpoint
+    FACE_DETECTION_CACHE_SIZE = int(os.getenv("FACE_DETECTION_CACHE_SIZE", "256"))
+    
+    # Also decode vendor MakerNote tags, which needs a second full EXIF parse
+    METADATA_MAKER_NOTES = os.getenv("METADATA_MAKER_NOTES", "false").lower() == "true"
+    
+    # Consent records (CONSENT_STORE is "sqlite" or "json"); the SQLite store
+    # imports an existing CONSENT_JSON_PATH file the first time it starts
+    CONSENT_STORE = os.getenv("CONSENT_STORE", "sqlite")
+    CONSENT_DB_PATH = os.getenv("CONSENT_DB_PATH", "consents.db")
+    CONSENT_JSON_PATH = os.getenv("CONSENT_JSON_PATH", "consent_records.json")
+    
+    # HMAC key for the consent tokens issued by /api/consent/validate (random
+    # per process when unset); with CONSENT_REQUIRE_TOKEN, face recognition
+    # needs a token instead of the consent_provided flag
+    CONSENT_TOKEN_SECRET = os.getenv("CONSENT_TOKEN_SECRET", "")
+    CONSENT_REQUIRE_TOKEN = os.getenv("CONSENT_REQUIRE_TOKEN", "false").lower() == "true"
+    CONSENT_REVOCATION_REFRESH_SECONDS = float(os.getenv("CONSENT_REVOCATION_REFRESH_SECONDS", "5"))
+    
+    # How often expired consents are swept from the in-memory index and the store
+    CONSENT_SWEEP_INTERVAL_SECONDS = float(os.getenv("CONSENT_SWEEP_INTERVAL_SECONDS", "60"))
+    
+    # Consent audit log: JSON Lines segments in AUDIT_LOG_DIR, fsynced once
+    # per batch or per record (AUDIT_DURABILITY is "batch" or "record")
+    AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "consent_audit")
+    AUDIT_DURABILITY = os.getenv("AUDIT_DURABILITY", "batch")
+    AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1"))
+    AUDIT_MAX_SEGMENT_BYTES = int(os.getenv("AUDIT_MAX_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+    AUDIT_ROTATE_DAILY = os.getenv("AUDIT_ROTATE_DAILY", "true").lower() == "true"
+    AUDIT_COMPRESS = os.getenv("AUDIT_COMPRESS", "true").lower() == "true"
+    
+    # Background analysis jobs (JOB_STORE is "memory" or "sqlite")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+    JOB_STORE = os.getenv("JOB_STORE", "memory")
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+    JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", "60"))
+    JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", "30"))
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
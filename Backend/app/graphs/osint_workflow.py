@@ -1,6 +1,9 @@
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from typing import TypedDict
+from typing import Annotated, AsyncIterator, List, Optional, Tuple, TypedDict, Union
+from datetime import datetime
+import asyncio
+import operator
 import time
 import logging
 from ..agents.image_analyzer import ImageAnalyzerAgent
@@ -9,23 +12,62 @@ from ..agents.reverse_search import ReverseSearchAgent
 from ..agents.geolocator import GeolocatorAgent
 from ..agents.face_recognition_agent import FaceRecognitionAgent
 from ..agents.report_generator import ReportGeneratorAgent
-from ..models.schemas import OSINTResult, ImageAnalysis, MetadataInfo, GeolocationInfo, FaceRecognitionResult
+from ..models.schemas import (
+    OSINTResult, ImageAnalysis, MetadataInfo, GeolocationInfo, FaceRecognitionResult, ReverseSearchResult,
+    PreviousMatch
+)
+from ..utils.result_cache import ResultCache
+from ..utils.llm_cache import LLMResponseCache
+from ..utils.image_context import ImageContext
+from ..utils.http_client import HTTPClient
+from ..utils.perceptual_hash import PerceptualHashIndex
+from ..utils.face_gallery import FaceGallery
+from ..utils.face_pool import FaceWorkerPool
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+def _merge_dicts(left: dict, right: dict) -> dict:
+    """Reducer for dict fields that several branches contribute to"""
+    return {**left, **right}
+
 class OSINTState(TypedDict):
-    image_path: str
+    image: ImageContext
     enable_face_recognition: bool
+    consent_id: Optional[str]
+    consent_expires_at: Optional[datetime]
+    high_detail: bool
     image_analysis: dict
     metadata: dict
     reverse_search_results: list
     geolocation: dict
+    visual_geolocation: dict
     face_recognition_results: dict
     report_summary: str
     processing_time: float
-    errors: list
+    # Branches run concurrently, so each one appends its own errors
+    errors: Annotated[list, operator.add]
     privacy_compliance: dict
+    processing_stats: Annotated[dict, _merge_dicts]
+    previously_seen: list
+
+class AnalysisBranchInput(TypedDict):
+    """What the analysis branch reads from the parent workflow state"""
+    image: ImageContext
+    high_detail: bool
+
+class AnalysisBranchState(AnalysisBranchInput):
+    """Slice of OSINTState used by the metadata -> analysis -> geolocation chain
+    
+    errors start empty inside the branch, so merging the branch output back
+    into the parent only adds the errors raised here.
+    """
+    image_analysis: dict
+    metadata: dict
+    geolocation: dict
+    visual_geolocation: dict
+    errors: Annotated[list, operator.add]
+    processing_stats: Annotated[dict, _merge_dicts]
 
 class OSINTWorkflow:
     def __init__(self):
@@ -35,206 +77,530 @@ class OSINTWorkflow:
             convert_system_message_to_human=True,
             api_key= settings.GOOGLE_API_KEY
         )
+        self.result_cache = ResultCache(
+            max_entries=settings.RESULT_CACHE_SIZE,
+            cache_dir=settings.RESULT_CACHE_DIR,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS
+        )
+        # Near-duplicate lookup by perceptual hash, checked before any external call
+        self.phash_index = PerceptualHashIndex(settings.PHASH_INDEX_PATH)
+        # Per-stage limits shared by every run in this process, so batches and
+        # concurrent requests cannot overrun the Gemini, Serper or CPU budgets
+        self.stage_limits = {
+            "llm": asyncio.Semaphore(settings.LLM_CONCURRENCY),
+            "reverse_search": asyncio.Semaphore(settings.REVERSE_SEARCH_CONCURRENCY),
+            "face_recognition": asyncio.Semaphore(settings.FACE_RECOGNITION_CONCURRENCY)
+        }
         self.setup_agents()
         self.setup_workflow()
     
     def setup_agents(self):
         """Initialize all agents"""
-        self.image_analyzer = ImageAnalyzerAgent(self.llm)
+        # Shared memo of parsed LLM responses, keyed per agent
+        self.llm_cache = LLMResponseCache(
+            max_entries=settings.LLM_CACHE_SIZE,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES
+        )
+        # One pooled client for every outbound call to external services
+        self.http_client = HTTPClient(
+            timeout=settings.HTTP_TIMEOUT_SECONDS,
+            connect_timeout=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+            max_retries=settings.HTTP_MAX_RETRIES,
+            backoff_seconds=settings.HTTP_BACKOFF_SECONDS,
+            max_connections=settings.HTTP_MAX_CONNECTIONS
+        )
+        self.image_analyzer = ImageAnalyzerAgent(self.llm, cache=self.llm_cache)
         self.metadata_extractor = MetadataExtractorAgent()
-        self.reverse_search_agent = ReverseSearchAgent()
-        self.geolocator = GeolocatorAgent(self.llm)
-        self.face_recognition_agent = FaceRecognitionAgent()
-        self.report_generator = ReportGeneratorAgent(self.llm)
+        self.reverse_search_agent = ReverseSearchAgent(self.http_client)
+        self.geolocator = GeolocatorAgent(self.llm, cache=self.llm_cache)
+        self.face_gallery = None
+        if settings.FACE_GALLERY_DIR:
+            self.face_gallery = FaceGallery(
+                settings.FACE_GALLERY_DIR,
+                dim=settings.FACE_GALLERY_DIM,
+                dtype=settings.FACE_GALLERY_DTYPE
+            )
+        self.face_pool = None
+        if settings.FACE_POOL_WORKERS > 0:
+            self.face_pool = FaceWorkerPool(
+                workers=settings.FACE_POOL_WORKERS,
+                timeout_seconds=settings.FACE_TASK_TIMEOUT_SECONDS,
+                warm_up=settings.FACE_MODEL_WARMUP
+            )
+        self.face_recognition_agent = FaceRecognitionAgent(gallery=self.face_gallery, pool=self.face_pool)
+        self.report_generator = ReportGeneratorAgent(self.llm, cache=self.llm_cache)
     
     def setup_workflow(self):
         """Setup the LangGraph workflow"""
+        # LangGraph runs nodes in lock-step supersteps, so the dependent chain
+        # lives in its own subgraph; otherwise analysis and geolocation would
+        # wait for the slow reverse search and face recognition steps too.
+        # Content analysis follows the (millisecond) metadata step so it knows
+        # whether GPS data is missing and visual geolocation can share its call
+        analysis_branch = StateGraph(AnalysisBranchState, input_schema=AnalysisBranchInput)
+        analysis_branch.add_node("extract_metadata", self.extract_metadata_node)
+        analysis_branch.add_node("analyze_image", self.analyze_image_node)
+        analysis_branch.add_node("geolocate", self.geolocate_node)
+        analysis_branch.add_edge(START, "extract_metadata")
+        analysis_branch.add_edge("extract_metadata", "analyze_image")
+        analysis_branch.add_edge("analyze_image", "geolocate")
+        analysis_branch.add_edge("geolocate", END)
+        
         workflow = StateGraph(OSINTState)
         
         # Add nodes
-        workflow.add_node("analyze_image", self.analyze_image_node)
-        workflow.add_node("extract_metadata", self.extract_metadata_node)
+        workflow.add_node("analysis_branch", analysis_branch.compile())
         workflow.add_node("face_recognition", self.face_recognition_node)
         workflow.add_node("reverse_search", self.reverse_search_node)
-        workflow.add_node("geolocate", self.geolocate_node)
         workflow.add_node("generate_report", self.generate_report_node)
         
-        # Define workflow with conditional face recognition
-        workflow.set_entry_point("analyze_image")
-        workflow.add_edge("analyze_image", "extract_metadata")
+        # Independent branches fan out from the start and the report runs
+        # once all of them have finished
         workflow.add_conditional_edges(
-            "extract_metadata",
-            self._should_run_face_recognition,
-            {
-                "face_recognition": "face_recognition",
-                "reverse_search": "reverse_search"
-            }
+            START,
+            self._route_branches,
+            ["analysis_branch", "face_recognition", "reverse_search"]
         )
-        workflow.add_edge("face_recognition", "reverse_search")
-        workflow.add_edge("reverse_search", "geolocate")
-        workflow.add_edge("geolocate", "generate_report")
+        workflow.add_edge("analysis_branch", "generate_report")
+        workflow.add_edge("reverse_search", "generate_report")
+        workflow.add_edge("face_recognition", "generate_report")
         workflow.add_edge("generate_report", END)
         
         self.workflow = workflow.compile()
     
-    def _should_run_face_recognition(self, state: OSINTState) -> str:
-        """Determine if face recognition should be run"""
-        return "face_recognition" if state.get("enable_face_recognition", False) else "reverse_search"
+    def _route_branches(self, state: OSINTState) -> List[str]:
+        """Select the branches that run in parallel at the start of the workflow"""
+        branches = ["analysis_branch", "reverse_search"]
+        if state.get("enable_face_recognition", False):
+            branches.append("face_recognition")
+        return branches
     
-    async def analyze_image_node(self, state: OSINTState) -> OSINTState:
+    async def analyze_image_node(self, state: OSINTState) -> dict:
         """Analyze image content using Gemini vision model"""
         try:
             logger.info("Starting image analysis...")
-            analysis = await self.image_analyzer.analyze(state["image_path"])
-            state["image_analysis"] = analysis
+            # Encoded once on the shared image context; geolocation reuses it
+            payload = await asyncio.to_thread(state["image"].llm_payload, state.get("high_detail", False))
+            logger.info(
+                f"Vision payload {payload.original_bytes} -> {payload.encoded_bytes} bytes "
+                f"({payload.mime_type}, {payload.width}x{payload.height}) "
+                f"in {payload.preprocess_seconds * 1000:.1f} ms"
+            )
+            update = {"processing_stats": {"llm_payload": payload.stats()}}
+            
+            if self._use_combined_vision_pass(state):
+                # One vision call covers both the analysis and visual geolocation
+                async with self.stage_limits["llm"]:
+                    combined = await self.image_analyzer.analyze_with_geolocation(state["image"], payload)
+                if combined:
+                    logger.info("Combined image analysis completed successfully")
+                    update["image_analysis"] = combined["analysis"]
+                    update["visual_geolocation"] = combined["geolocation"]
+                    return update
+            async with self.stage_limits["llm"]:
+                update["image_analysis"] = await self.image_analyzer.analyze(state["image"], payload)
             logger.info("Image analysis completed successfully")
+            return update
         except Exception as e:
             logger.error(f"Image analysis failed: {str(e)}")
-            state["errors"].append(f"Image analysis failed: {str(e)}")
-        return state
+            return {"errors": [f"Image analysis failed: {str(e)}"]}
+    
+    def _use_combined_vision_pass(self, state: OSINTState) -> bool:
+        """Combine the vision calls when geolocation will need to look at the image too"""
+        return (settings.COMBINED_VISION_PASS and
+                self.geolocator.needs_visual_geolocation(state.get("metadata", {})))
     
-    async def extract_metadata_node(self, state: OSINTState) -> OSINTState:
+    async def extract_metadata_node(self, state: OSINTState) -> dict:
         """Extract EXIF and other metadata"""
         try:
             logger.info("Extracting metadata...")
-            metadata = await self.metadata_extractor.extract(state["image_path"])
-            state["metadata"] = metadata
+            metadata = await self.metadata_extractor.extract(state["image"])
             logger.info("Metadata extraction completed")
+            return {"metadata": metadata}
         except Exception as e:
             logger.error(f"Metadata extraction failed: {str(e)}")
-            state["errors"].append(f"Metadata extraction failed: {str(e)}")
-        return state
+            return {"errors": [f"Metadata extraction failed: {str(e)}"]}
     
-    async def face_recognition_node(self, state: OSINTState) -> OSINTState:
+    async def face_recognition_node(self, state: OSINTState) -> dict:
         """Perform face recognition analysis"""
         try:
+            privacy_compliance = dict(state["privacy_compliance"])
             if state.get("enable_face_recognition", False):
                 logger.info("Starting face recognition analysis...")
-                face_results = await self.face_recognition_agent.analyze_faces(
-                    state["image_path"]
-                )
-                state["face_recognition_results"] = face_results
-                state["privacy_compliance"]["face_recognition_performed"] = True
+                async with self.stage_limits["face_recognition"]:
+                    face_results = await self.face_recognition_agent.analyze_faces(
+                        state["image"],
+                        consent_id=state.get("consent_id"),
+                        consent_expires_at=state.get("consent_expires_at")
+                    )
+                privacy_compliance["face_recognition_performed"] = True
                 logger.info("Face recognition analysis completed")
             else:
-                state["face_recognition_results"] = {}
-                state["privacy_compliance"]["face_recognition_performed"] = False
+                face_results = {}
+                privacy_compliance["face_recognition_performed"] = False
+            return {
+                "face_recognition_results": face_results,
+                "privacy_compliance": privacy_compliance
+            }
         except Exception as e:
             logger.error(f"Face recognition failed: {str(e)}")
-            state["errors"].append(f"Face recognition failed: {str(e)}")
-        return state
+            return {"errors": [f"Face recognition failed: {str(e)}"]}
     
-    async def reverse_search_node(self, state: OSINTState) -> OSINTState:
+    async def reverse_search_node(self, state: OSINTState) -> dict:
         """Perform reverse image search"""
         try:
             logger.info("Starting reverse image search...")
-            results = await self.reverse_search_agent.search(state["image_path"])
-            state["reverse_search_results"] = results
+            async with self.stage_limits["reverse_search"]:
+                results, stats = await self.reverse_search_agent.search_with_stats(state["image"])
             logger.info("Reverse search completed")
+            return {"reverse_search_results": results, "processing_stats": {"reverse_search": stats}}
         except Exception as e:
             logger.error(f"Reverse search failed: {str(e)}")
-            state["errors"].append(f"Reverse search failed: {str(e)}")
-        return state
+            return {"errors": [f"Reverse search failed: {str(e)}"]}
     
-    async def geolocate_node(self, state: OSINTState) -> OSINTState:
+    async def geolocate_node(self, state: OSINTState) -> dict:
         """Attempt to geolocate the image"""
         try:
             logger.info("Starting geolocation analysis...")
-            location = await self.geolocator.locate(
-                state["image_path"], 
-                state.get("metadata", {}),
-                state.get("image_analysis", {})
-            )
-            state["geolocation"] = location
+            payload = await asyncio.to_thread(state["image"].llm_payload, state.get("high_detail", False))
+            async with self.stage_limits["llm"]:
+                location = await self.geolocator.locate(
+                    state["image"], 
+                    state.get("metadata", {}),
+                    state.get("image_analysis", {}),
+                    visual_geolocation=state.get("visual_geolocation"),
+                    payload=payload
+                )
             logger.info("Geolocation analysis completed")
+            return {"geolocation": location}
         except Exception as e:
             logger.error(f"Geolocation failed: {str(e)}")
-            state["errors"].append(f"Geolocation failed: {str(e)}")
-        return state
+            return {"errors": [f"Geolocation failed: {str(e)}"]}
     
-    async def generate_report_node(self, state: OSINTState) -> OSINTState:
+    async def generate_report_node(self, state: OSINTState) -> dict:
         """Generate final OSINT report"""
         try:
             logger.info("Generating final report...")
-            report = await self.report_generator.generate(state)
-            state["report_summary"] = report
+            async with self.stage_limits["llm"]:
+                report = await self.report_generator.generate(state)
             logger.info("Report generation completed")
+            return {"report_summary": report}
         except Exception as e:
             logger.error(f"Report generation failed: {str(e)}")
-            state["errors"].append(f"Report generation failed: {str(e)}")
-        return state
+            return {"errors": [f"Report generation failed: {str(e)}"]}
     
-    async def run_analysis(self, image_path: str, enable_face_recognition: bool = False) -> OSINTResult:
-        """Run the complete OSINT analysis workflow"""
+    async def run_analysis(self, image: Union[str, bytes, ImageContext], enable_face_recognition: bool = False,
+                           consent_expires_at: Optional[datetime] = None,
+                           high_detail: Optional[bool] = None,
+                           consent_id: Optional[str] = None) -> OSINTResult:
+        """Run the complete OSINT analysis workflow
+        
+        image is a path, the raw image bytes or an ImageContext shared by
+        every agent.
+        high_detail sends the original full-resolution image to the vision
+        model instead of the downscaled payload; defaults to LLM_IMAGE_HIGH_DETAIL.
+        consent_id and consent_expires_at identify the consent covering face
+        recognition; faces are only kept in the gallery under a known consent.
+        """
         start_time = time.time()
-        logger.info(f"Starting OSINT analysis for image: {image_path}")
+        image, initial_state, cache_key = await self._prepare_run(
+            image, enable_face_recognition, high_detail, consent_id, consent_expires_at
+        )
+        
+        prior_result = await self._find_prior_result(initial_state, cache_key, start_time)
+        if prior_result is not None:
+            return prior_result
+        
+        # Run the workflow
+        final_state = await self.workflow.ainvoke(initial_state)
+        return await self._finish_run(final_state, start_time, cache_key, consent_expires_at)
+    
+    async def stream_analysis(self, image: Union[str, bytes, ImageContext], enable_face_recognition: bool = False,
+                              consent_expires_at: Optional[datetime] = None,
+                              high_detail: Optional[bool] = None,
+                              consent_id: Optional[str] = None) -> AsyncIterator[Tuple[str, dict]]:
+        """Run the workflow, yielding ("node", ...) events as nodes complete
+        
+        Each node event carries the OSINTResult sections that node produced,
+        so clients can render them immediately. The last event is
+        ("result", ...) with the complete OSINTResult.
+        """
+        start_time = time.time()
+        image, initial_state, cache_key = await self._prepare_run(
+            image, enable_face_recognition, high_detail, consent_id, consent_expires_at
+        )
+        
+        prior_result = await self._find_prior_result(initial_state, cache_key, start_time)
+        if prior_result is not None:
+            yield "result", prior_result.model_dump(mode="json")
+            return
+        
+        final_state = initial_state
+        async for namespace, mode, chunk in self.workflow.astream(
+            initial_state, stream_mode=["updates", "values"], subgraphs=True
+        ):
+            if mode == "values":
+                if not namespace:
+                    final_state = chunk
+                continue
+            
+            for node, update in chunk.items():
+                # The subgraph's own aggregate update repeats what its nodes sent
+                if node == "analysis_branch" or not update:
+                    continue
+                yield "node", {
+                    "node": node,
+                    "elapsed": time.time() - start_time,
+                    "sections": self._node_sections(node, update),
+                    "errors": update.get("errors", [])
+                }
+        
+        result = await self._finish_run(final_state, start_time, cache_key, consent_expires_at)
+        yield "result", result.model_dump(mode="json")
+    
+    async def _prepare_run(self, image: Union[str, bytes, ImageContext], enable_face_recognition: bool,
+                           high_detail: Optional[bool], consent_id: Optional[str] = None,
+                           consent_expires_at: Optional[datetime] = None) -> Tuple[ImageContext, OSINTState, str]:
+        """Wrap the input in an ImageContext and build the initial state and cache key"""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = ImageContext(image)
+        elif not isinstance(image, ImageContext):
+            image = await asyncio.to_thread(ImageContext.from_path, image)
+        logger.info(f"Starting OSINT analysis for image: {image.path or image.digest}")
+        
+        if high_detail is None:
+            high_detail = settings.LLM_IMAGE_HIGH_DETAIL
+        
+        cache_key = self.result_cache.make_key(
+            image.digest, enable_face_recognition, settings.PIPELINE_VERSION, high_detail, consent_id
+        )
         
         initial_state = OSINTState(
-            image_path=image_path,
+            image=image,
             enable_face_recognition=enable_face_recognition,
+            consent_id=consent_id,
+            consent_expires_at=consent_expires_at,
+            high_detail=high_detail,
             image_analysis={},
             metadata={},
             reverse_search_results=[],
             geolocation={},
+            visual_geolocation={},
             face_recognition_results={},
             report_summary="",
             processing_time=0.0,
             errors=[],
-            privacy_compliance={}
+            privacy_compliance={},
+            processing_stats={},
+            previously_seen=[]
         )
+        return image, initial_state, cache_key
+    
+    async def _find_prior_result(self, state: OSINTState, cache_key: str,
+                                 start_time: float) -> Optional[OSINTResult]:
+        """Reuse an earlier result for this image, or part of a near-duplicate's
         
-        # Run the workflow
-        final_state = await self.workflow.ainvoke(initial_state)
+        Also records near-duplicate matches in state["previously_seen"] so a
+        fresh analysis can report them.
+        """
+        # Serve repeated uploads of the same image from the result cache; a miss
+        # in memory reads the disk tier, so it runs off the event loop
+        cached_result = await asyncio.to_thread(self.result_cache.get, cache_key)
+        if cached_result is not None:
+            logger.info(f"Result cache hit for {cache_key} in {time.time() - start_time:.3f} seconds")
+            return cached_result
+        
+        image = state["image"]
+        try:
+            phash_value, dhash_value = await asyncio.to_thread(lambda: image.perceptual_hashes)
+            matches = await asyncio.to_thread(
+                self.phash_index.search, phash_value, dhash_value, settings.PHASH_MATCH_DISTANCE
+            )
+        except Exception as e:
+            logger.warning(f"Perceptual hash lookup failed: {str(e)}")
+            return None
+        
+        state["previously_seen"] = [
+            PreviousMatch(
+                digest=match.digest,
+                phash_distance=match.phash_distance,
+                dhash_distance=match.dhash_distance,
+                first_seen=datetime.fromtimestamp(match.first_seen)
+            )
+            for match in matches
+        ]
+        if not settings.PHASH_SHORT_CIRCUIT:
+            return None
+        
+        for match in matches:
+            if max(match.phash_distance, match.dhash_distance) > settings.PHASH_SHORT_CIRCUIT_DISTANCE:
+                continue
+            prior_key = self.result_cache.make_key(
+                match.digest, state["enable_face_recognition"], settings.PIPELINE_VERSION, state["high_detail"],
+                state["consent_id"]
+            )
+            prior_result = await asyncio.to_thread(self.result_cache.get, prior_key)
+            if prior_result is not None:
+                logger.info(
+                    f"Near-duplicate of {match.digest} (pHash distance {match.phash_distance}), "
+                    f"reusing its analysis and reverse search"
+                )
+                return await self._reuse_near_duplicate(state, prior_result, match.digest, start_time)
+        return None
+    
+    async def _reuse_near_duplicate(self, state: OSINTState, prior_result: OSINTResult, digest: str,
+                                    start_time: float) -> OSINTResult:
+        """Build a result from a near-duplicate's image analysis and reverse search
+        
+        Metadata and faces belong to the uploaded bytes, not the other image,
+        so they are extracted again here, as is any location read from GPS.
+        The report is regenerated over the combined sections.
+        """
+        state["image_analysis"] = prior_result.image_analysis.model_dump(exclude={"faces_count", "face_recognition"})
+        state["reverse_search_results"] = [result.model_dump() for result in prior_result.reverse_search_results]
+        
+        updates = [self.extract_metadata_node(state)]
+        if state["enable_face_recognition"]:
+            updates.append(self.face_recognition_node(state))
+        for update in await asyncio.gather(*updates):
+            self._apply_update(state, update)
+        
+        # A visual location carries over; one read from GPS is only ever this image's own
+        if self.geolocator.needs_visual_geolocation(state["metadata"]) and not prior_result.metadata.gps_coordinates:
+            state["geolocation"] = prior_result.geolocation.model_dump()
+        else:
+            self._apply_update(state, await self.geolocate_node(state))
+        self._apply_update(state, await self.generate_report_node(state))
+        
+        state["processing_time"] = time.time() - start_time
+        self._apply_update(state, {"processing_stats": {**prior_result.processing_stats, "near_duplicate_of": digest}})
+        return self._convert_to_result(state)
+    
+    def _apply_update(self, state: OSINTState, update: dict):
+        """Merge a node's update into the state the way the graph's reducers would"""
+        for field, value in update.items():
+            if field == "errors":
+                state["errors"] = state["errors"] + value
+            elif field == "processing_stats":
+                state["processing_stats"] = {**state["processing_stats"], **value}
+            else:
+                state[field] = value
+    
+    async def _finish_run(self, final_state: OSINTState, start_time: float, cache_key: str,
+                          consent_expires_at: Optional[datetime]) -> OSINTResult:
+        """Convert the final state to a result and cache it"""
         final_state["processing_time"] = time.time() - start_time
         
         logger.info(f"OSINT analysis completed in {final_state['processing_time']:.2f} seconds")
         
         # Convert to response model
-        return self._convert_to_result(final_state)
+        result = self._convert_to_result(final_state)
+        # The disk cache write and the SQLite insert block, so keep them off the event loop
+        await asyncio.to_thread(self._cache_result, cache_key, final_state, result, consent_expires_at)
+        await asyncio.to_thread(self._index_image, final_state["image"])
+        return result
     
-    def _convert_to_result(self, state: OSINTState) -> OSINTResult:
-        """Convert workflow state to API response model"""
-        # Create face recognition result if available
-        face_recognition_result = None
-        if state["face_recognition_results"]:
-            face_recognition_result = FaceRecognitionResult(**state["face_recognition_results"])
-        
-        # Create image analysis result
-        image_analysis = ImageAnalysis(
-            objects_detected=state["image_analysis"].get("objects_detected", []),
-            faces_count=state["face_recognition_results"].get("total_faces", 0),
-            text_extracted=state["image_analysis"].get("text_extracted", []),
-            scene_description=state["image_analysis"].get("scene_description", ""),
-            image_quality=state["image_analysis"].get("image_quality", "unknown"),
-            face_recognition=face_recognition_result
-        )
-        
-        # Create metadata info
-        metadata_info = MetadataInfo(
-            camera_make=state["metadata"].get("camera_make"),
-            camera_model=state["metadata"].get("camera_model"),
-            date_taken=state["metadata"].get("date_taken"),
-            gps_coordinates=state["metadata"].get("gps_coordinates"),
-            software=state["metadata"].get("software"),
-            image_size=state["metadata"].get("image_size")
-        )
+    def _index_image(self, image: ImageContext):
+        """Remember the image's perceptual hashes for later near-duplicate lookups"""
+        try:
+            self.phash_index.add(image.digest, *image.perceptual_hashes)
+        except Exception as e:
+            logger.warning(f"Failed to index perceptual hashes: {str(e)}")
+    
+    def _cache_result(self, cache_key: str, state: OSINTState, result: OSINTResult,
+                      consent_expires_at: Optional[datetime]):
+        """Store a complete result, bounding face data by the consent expiry"""
+        if state["errors"] or "error" in state["image_analysis"]:
+            logger.info("Skipping result cache for partial analysis")
+            return
         
-        # Create geolocation info
-        geolocation_info = GeolocationInfo(
-            latitude=state["geolocation"].get("latitude"),
-            longitude=state["geolocation"].get("longitude"),
-            address=state["geolocation"].get("address"),
-            landmarks=state["geolocation"].get("landmarks", []),
-            confidence=state["geolocation"].get("confidence")
-        )
+        expires_at = None
+        if state["face_recognition_results"]:
+            if consent_expires_at is None:
+                logger.info("Skipping result cache for face data without a known consent expiry")
+                return
+            expires_at = consent_expires_at.timestamp()
         
+        self.result_cache.put(cache_key, result, expires_at=expires_at)
+    
+    def _node_sections(self, node: str, update: dict) -> dict:
+        """Map one node's state update to the OSINTResult sections it fills"""
+        sections = {}
+        if "metadata" in update:
+            sections["metadata"] = self._build_metadata(update["metadata"]).model_dump(mode="json")
+        if "image_analysis" in update:
+            sections["image_analysis"] = self._build_image_analysis(
+                update["image_analysis"], {}
+            ).model_dump(mode="json")
+        if "geolocation" in update:
+            sections["geolocation"] = self._build_geolocation(update["geolocation"]).model_dump(mode="json")
+        if "reverse_search_results" in update:
+            sections["reverse_search_results"] = [
+                ReverseSearchResult(**item).model_dump(mode="json") for item in update["reverse_search_results"]
+            ]
+        if "face_recognition_results" in update:
+            face_results = update["face_recognition_results"]
+            sections["face_recognition"] = (
+                FaceRecognitionResult(**face_results).model_dump(mode="json") if face_results else None
+            )
+        if "privacy_compliance" in update:
+            sections["privacy_compliance"] = update["privacy_compliance"]
+        if "report_summary" in update:
+            sections["report_summary"] = update["report_summary"]
+        if "processing_stats" in update:
+            sections["processing_stats"] = update["processing_stats"]
+        return sections
+    
+    def _convert_to_result(self, state: OSINTState) -> OSINTResult:
+        """Convert workflow state to API response model"""
         return OSINTResult(
-            image_analysis=image_analysis,
-            metadata=metadata_info,
+            image_analysis=self._build_image_analysis(state["image_analysis"], state["face_recognition_results"]),
+            metadata=self._build_metadata(state["metadata"]),
             reverse_search_results=state["reverse_search_results"],
-            geolocation=geolocation_info,
+            geolocation=self._build_geolocation(state["geolocation"]),
             risk_assessment=state.get("risk_assessment", {}),
             processing_time=state["processing_time"],
             report_summary=state["report_summary"],
-            privacy_compliance=state["privacy_compliance"]
-        )
\ No newline at end of file
+            privacy_compliance=state["privacy_compliance"],
+            processing_stats=state["processing_stats"],
+            previously_seen=state.get("previously_seen", [])
+        )
+    
+    def _build_image_analysis(self, image_analysis: dict, face_recognition_results: dict) -> ImageAnalysis:
+        """Create image analysis result, with face recognition if available"""
+        face_recognition_result = None
+        if face_recognition_results:
+            face_recognition_result = FaceRecognitionResult(**face_recognition_results)
+        
+        return ImageAnalysis(
+            objects_detected=image_analysis.get("objects_detected", []),
+            faces_count=face_recognition_results.get("total_faces", 0),
+            text_extracted=image_analysis.get("text_extracted", []),
+            scene_description=image_analysis.get("scene_description", ""),
+            image_quality=image_analysis.get("image_quality", "unknown"),
+            face_recognition=face_recognition_result
+        )
+    
+    def _build_metadata(self, metadata: dict) -> MetadataInfo:
+        """Create metadata info"""
+        return MetadataInfo(
+            camera_make=metadata.get("camera_make"),
+            camera_model=metadata.get("camera_model"),
+            date_taken=metadata.get("date_taken"),
+            gps_coordinates=metadata.get("gps_coordinates"),
+            software=metadata.get("software"),
+            image_size=metadata.get("image_size"),
+            iptc=metadata.get("iptc"),
+            xmp=metadata.get("xmp"),
+            icc_profile=metadata.get("icc_profile")
+        )
+    
+    def _build_geolocation(self, geolocation: dict) -> GeolocationInfo:
+        """Create geolocation info"""
+        return GeolocationInfo(
+            latitude=geolocation.get("latitude"),
+            longitude=geolocation.get("longitude"),
+            address=geolocation.get("address"),
+            landmarks=geolocation.get("landmarks", []),
+            confidence=geolocation.get("confidence")
+        )
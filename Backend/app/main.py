@@ -1,14 +1,24 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import json
 import os
 from dotenv import load_dotenv
 from .graphs.osint_workflow import OSINTWorkflow
-from .models.schemas import OSINTResult, ConsentForm
+from .models.schemas import OSINTResult, ConsentForm, JobInfo
 from .utils.consent_manager import ConsentManager
-import aiofiles
-import tempfile
-from typing import Optional
+from .utils.consent_store import create_consent_store
+from .utils.consent_token import ConsentTokenSigner, InvalidConsentToken
+from .utils.audit_log import AuditLogWriter
+from .utils.image_context import ImageContext
+from .utils.batch import iter_batch_entries, run_batch, stream_anonymized_zip
+from .utils.anonymize import ANONYMIZE_MODES, OUTPUT_FORMATS
+from .utils.job_manager import JobManager
+from .utils.job_store import create_job_store
+from .config.settings import settings
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import asyncio
 import logging
 
 # Configure logging
@@ -17,7 +27,49 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-app = FastAPI(title="Image OSINT Tool", version="1.0.0")
+async def refresh_consent_revocations():
+    """Pick up consents revoked through other workers so their tokens stop working"""
+    while True:
+        await asyncio.sleep(settings.CONSENT_REVOCATION_REFRESH_SECONDS)
+        await asyncio.to_thread(consent_manager.refresh_revocations)
+
+async def sweep_expired_consents():
+    """Drop expired consents from the consent index and store on a schedule"""
+    while True:
+        await asyncio.sleep(settings.CONSENT_SWEEP_INTERVAL_SECONDS)
+        await asyncio.to_thread(consent_manager.cleanup_expired_consents)
+
+async def sweep_expired_jobs():
+    """Remove expired jobs (and the results they hold) even while no job is running"""
+    while True:
+        await asyncio.sleep(settings.JOB_SWEEP_INTERVAL_SECONDS)
+        await job_manager.delete_expired()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_manager.fail_interrupted()
+    job_manager.start()
+    warm_up = None
+    if settings.FACE_MODEL_WARMUP:
+        # Load the face models off the event loop; /ready reports when they are done
+        warm_up = asyncio.create_task(asyncio.to_thread(osint_workflow.face_recognition_agent.warm_up))
+    revocation_refresh = asyncio.create_task(refresh_consent_revocations())
+    consent_sweep = asyncio.create_task(sweep_expired_consents())
+    job_sweep = asyncio.create_task(sweep_expired_jobs())
+    yield
+    revocation_refresh.cancel()
+    consent_sweep.cancel()
+    job_sweep.cancel()
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+    await job_manager.stop()
+    await osint_workflow.http_client.aclose()
+    if osint_workflow.face_pool is not None:
+        await asyncio.to_thread(osint_workflow.face_pool.shutdown)
+    # Write out buffered audit records before exiting
+    await asyncio.to_thread(consent_manager.audit_log.close)
+
+app = FastAPI(title="Image OSINT Tool", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -28,25 +80,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multipart overhead allowed on top of the image itself
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Endpoints accepting many images or zip archives in one request
+BATCH_UPLOAD_PATHS = ("/api/analyze-batch", "/api/anonymize-batch")
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from their Content-Length before the body is parsed"""
+    content_length = request.headers.get("content-length")
+    max_bytes = (settings.BATCH_MAX_UPLOAD_BYTES if request.url.path in BATCH_UPLOAD_PATHS
+                 else settings.MAX_UPLOAD_BYTES)
+    if (request.method == "POST" and content_length and content_length.isdigit() and
+            int(content_length) > max_bytes + UPLOAD_FORM_OVERHEAD_BYTES):
+        return JSONResponse(status_code=413, content={"detail": "Upload too large"})
+    return await call_next(request)
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """Read an upload in chunks, stopping as soon as it exceeds max_bytes"""
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    
+    buffer = bytearray()
+    while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail="Upload too large")
+    return bytes(buffer)
+
+def consent_token_secret() -> bytes:
+    """CONSENT_TOKEN_SECRET, or a per-process random key when it is unset"""
+    if settings.CONSENT_TOKEN_SECRET:
+        return settings.CONSENT_TOKEN_SECRET.encode()
+    logger.warning("CONSENT_TOKEN_SECRET is not set; consent tokens will not survive a restart "
+                   "or work across workers")
+    return os.urandom(32)
+
 # Initialize the OSINT workflow and consent manager
 osint_workflow = OSINTWorkflow()
-consent_manager = ConsentManager()
+consent_manager = ConsentManager(
+    settings.CONSENT_JSON_PATH,
+    create_consent_store(settings.CONSENT_STORE, settings.CONSENT_JSON_PATH, settings.CONSENT_DB_PATH),
+    AuditLogWriter(
+        settings.AUDIT_LOG_DIR,
+        durability=settings.AUDIT_DURABILITY,
+        flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+        max_bytes=settings.AUDIT_MAX_SEGMENT_BYTES,
+        rotate_daily=settings.AUDIT_ROTATE_DAILY,
+        compress=settings.AUDIT_COMPRESS
+    ),
+    ConsentTokenSigner(consent_token_secret())
+)
+job_manager = JobManager(
+    osint_workflow,
+    create_job_store(settings.JOB_STORE, settings.JOB_DB_PATH),
+    workers=settings.JOB_WORKERS,
+    queue_size=settings.JOB_QUEUE_SIZE,
+    retention_seconds=settings.JOB_RETENTION_SECONDS
+)
 
-@app.post("/api/analyze-image", response_model=OSINTResult)
-async def analyze_image(
-    file: UploadFile = File(...),
-    enable_face_recognition: bool = Form(False),
-    consent_provided: bool = Form(False),
-    analysis_purpose: Optional[str] = Form(None),
-    user_id: Optional[str] = Form(None)
-):
-    """Analyze uploaded image using multi-agent OSINT system"""
-    
+def check_analysis_request(file: UploadFile, enable_face_recognition: bool, consent_provided: bool,
+                           analysis_purpose: Optional[str], user_id: Optional[str],
+                           consent_token: Optional[str] = None):
+    """Validate the upload type and face recognition consent; returns (consent_id, consent expiry)"""
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    return check_face_recognition_consent(
+        enable_face_recognition, consent_provided, analysis_purpose, user_id, consent_token
+    )
+
+def check_face_recognition_consent(enable_face_recognition: bool, consent_provided: bool,
+                                   analysis_purpose: Optional[str], user_id: Optional[str],
+                                   consent_token: Optional[str] = None):
+    """Validate and log face recognition consent; returns (consent_id, consent expiry)"""
+    # A token from /api/consent/validate is checked in memory, without reading the consent store
+    if enable_face_recognition and consent_token:
+        try:
+            claims = consent_manager.verify_consent_token(consent_token)
+        except InvalidConsentToken as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        if (user_id and user_id != claims.user_id) or (analysis_purpose and analysis_purpose != claims.purpose):
+            raise HTTPException(status_code=403, detail="Consent token does not match user or purpose")
+        
+        consent_manager.log_consent({
+            "user_id": claims.user_id,
+            "purpose": claims.purpose,
+            "timestamp": consent_manager.get_current_timestamp(),
+            "ip_address": "127.0.0.1",  # Get from request in production
+            "consent_provided": True
+        })
+        return claims.consent_id, claims.expires_at
+    
     # Validate consent for face recognition
     if enable_face_recognition:
+        if settings.CONSENT_REQUIRE_TOKEN:
+            raise HTTPException(
+                status_code=400, 
+                detail="Consent token required for face recognition analysis"
+            )
         if not consent_provided:
             raise HTTPException(
                 status_code=400, 
@@ -67,26 +201,240 @@ async def analyze_image(
             "consent_provided": True
         })
     
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_file_path = tmp_file.name
+    if enable_face_recognition and user_id:
+        consent = consent_manager.get_active_consent(user_id, analysis_purpose)
+        if consent:
+            return consent['consent_id'], consent['expires_at']
+    return None, None
+
+def check_anonymize_options(mode: str, output_format: str):
+    """Validate the anonymization mode and output format"""
+    if mode not in ANONYMIZE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(ANONYMIZE_MODES)}")
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+
+def format_sse(event: str, data) -> str:
+    """Frame one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/analyze-image", response_model=OSINTResult)
+async def analyze_image(
+    file: UploadFile = File(...),
+    enable_face_recognition: bool = Form(False),
+    consent_provided: bool = Form(False),
+    analysis_purpose: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    high_detail: Optional[bool] = Form(None),
+    consent_token: Optional[str] = Form(None)
+):
+    """Analyze uploaded image using multi-agent OSINT system"""
+    
+    consent_id, consent_expires_at = check_analysis_request(
+        file, enable_face_recognition, consent_provided, analysis_purpose, user_id, consent_token
+    )
+    
+    # Keep the upload in memory; agents share one decoded context
+    image = ImageContext(await read_upload(file))
     
     try:
         # Run the OSINT workflow
         result = await osint_workflow.run_analysis(
-            tmp_file_path, 
-            enable_face_recognition=enable_face_recognition
+            image, 
+            enable_face_recognition=enable_face_recognition,
+            consent_expires_at=consent_expires_at,
+            high_detail=high_detail,
+            consent_id=consent_id
         )
         return result
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
+
+@app.post("/api/analyze-image/stream")
+async def analyze_image_stream(
+    file: UploadFile = File(...),
+    enable_face_recognition: bool = Form(False),
+    consent_provided: bool = Form(False),
+    analysis_purpose: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    high_detail: Optional[bool] = Form(None),
+    consent_token: Optional[str] = Form(None)
+):
+    """Analyze an image, streaming each node's result section as server-sent events
+    
+    Emits a "node" event per completed agent, then a "result" event with the
+    full OSINTResult, or an "error" event if the analysis fails.
+    """
+    consent_id, consent_expires_at = check_analysis_request(
+        file, enable_face_recognition, consent_provided, analysis_purpose, user_id, consent_token
+    )
+    image = ImageContext(await read_upload(file))
+    
+    async def event_stream():
+        try:
+            async for event, data in osint_workflow.stream_analysis(
+                image,
+                enable_face_recognition=enable_face_recognition,
+                consent_expires_at=consent_expires_at,
+                high_detail=high_detail,
+                consent_id=consent_id
+            ):
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/analyze-batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    enable_face_recognition: bool = Form(False),
+    consent_provided: bool = Form(False),
+    analysis_purpose: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    high_detail: Optional[bool] = Form(None),
+    consent_token: Optional[str] = Form(None)
+):
+    """Analyze many images or zip archives, streaming one NDJSON record per image
+    
+    Each line is a "result" or "error" record for one image; identical images
+    are analyzed once and reported with "duplicate_of". The last line is a
+    "summary" record.
+    """
+    # Consent covers the whole batch; file types are checked per entry
+    consent_id, consent_expires_at = check_face_recognition_consent(
+        enable_face_recognition, consent_provided, analysis_purpose, user_id, consent_token
+    )
+    
+    entries = iter_batch_entries(
+        ((file.filename, file.content_type, file.file) for file in files),
+        max_bytes=settings.MAX_UPLOAD_BYTES,
+        max_images=settings.BATCH_MAX_IMAGES
+    )
+    
+    async def record_stream():
+        async for record in run_batch(
+            osint_workflow,
+            entries,
+            concurrency=settings.BATCH_CONCURRENCY,
+            enable_face_recognition=enable_face_recognition,
+            consent_expires_at=consent_expires_at,
+            high_detail=high_detail,
+            consent_id=consent_id
+        ):
+            yield json.dumps(record, default=str) + "\n"
+    
+    return StreamingResponse(record_stream(), media_type="application/x-ndjson")
+
+@app.post("/api/anonymize")
+async def anonymize_image(
+    file: UploadFile = File(...),
+    mode: str = Form("blur"),
+    output_format: str = Form("jpeg")
+):
+    """Return the image with every face blurred or pixelated
+    
+    Face boxes from an earlier analysis of the same image are reused when
+    still cached. The response headers report the face count and whether
+    the boxes were cached or freshly detected.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    check_anonymize_options(mode, output_format)
+    image = ImageContext(await read_upload(file))
+    
+    try:
+        encoded, info = await osint_workflow.face_recognition_agent.anonymize_faces(
+            image, mode=mode, output_format=output_format
+        )
+    except Exception as e:
+        logger.error(f"Anonymization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return Response(
+        content=encoded,
+        media_type=info["media_type"],
+        headers={
+            "X-Faces-Anonymized": str(info["faces_anonymized"]),
+            "X-Detection-Source": info["detection_source"]
+        }
+    )
+
+@app.post("/api/anonymize-batch")
+async def anonymize_batch(
+    files: List[UploadFile] = File(...),
+    mode: str = Form("blur"),
+    output_format: str = Form("jpeg")
+):
+    """Anonymize many images or zip archives, streaming back a zip archive
+    
+    The archive holds one anonymized image per input image plus a
+    manifest.json with the face count or error for each.
+    """
+    check_anonymize_options(mode, output_format)
+    entries = iter_batch_entries(
+        ((file.filename, file.content_type, file.file) for file in files),
+        max_bytes=settings.MAX_UPLOAD_BYTES,
+        max_images=settings.BATCH_MAX_IMAGES
+    )
+    
+    return StreamingResponse(
+        stream_anonymized_zip(
+            osint_workflow.face_recognition_agent,
+            entries,
+            concurrency=settings.BATCH_CONCURRENCY,
+            mode=mode,
+            output_format=output_format
+        ),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="anonymized.zip"'}
+    )
+
+@app.post("/api/jobs", response_model=JobInfo, status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    enable_face_recognition: bool = Form(False),
+    consent_provided: bool = Form(False),
+    analysis_purpose: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    high_detail: Optional[bool] = Form(None),
+    consent_token: Optional[str] = Form(None)
+):
+    """Queue an image for background analysis and return its job id immediately"""
+    consent_id, consent_expires_at = check_analysis_request(
+        file, enable_face_recognition, consent_provided, analysis_purpose, user_id, consent_token
+    )
+    image = ImageContext(await read_upload(file))
+    
+    try:
+        return await job_manager.submit(
+            image,
+            enable_face_recognition=enable_face_recognition,
+            consent_expires_at=consent_expires_at,
+            high_detail=high_detail,
+            consent_id=consent_id
+        )
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Analysis queue is full, try again later")
+
+@app.get("/api/jobs/stats")
+async def job_stats():
+    """Job queue depth and worker usage"""
+    return job_manager.get_stats()
+
+@app.get("/api/jobs/{job_id}", response_model=JobInfo)
+async def get_analysis_job(job_id: str, wait: float = 0):
+    """Job status and result; wait > 0 long-polls until the job finishes"""
+    job = await job_manager.get(job_id, wait=min(max(wait, 0), settings.JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @app.post("/api/consent/validate")
 async def validate_consent(consent_form: ConsentForm):
@@ -98,14 +446,45 @@ async def revoke_consent(user_id: str, consent_id: str):
     """Revoke user consent"""
     success = consent_manager.revoke_consent(user_id, consent_id)
     if success:
+        if osint_workflow.face_gallery is not None:
+            # Faces stored under this consent must not outlive it
+            await asyncio.to_thread(osint_workflow.face_gallery.delete_consent, consent_id)
+        # Cached results and stored jobs carrying face data produced under this consent go with it
+        await asyncio.to_thread(osint_workflow.result_cache.invalidate_consent, consent_id)
+        await job_manager.delete_consent(consent_id)
         return {"message": "Consent revoked successfully"}
     else:
         raise HTTPException(status_code=400, detail="Failed to revoke consent")
 
+@app.get("/api/faces/pool/stats")
+async def face_pool_stats():
+    """Face worker pool queue depth and task counters"""
+    if osint_workflow.face_pool is None:
+        return {"workers": 0}
+    return osint_workflow.face_pool.get_stats()
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Result and LLM response cache hit/miss counters"""
+    return {
+        "results": osint_workflow.result_cache.get_stats(),
+        "llm_responses": osint_workflow.llm_cache.get_stats()
+    }
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "Image OSINT Tool"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Model loading state; 503 until warm-up finishes when FACE_MODEL_WARMUP is on"""
+    face_models = dict(osint_workflow.face_recognition_agent.model_status)
+    ready = not settings.FACE_MODEL_WARMUP or face_models["state"] == "ready"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "models": {"face_recognition": face_models}}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -2,19 +2,26 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+
 class MetadataInfo(BaseModel):
     camera_make: Optional[str] = None
     camera_model: Optional[str] = None
-    date_taken: Optional[datetime] = None
+    date_taken: Optional[datetime] = None  # EXIF DateTimeOriginal, falling back to the IFD0 DateTime
     gps_coordinates: Optional[Dict[str, float]] = None
     software: Optional[str] = None
     image_size: Optional[Dict[str, int]] = None
+    iptc: Optional[Dict[str, Any]] = None
+    xmp: Optional[str] = None
+    icc_profile: Optional[str] = None
+
 
 class ReverseSearchResult(BaseModel):
     source: str
     url: str
     title: Optional[str] = None
-    similarity_score: Optional[float] = None
+    similarity_score: Optional[float] = None  # rank-based score from the engines' hits, not pixel similarity
+    engines: List[str] = []
+
 
 class GeolocationInfo(BaseModel):
     latitude: Optional[float] = None
@@ -23,6 +30,7 @@ class GeolocationInfo(BaseModel):
     landmarks: List[str] = []
     confidence: Optional[float] = None
 
+
 class FaceInfo(BaseModel):
     face_id: str
     bounding_box: Dict[str, int]
@@ -33,12 +41,14 @@ class FaceInfo(BaseModel):
     face_encoding: Optional[List[float]] = None
     similar_faces_found: List[str] = []
 
+
 class FaceRecognitionResult(BaseModel):
     total_faces: int
     faces_detected: List[FaceInfo] = []
     consent_verified: bool
     processing_notes: List[str] = []
 
+
 class ImageAnalysis(BaseModel):
     objects_detected: List[str] = []
     faces_count: int = 0
@@ -47,6 +57,7 @@ class ImageAnalysis(BaseModel):
     image_quality: Optional[str] = None
     face_recognition: Optional[FaceRecognitionResult] = None
 
+
 class ConsentForm(BaseModel):
     user_id: str
     full_name: str
@@ -59,6 +70,14 @@ class ConsentForm(BaseModel):
     agreed_to_terms: bool
     timestamp: Optional[datetime] = None
 
+
+class PreviousMatch(BaseModel):
+    digest: str
+    phash_distance: int
+    dhash_distance: int
+    first_seen: datetime
+
+
 class OSINTResult(BaseModel):
     image_analysis: ImageAnalysis
     metadata: MetadataInfo
@@ -67,4 +86,17 @@ class OSINTResult(BaseModel):
     risk_assessment: Dict[str, Any] = {}
     processing_time: float
     report_summary: str
-    privacy_compliance: Dict[str, Any] = {}
\ No newline at end of file
+    privacy_compliance: Dict[str, Any] = {}
+    processing_stats: Dict[str, Any] = {}
+    previously_seen: List[PreviousMatch] = []
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed or failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    result: Optional[OSINTResult] = None
+    error: Optional[str] = None
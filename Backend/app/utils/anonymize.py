@@ -0,0 +1,55 @@
+from typing import List, Tuple
+import cv2
+import numpy as np
+
+ANONYMIZE_MODES = ("blur", "pixelate")
+OUTPUT_FORMATS = {"jpeg": (".jpg", "image/jpeg"), "png": (".png", "image/png"), "webp": (".webp", "image/webp")}
+
+# Side, in pixels, each face is shrunk to before blurring; fixes the cost per face
+BLUR_WORK_SIZE = 32
+
+def anonymize_regions(image: np.ndarray, boxes: List[Tuple[int, int, int, int]], mode: str = "blur",
+                      blocks: int = 12) -> np.ndarray:
+    """Blur or pixelate (top, right, bottom, left) regions of a BGR image in place
+
+    Both modes work on a small downscaled copy of each face, so their cost
+    does not grow with face size: "pixelate" upscales a blocks x blocks
+    thumbnail with nearest-neighbour, "blur" smooths a BLUR_WORK_SIZE
+    thumbnail and upscales it bilinearly.
+    """
+    if mode not in ANONYMIZE_MODES:
+        raise ValueError(f"Unknown anonymization mode {mode!r}, expected one of {', '.join(ANONYMIZE_MODES)}")
+
+    height, width = image.shape[:2]
+    for top, right, bottom, left in boxes:
+        top, left = max(0, int(top)), max(0, int(left))
+        bottom, right = min(height, int(bottom)), min(width, int(right))
+        if bottom <= top or right <= left:
+            continue
+        region = image[top:bottom, left:right]
+        size = (right - left, bottom - top)
+        if mode == "pixelate":
+            small = cv2.resize(region, (min(blocks, size[0]), min(blocks, size[1])), interpolation=cv2.INTER_AREA)
+            image[top:bottom, left:right] = cv2.resize(small, size, interpolation=cv2.INTER_NEAREST)
+        else:
+            small = cv2.resize(
+                region, (min(BLUR_WORK_SIZE, size[0]), min(BLUR_WORK_SIZE, size[1])), interpolation=cv2.INTER_AREA
+            )
+            small = cv2.GaussianBlur(small, (9, 9), 4)
+            image[top:bottom, left:right] = cv2.resize(small, size, interpolation=cv2.INTER_LINEAR)
+    return image
+
+def encode_image(image: np.ndarray, output_format: str = "jpeg", quality: int = 90) -> Tuple[bytes, str]:
+    """Encode a BGR image in memory; returns (bytes, media type)"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+    extension, media_type = OUTPUT_FORMATS[output_format]
+    params = []
+    if output_format == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif output_format == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    ok, encoded = cv2.imencode(extension, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {output_format}")
+    return encoded.tobytes(), media_type
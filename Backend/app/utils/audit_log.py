@@ -0,0 +1,256 @@
+import io
+import json
+import os
+import re
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("batch", "record")
+
+# audit-<YYYYMMDD>-<sequence>.jsonl, optionally .zst once rotated and compressed
+SEGMENT_PATTERN = re.compile(r"^audit-(\d{8})-(\d{6})\.jsonl(\.zst)?$")
+
+def _segment_name(day: date, sequence: int) -> str:
+    return f"audit-{day:%Y%m%d}-{sequence:06d}.jsonl"
+
+def _list_segments(directory: str) -> List[str]:
+    # Name order is chronological: date first, then sequence within the day
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if SEGMENT_PATTERN.match(name))
+
+def _compress_segment(path: str) -> bool:
+    """Replace a closed segment with its .zst version; False if zstandard is missing"""
+    try:
+        import zstandard
+    except ImportError:
+        return False
+    target = f"{path}.zst"
+    with open(path, "rb") as source, open(f"{target}.tmp", "wb") as destination:
+        zstandard.ZstdCompressor(level=10).copy_stream(source, destination)
+        destination.flush()
+        os.fsync(destination.fileno())
+    os.replace(f"{target}.tmp", target)
+    os.remove(path)
+    return True
+
+
+class AuditLogWriter:
+    """Append-only JSON Lines audit log, one record per line.
+
+    Records are buffered in memory and written by a background thread every
+    `flush_interval` seconds with a single fsync per batch; with durability
+    "record" each record is written and fsynced before write() returns
+    instead. The active segment is rotated once it reaches `max_bytes` or
+    the date changes, and rotated segments are compressed with zstd (when
+    the zstandard package is available) off the request path.
+    """
+
+    def __init__(self, directory: str = "consent_audit", durability: str = "batch",
+                 flush_interval: float = 1.0, max_bytes: int = 64 * 1024 * 1024,
+                 rotate_daily: bool = True, compress: bool = True, max_pending: int = 1000):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability!r}, expected one of {', '.join(DURABILITY_MODES)}")
+        self.directory = directory
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.max_pending = max_pending
+        self._pending: List[bytes] = []
+        self._pending_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._file = None
+        self._file_day: Optional[date] = None
+        self._file_size = 0
+        self._sequence = 0
+        self._to_compress: List[str] = []
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._warned_no_zstd = False
+        self._stats = {"written": 0, "flushes": 0, "rotations": 0, "compressed": 0, "errors": 0}
+
+    def write(self, record: Dict[str, Any]):
+        """Append one record; never reads or rewrites earlier records"""
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode()
+        self._ensure_thread()
+        if self.durability == "record":
+            with self._file_lock:
+                self._write_lines([line])
+            if self._to_compress:
+                self._wake.set()
+            return
+        with self._pending_lock:
+            self._pending.append(line)
+            backlog = len(self._pending)
+        if backlog >= self.max_pending:
+            self._wake.set()
+
+    def flush(self):
+        """Write and fsync everything buffered so far"""
+        with self._pending_lock:
+            lines, self._pending = self._pending, []
+        if lines:
+            try:
+                with self._file_lock:
+                    self._write_lines(lines)
+            except Exception:
+                # Put the batch back in front so the next flush retries it
+                with self._pending_lock:
+                    self._pending[:0] = lines
+                raise
+        self._compress_rotated()
+
+    def close(self):
+        """Stop the flush thread, write what is left and close the active segment"""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+        self.flush()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Record, flush and rotation counters plus the current backlog"""
+        return {**self._stats, "pending": len(self._pending)}
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name="audit-log-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the thread alive; the failed batch is still buffered
+                self._stats["errors"] += 1
+                logger.error(f"Audit log flush failed: {str(e)}")
+
+    def _write_lines(self, lines: List[bytes]):
+        # Caller holds _file_lock
+        for line in lines:
+            self._rotate_if_needed(len(line))
+            self._file.write(line)
+            self._file_size += len(line)
+            if self.durability == "record":
+                self._sync()
+        if self.durability == "batch":
+            self._sync()
+        self._stats["written"] += len(lines)
+        self._stats["flushes"] += 1
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rotate_if_needed(self, incoming: int):
+        today = date.today()
+        if self._file is None:
+            # The resumed segment may already be full, so it is checked like any other
+            self._resume(today)
+            self._open_segment(today)
+        too_big = self._file_size > 0 and self._file_size + incoming > self.max_bytes
+        new_day = self.rotate_daily and today != self._file_day
+        if not (too_big or new_day):
+            return
+        self._sync()
+        self._file.close()
+        self._to_compress.append(self._file.name)
+        self._stats["rotations"] += 1
+        self._sequence = self._sequence + 1 if today == self._file_day else 0
+        self._open_segment(today)
+
+    def _open_segment(self, today: date):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, _segment_name(today, self._sequence))
+        self._file = open(path, "ab")
+        self._file_size = self._file.tell()
+        self._file_day = today
+
+    def _resume(self, today: date):
+        # First write since start: continue today's last plain segment and queue
+        # any plain segments left over from earlier runs for compression
+        self._sequence = 0
+        for name in _list_segments(self.directory):
+            day, sequence, compressed = SEGMENT_PATTERN.match(name).groups()
+            if day == f"{today:%Y%m%d}":
+                self._sequence = max(self._sequence, int(sequence) + (1 if compressed else 0))
+        for name in _list_segments(self.directory):
+            if name.endswith(".jsonl") and name != _segment_name(today, self._sequence):
+                self._to_compress.append(os.path.join(self.directory, name))
+
+    def _compress_rotated(self):
+        if not self.compress:
+            self._to_compress = []
+            return
+        while self._to_compress:
+            path = self._to_compress.pop(0)
+            try:
+                if not _compress_segment(path):
+                    if not self._warned_no_zstd:
+                        logger.warning("zstandard is not installed; rotated audit segments stay uncompressed")
+                        self._warned_no_zstd = True
+                    self._to_compress = []
+                    return
+                self._stats["compressed"] += 1
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"Compressing audit segment {path} failed: {str(e)}")
+
+
+def iter_audit_records(directory: str = "consent_audit", since: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """Stream audit records across all segments, oldest first
+
+    Compressed segments are decompressed as they are read, so memory use
+    does not depend on the size of the log. With `since`, segments from
+    earlier days are skipped without being opened.
+    """
+    first_day = f"{since:%Y%m%d}" if since is not None else None
+    for name in _list_segments(directory):
+        if first_day is not None and SEGMENT_PATTERN.match(name).group(1) < first_day:
+            continue
+        path = os.path.join(directory, name)
+        if name.endswith(".zst"):
+            import zstandard
+            with open(path, "rb") as raw:
+                with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                    yield from _parse_lines(io.TextIOWrapper(reader, encoding="utf-8"), path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from _parse_lines(f, path)
+
+def _parse_lines(lines, path: str) -> Iterator[Dict[str, Any]]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            # A crash can leave a partial last line in the active segment
+            logger.warning(f"Skipping unreadable audit record {path}:{number}")
+
+
+if __name__ == "__main__":
+    # Dump the audit log as JSON Lines: python -m app.utils.audit_log [directory]
+    import sys
+    for audit_record in iter_audit_records(sys.argv[1] if len(sys.argv) > 1 else "consent_audit"):
+        print(json.dumps(audit_record))
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+import logging
+from .image_context import ImageContext
+from .anonymize import OUTPUT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+# Archive members treated as images; everything else is skipped
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".heic", ".heif"}
+
+@dataclass
+class BatchEntry:
+    """One image from a batch upload, or the reason it could not be read"""
+    name: str
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+
+
+def iter_batch_entries(uploads: Iterable[Tuple[str, str, BinaryIO]], max_bytes: int,
+                       max_images: int) -> Iterator[BatchEntry]:
+    """Yield the images in a batch upload one at a time
+
+    uploads are (filename, content_type, file) triples. Zip archives are
+    read member by member straight from the uploaded file, so only the image
+    currently being yielded is held in memory and nothing is extracted to disk.
+    """
+    count = 0
+    for filename, content_type, file in uploads:
+        if zipfile.is_zipfile(file):
+            file.seek(0)
+            entries = _iter_zip_entries(filename, file, max_bytes)
+        elif (content_type or "").startswith("image/"):
+            file.seek(0)
+            entries = iter([_read_entry(filename, file, max_bytes)])
+        else:
+            entries = iter([BatchEntry(filename, error="File must be an image or a zip archive")])
+
+        for entry in entries:
+            count += 1
+            if count > max_images:
+                yield BatchEntry(entry.name, error=f"Batch limit of {max_images} images reached")
+                return
+            yield entry
+
+
+def _iter_zip_entries(archive_name: str, file: BinaryIO, max_bytes: int) -> Iterator[BatchEntry]:
+    try:
+        with zipfile.ZipFile(file) as archive:
+            for info in archive.infolist():
+                name = f"{archive_name}/{info.filename}"
+                if info.is_dir() or os.path.basename(info.filename).startswith("."):
+                    continue
+                if os.path.splitext(info.filename)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                if info.file_size > max_bytes:
+                    yield BatchEntry(name, error="Image too large")
+                    continue
+                with archive.open(info) as member:
+                    yield _read_entry(name, member, max_bytes)
+    except (zipfile.BadZipFile, OSError) as e:
+        yield BatchEntry(archive_name, error=f"Could not read archive: {str(e)}")
+
+
+def _read_entry(name: str, file: BinaryIO, max_bytes: int) -> BatchEntry:
+    # Never trust the declared size; stop reading one byte past the limit
+    data = file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return BatchEntry(name, error="Image too large")
+    return BatchEntry(name, data=data)
+
+
+async def run_batch(workflow, entries: Iterator[BatchEntry], concurrency: int = 4,
+                    enable_face_recognition: bool = False,
+                    consent_expires_at: Optional[datetime] = None,
+                    high_detail: Optional[bool] = None,
+                    consent_id: Optional[str] = None) -> AsyncIterator[dict]:
+    """Analyze batch entries, yielding one record per image as each finishes
+
+    At most `concurrency` images are in flight, and entries are only read
+    once a slot is free. Images with the same content digest are analyzed
+    once and the duplicates reuse that result. The last record is a summary.
+    """
+    start_time = time.time()
+    records: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+    slots = asyncio.Semaphore(concurrency)
+    analyses: Dict[str, Tuple[str, asyncio.Task]] = {}
+    pending = []
+    summary = {"type": "summary", "images": 0, "analyzed": 0, "duplicates": 0, "failed": 0}
+
+    async def analyze(image: ImageContext) -> dict:
+        try:
+            result = await workflow.run_analysis(
+                image,
+                enable_face_recognition=enable_face_recognition,
+                consent_expires_at=consent_expires_at,
+                high_detail=high_detail,
+                consent_id=consent_id
+            )
+            return {"result": result.model_dump(mode="json")}
+        except Exception as e:
+            logger.error(f"Batch analysis of {image.digest} failed: {str(e)}")
+            return {"error": str(e)}
+        finally:
+            slots.release()
+
+    async def report(name: str, digest: str, task: asyncio.Task, duplicate_of: Optional[str] = None):
+        outcome = await task
+        record = {"type": "result", "name": name, "digest": digest, **outcome}
+        if duplicate_of is not None:
+            record["duplicate_of"] = duplicate_of
+        await records.put(record)
+
+    async def produce():
+        try:
+            while True:
+                await slots.acquire()
+                entry = await asyncio.to_thread(next, entries, None)
+                if entry is None:
+                    slots.release()
+                    break
+                summary["images"] += 1
+                if entry.error:
+                    slots.release()
+                    await records.put({"type": "error", "name": entry.name, "error": entry.error})
+                    continue
+
+                image = ImageContext(entry.data)
+                digest = await asyncio.to_thread(lambda: image.digest)
+                if digest in analyses:
+                    slots.release()
+                    original_name, task = analyses[digest]
+                    summary["duplicates"] += 1
+                    pending.append(asyncio.create_task(report(entry.name, digest, task, original_name)))
+                    continue
+
+                task = asyncio.create_task(analyze(image))
+                analyses[digest] = (entry.name, task)
+                pending.append(asyncio.create_task(report(entry.name, digest, task)))
+            await asyncio.gather(*pending)
+        except Exception as e:
+            logger.error(f"Batch failed: {str(e)}")
+            await records.put({"type": "error", "name": None, "error": str(e)})
+        finally:
+            await records.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (record := await records.get()) is not None:
+            if record["type"] == "error" or "error" in record:
+                summary["failed"] += 1
+            elif "duplicate_of" not in record:
+                summary["analyzed"] += 1
+            yield record
+    finally:
+        if not producer.done():
+            # Client went away; stop reading entries and cancel running analyses
+            producer.cancel()
+            for _, task in analyses.values():
+                task.cancel()
+            for task in pending:
+                task.cancel()
+
+    summary["processing_time"] = time.time() - start_time
+    yield summary
+
+
+class _ZipSink:
+    """Write-only file object that hands a ZipFile's output back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_anonymized_zip(agent, entries: Iterator[BatchEntry], concurrency: int = 4,
+                                mode: str = "blur", output_format: str = "jpeg") -> AsyncIterator[bytes]:
+    """Anonymize batch entries and stream them back as a zip archive
+
+    Each image is added to the archive as soon as it is done, and the
+    archive bytes are yielded as they are produced, so nothing is written
+    to disk and at most `concurrency` images are held at once. The archive
+    ends with manifest.json listing what happened to every entry.
+    """
+    sink = _ZipSink()
+    manifest = []
+    names = set()
+    extension = OUTPUT_FORMATS[output_format][0]
+
+    async def anonymize(entry: BatchEntry) -> Tuple[BatchEntry, Optional[bytes], dict]:
+        try:
+            encoded, info = await agent.anonymize_faces(ImageContext(entry.data), mode=mode,
+                                                        output_format=output_format)
+            return entry, encoded, info
+        except Exception as e:
+            logger.error(f"Anonymizing {entry.name} failed: {str(e)}")
+            return entry, None, {"error": str(e)}
+
+    def archive_name(name: str) -> str:
+        base = os.path.splitext(name)[0]
+        candidate, counter = base + extension, 1
+        while candidate in names:
+            counter += 1
+            candidate = f"{base}-{counter}{extension}"
+        names.add(candidate)
+        return candidate
+
+    pending = set()
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < concurrency:
+                    entry = await asyncio.to_thread(next, entries, None)
+                    if entry is None:
+                        exhausted = True
+                    elif entry.error:
+                        manifest.append({"name": entry.name, "error": entry.error})
+                    else:
+                        pending.add(asyncio.create_task(anonymize(entry)))
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    entry, encoded, info = task.result()
+                    if encoded is None:
+                        manifest.append({"name": entry.name, **info})
+                        continue
+                    name = archive_name(entry.name)
+                    # Already compressed images are stored as-is
+                    archive.writestr(name, encoded)
+                    info.pop("media_type", None)
+                    manifest.append({"name": entry.name, "archive_name": name, **info})
+                if chunk := sink.drain():
+                    yield chunk
+
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        yield sink.drain()
+    finally:
+        # Client went away; stop the images still being anonymized
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,98 @@
+import heapq
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ConsentKey = Tuple[str, str]
+
+class ConsentIndex:
+    """Active consents held in memory, keyed by (user_id, purpose) and ordered by expiry.
+
+    A dict gives O(1) lookups; a min-heap of (expiry, consent_id) lets
+    sweep() pop only the consents that are actually due. Revoked or replaced
+    consents are removed from the dict straight away and their heap entries
+    are skipped when they surface, with the heap rebuilt if stale entries
+    come to outnumber live ones. Expiries are kept as Unix seconds.
+    """
+
+    def __init__(self):
+        self._active: Dict[ConsentKey, Tuple[str, float]] = {}
+        self._keys: Dict[str, ConsentKey] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def load(self, consents: Iterable[Tuple[str, str, str, datetime]]):
+        """Replace the contents with (user_id, purpose, consent_id, expires_at) rows"""
+        active: Dict[ConsentKey, Tuple[str, float]] = {}
+        for user_id, purpose, consent_id, expires_at in consents:
+            key = (user_id, sys.intern(purpose))
+            expiry = expires_at.timestamp()
+            if key not in active or active[key][1] < expiry:
+                active[key] = (consent_id, expiry)
+        keys = {consent_id: key for key, (consent_id, _) in active.items()}
+        heap = [(expiry, consent_id) for consent_id, expiry in active.values()]
+        heapq.heapify(heap)
+        with self._lock:
+            self._active, self._keys, self._heap = active, keys, heap
+
+    def add(self, user_id: str, purpose: str, consent_id: str, expires_at: datetime):
+        """Index a consent, unless one expiring later is already held for the key"""
+        key = (user_id, sys.intern(purpose))
+        expiry = expires_at.timestamp()
+        with self._lock:
+            current = self._active.get(key)
+            if current is not None:
+                if current[1] >= expiry:
+                    return
+                self._keys.pop(current[0], None)
+            self._active[key] = (consent_id, expiry)
+            self._keys[consent_id] = key
+            heapq.heappush(self._heap, (expiry, consent_id))
+            self._compact_if_stale()
+
+    def get(self, user_id: str, purpose: str, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """{consent_id, expires_at} of the active consent for the key, if held and unexpired"""
+        entry = self._active.get((user_id, purpose))
+        if entry is None or entry[1] <= (now or datetime.now()).timestamp():
+            return None
+        return {"consent_id": entry[0], "expires_at": datetime.fromtimestamp(entry[1])}
+
+    def remove(self, consent_id: str) -> bool:
+        """Drop a consent (e.g. revoked); its heap entry is skipped later"""
+        with self._lock:
+            key = self._keys.pop(consent_id, None)
+            if key is None:
+                return False
+            del self._active[key]
+            self._compact_if_stale()
+        return True
+
+    def sweep(self, now: Optional[datetime] = None) -> List[str]:
+        """Remove every consent that has expired; returns their ids
+
+        Only heap entries that are due are touched, so the cost depends on how
+        many consents expired since the last sweep, not on the index size.
+        """
+        cutoff = (now or datetime.now()).timestamp()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= cutoff:
+                expiry, consent_id = heapq.heappop(self._heap)
+                key = self._keys.get(consent_id)
+                # Stale entry: consent revoked, replaced, or re-added with another expiry
+                if key is None or self._active[key] != (consent_id, expiry):
+                    continue
+                del self._keys[consent_id]
+                del self._active[key]
+                expired.append(consent_id)
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def _compact_if_stale(self):
+        # Caller holds _lock
+        if len(self._heap) > 2 * len(self._active) + 1024:
+            self._heap = [(expiry, consent_id) for consent_id, expiry in self._active.values()]
+            heapq.heapify(self._heap)
@@ -1,24 +1,29 @@
-import json
-import os
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 import hashlib
 import logging
+import uuid
 from ..models.schemas import ConsentForm
+from .audit_log import AuditLogWriter
+from .consent_index import ConsentIndex
+from .consent_store import ConsentStore, JSONConsentStore
+from .consent_token import ConsentClaims, ConsentRevocations, ConsentTokenSigner, InvalidConsentToken
 
 logger = logging.getLogger(__name__)
 
 class ConsentManager:
-    def __init__(self, consent_db_path: str = "consent_records.json"):
+    def __init__(self, consent_db_path: str = "consent_records.json", store: Optional[ConsentStore] = None,
+                 audit_log: Optional[AuditLogWriter] = None, token_signer: Optional[ConsentTokenSigner] = None):
         self.consent_db_path = consent_db_path
         self.logger = logging.getLogger(__name__)
-        self._ensure_consent_db()
-    
-    def _ensure_consent_db(self):
-        """Ensure consent database file exists"""
-        if not os.path.exists(self.consent_db_path):
-            with open(self.consent_db_path, 'w') as f:
-                json.dump({"consents": [], "version": "1.0"}, f)
+        self.store = store if store is not None else JSONConsentStore(consent_db_path)
+        self.audit_log = audit_log if audit_log is not None else AuditLogWriter()
+        self.token_signer = token_signer
+        self.revocations = ConsentRevocations(self.store)
+        self.revocations.refresh()
+        # Active consents, so the per-request consent check does not query the store
+        self.index = ConsentIndex()
+        self.index.load(self.store.iter_active(datetime.now()))
     
     def validate_consent(self, consent_form: ConsentForm) -> Dict[str, Any]:
         """Validate and store user consent"""
@@ -39,16 +44,8 @@ class ConsentManager:
             # Generate consent hash for tracking
             consent_hash = self._generate_consent_hash(consent_form)
             
-            # Check if consent already exists and is valid
-            existing_consent = self._check_existing_consent(consent_form.user_id, consent_form.purpose)
-            if existing_consent and existing_consent['valid']:
-                return {
-                    "valid": True, 
-                    "message": "Valid consent already exists",
-                    "consent_id": existing_consent['consent_id']
-                }
-            
-            # Store new consent
+            # Store new consent unless a valid one already exists; the store
+            # checks and inserts atomically, so concurrent requests cannot both insert
             consent_record = {
                 "consent_id": consent_hash,
                 "user_id": consent_form.user_id,
@@ -65,61 +62,88 @@ class ConsentManager:
                 "revoked": False
             }
             
-            self._store_consent(consent_record)
+            existing_consent = self.store.create_unless_active(consent_record, datetime.now())
+            if existing_consent:
+                self.index.add(consent_form.user_id, consent_form.purpose,
+                               existing_consent['consent_id'], existing_consent['expires_at'])
+                return {
+                    "valid": True, 
+                    "message": "Valid consent already exists",
+                    "consent_id": existing_consent['consent_id'],
+                    **self._issue_token(existing_consent['consent_id'], consent_form, existing_consent['expires_at'])
+                }
+            
+            self.index.add(consent_form.user_id, consent_form.purpose, consent_hash,
+                           datetime.fromisoformat(consent_record["expires_at"]))
+            self.logger.info(f"Consent recorded for user {consent_record['user_id']}")
             
             return {
                 "valid": True,
                 "consent_id": consent_hash,
                 "expires_at": consent_record["expires_at"],
-                "message": "Consent recorded successfully"
+                "message": "Consent recorded successfully",
+                **self._issue_token(consent_hash, consent_form, datetime.fromisoformat(consent_record["expires_at"]))
             }
             
         except Exception as e:
             self.logger.error(f"Consent validation failed: {str(e)}")
             return {"valid": False, "error": "Consent processing failed"}
     
+    def _issue_token(self, consent_id: str, consent_form: ConsentForm, expires_at: datetime) -> Dict[str, str]:
+        """The consent_token field for a validate response, when tokens are enabled"""
+        if self.token_signer is None:
+            return {}
+        token = self.token_signer.issue(consent_id, consent_form.user_id, consent_form.purpose, expires_at)
+        return {"consent_token": token}
+    
+    def verify_consent_token(self, token: str) -> ConsentClaims:
+        """Check a consent token without touching storage; raises InvalidConsentToken"""
+        if self.token_signer is None:
+            raise InvalidConsentToken("Consent tokens are not enabled")
+        claims = self.token_signer.verify(token)
+        if self.revocations.is_revoked(claims.consent_id):
+            raise InvalidConsentToken("Consent has been revoked")
+        return claims
+    
+    def refresh_revocations(self) -> int:
+        """Pull revocations made since the last refresh (e.g. by other workers)"""
+        try:
+            revoked = self.revocations.refresh()
+            for consent_id in revoked:
+                self.index.remove(consent_id)
+            return len(revoked)
+        except Exception as e:
+            self.logger.error(f"Refreshing consent revocations failed: {str(e)}")
+            return 0
+    
     def _generate_consent_hash(self, consent_form: ConsentForm) -> str:
         """Generate unique hash for consent record"""
-        consent_string = f"{consent_form.user_id}_{consent_form.purpose}_{datetime.now().date()}"
+        # Random per consent, so re-consenting after a revoke never reuses the revoked id
+        consent_string = f"{consent_form.user_id}_{consent_form.purpose}_{datetime.now().isoformat()}_{uuid.uuid4().hex}"
         return hashlib.sha256(consent_string.encode()).hexdigest()[:16]
     
     def _check_existing_consent(self, user_id: str, purpose: str) -> Optional[Dict[str, Any]]:
         """Check if valid consent already exists"""
         try:
-            with open(self.consent_db_path, 'r') as f:
-                db = json.load(f)
-            
-            for consent in db['consents']:
-                if (consent['user_id'] == user_id and 
-                    consent['purpose'] == purpose and 
-                    not consent['revoked']):
-                    
-                    # Check if consent is still valid (not expired)
-                    expires_at = datetime.fromisoformat(consent['expires_at'])
-                    if expires_at > datetime.now():
-                        return {"valid": True, "consent_id": consent['consent_id']}
-                    
+            existing_consent = self.index.get(user_id, purpose)
+            if existing_consent is None:
+                # Not indexed here, but another worker may have recorded it
+                existing_consent = self.store.find_active(user_id, purpose, datetime.now())
+                if existing_consent:
+                    self.index.add(user_id, purpose, existing_consent['consent_id'], existing_consent['expires_at'])
+            if existing_consent:
+                return {"valid": True, **existing_consent}
             return None
         except Exception as e:
             self.logger.error(f"Error checking existing consent: {str(e)}")
             return None
     
-    def _store_consent(self, consent_record: Dict[str, Any]):
-        """Store consent record in database"""
-        try:
-            with open(self.consent_db_path, 'r') as f:
-                db = json.load(f)
-            
-            db['consents'].append(consent_record)
-            
-            with open(self.consent_db_path, 'w') as f:
-                json.dump(db, f, indent=2)
-                
-            self.logger.info(f"Consent recorded for user {consent_record['user_id']}")
-            
-        except Exception as e:
-            self.logger.error(f"Error storing consent: {str(e)}")
-            raise
+    def get_active_consent(self, user_id: str, purpose: str) -> Optional[Dict[str, Any]]:
+        """Get the consent_id and expires_at of the active consent for a user and purpose"""
+        existing_consent = self._check_existing_consent(user_id, purpose)
+        if existing_consent and existing_consent['valid']:
+            return existing_consent
+        return None
     
     def log_consent(self, consent_info: Dict[str, Any]):
         """Log consent usage for audit purposes"""
@@ -133,18 +157,8 @@ class ConsentManager:
                 "consent_verified": consent_info.get("consent_provided", False)
             }
             
-            # Store audit log
-            audit_file = "consent_audit.json"
-            if os.path.exists(audit_file):
-                with open(audit_file, 'r') as f:
-                    audit_log = json.load(f)
-            else:
-                audit_log = {"audit_records": []}
-            
-            audit_log["audit_records"].append(audit_record)
-            
-            with open(audit_file, 'w') as f:
-                json.dump(audit_log, f, indent=2)
+            # Appended to the JSON Lines audit log; written out in the background
+            self.audit_log.write(audit_record)
                 
         except Exception as e:
             self.logger.error(f"Audit logging failed: {str(e)}")
@@ -152,19 +166,15 @@ class ConsentManager:
     def revoke_consent(self, user_id: str, consent_id: str) -> bool:
         """Revoke user consent"""
         try:
-            with open(self.consent_db_path, 'r') as f:
-                db = json.load(f)
-            
-            for consent in db['consents']:
-                if (consent['user_id'] == user_id and 
-                    consent['consent_id'] == consent_id):
-                    consent['revoked'] = True
-                    consent['revoked_at'] = datetime.now().isoformat()
-                    break
-            
-            with open(self.consent_db_path, 'w') as f:
-                json.dump(db, f, indent=2)
-            
+            expires_at = self.store.revoke(user_id, consent_id, datetime.now())
+            if expires_at is None:
+                self.logger.warning(f"No consent {consent_id} to revoke for user {user_id}")
+                return False
+            
+            # Tokens and index entries for this consent go away in this process right away;
+            # other workers pick the revocation up on their next refresh
+            self.index.remove(consent_id)
+            self.revocations.add(consent_id, expires_at)
             self.logger.info(f"Consent {consent_id} revoked for user {user_id}")
             return True
             
@@ -179,23 +189,12 @@ class ConsentManager:
     def cleanup_expired_consents(self):
         """Remove expired consent records"""
         try:
-            with open(self.consent_db_path, 'r') as f:
-                db = json.load(f)
-            
-            current_time = datetime.now()
-            active_consents = []
-            
-            for consent in db['consents']:
-                expires_at = datetime.fromisoformat(consent['expires_at'])
-                if expires_at > current_time or consent['revoked']:
-                    active_consents.append(consent)
-            
-            db['consents'] = active_consents
-            
-            with open(self.consent_db_path, 'w') as f:
-                json.dump(db, f, indent=2)
-                
-            self.logger.info("Expired consents cleaned up")
+            # The index pops only what is due; the store deletes through its expiry index
+            now = datetime.now()
+            expired = self.index.sweep(now)
+            removed = self.store.delete_expired(now)
+            if expired or removed:
+                self.logger.info(f"Expired consents cleaned up ({len(expired)} unindexed, {removed} removed)")
             
         except Exception as e:
-            self.logger.error(f"Consent cleanup failed: {str(e)}")
\ No newline at end of file
+            self.logger.error(f"Consent cleanup failed: {str(e)}")
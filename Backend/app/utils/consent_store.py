@@ -0,0 +1,338 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ConsentStore:
+    """Where consent records live.
+
+    Records are the dicts built by ConsentManager.validate_consent. The
+    manager only ever talks to this interface so the backend can be
+    swapped through CONSENT_STORE.
+    """
+
+    def create_unless_active(self, record: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        """Store record unless the user already has an active consent for the purpose
+
+        Returns the existing active consent ({consent_id, expires_at}), or None
+        once the new record has been stored. Check and insert are atomic.
+        """
+        raise NotImplementedError
+
+    def find_active(self, user_id: str, purpose: str, now: datetime) -> Optional[Dict[str, Any]]:
+        """The unrevoked, unexpired consent for a user and purpose, if any"""
+        raise NotImplementedError
+
+    def revoke(self, user_id: str, consent_id: str, revoked_at: datetime) -> Optional[datetime]:
+        """Mark a user's consent revoked; returns its expiry, or None if there is no such consent"""
+        raise NotImplementedError
+
+    def delete_expired(self, now: datetime) -> int:
+        """Remove expired consents that were never revoked; returns the count removed"""
+        raise NotImplementedError
+
+    def iter_active(self, now: datetime) -> Iterator[Tuple[str, str, str, datetime]]:
+        """(user_id, purpose, consent_id, expires_at) of every unrevoked, unexpired consent"""
+        raise NotImplementedError
+
+    def revocations_since(self, cursor: int) -> Tuple[List[Tuple[str, datetime]], int]:
+        """(consent_id, expires_at) of consents revoked after `cursor`, and the new cursor
+
+        Start from cursor 0 and pass back what was returned, so each call only
+        sees revocations it has not seen yet.
+        """
+        raise NotImplementedError
+
+
+class JSONConsentStore(ConsentStore):
+    """All consents in one JSON file, rewritten on every change"""
+
+    def __init__(self, path: str = "consent_records.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            self._write({"consents": [], "version": "1.0"})
+
+    def create_unless_active(self, record: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            db = self._read()
+            existing = self._find_active(db, record["user_id"], record["purpose"], now)
+            if existing is not None:
+                return existing
+            db["consents"].append(record)
+            self._write(db)
+        return None
+
+    def find_active(self, user_id: str, purpose: str, now: datetime) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._find_active(self._read(), user_id, purpose, now)
+
+    def revoke(self, user_id: str, consent_id: str, revoked_at: datetime) -> Optional[datetime]:
+        with self._lock:
+            db = self._read()
+            for consent in db["consents"]:
+                if consent["user_id"] == user_id and consent["consent_id"] == consent_id:
+                    consent["revoked"] = True
+                    consent["revoked_at"] = revoked_at.isoformat()
+                    self._write(db)
+                    return datetime.fromisoformat(consent["expires_at"])
+        return None
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock:
+            db = self._read()
+            kept = [
+                consent for consent in db["consents"]
+                if datetime.fromisoformat(consent["expires_at"]) > now or consent["revoked"]
+            ]
+            removed = len(db["consents"]) - len(kept)
+            db["consents"] = kept
+            self._write(db)
+        return removed
+
+    def iter_active(self, now: datetime) -> Iterator[Tuple[str, str, str, datetime]]:
+        with self._lock:
+            db = self._read()
+        for consent in db["consents"]:
+            expires_at = datetime.fromisoformat(consent["expires_at"])
+            if not consent["revoked"] and expires_at > now:
+                yield consent["user_id"], consent["purpose"], consent["consent_id"], expires_at
+
+    def revocations_since(self, cursor: int) -> Tuple[List[Tuple[str, datetime]], int]:
+        # The file has no revocation order, so every call returns them all
+        with self._lock:
+            db = self._read()
+        revoked = [
+            (consent["consent_id"], datetime.fromisoformat(consent["expires_at"]))
+            for consent in db["consents"] if consent["revoked"]
+        ]
+        return revoked, 0
+
+    def _find_active(self, db: dict, user_id: str, purpose: str, now: datetime) -> Optional[Dict[str, Any]]:
+        for consent in db["consents"]:
+            if consent["user_id"] == user_id and consent["purpose"] == purpose and not consent["revoked"]:
+                expires_at = datetime.fromisoformat(consent["expires_at"])
+                if expires_at > now:
+                    return {"consent_id": consent["consent_id"], "expires_at": expires_at}
+        return None
+
+    def _read(self) -> dict:
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _write(self, db: dict):
+        with open(self.path, "w") as f:
+            json.dump(db, f, indent=2)
+
+
+class SQLiteConsentStore(ConsentStore):
+    """Consent records in a SQLite file in WAL mode, indexed for each lookup"""
+
+    COLUMNS = ("consent_id", "user_id", "full_name", "email", "purpose", "consent_types", "duration_days",
+               "timestamp", "expires_at", "ip_address", "user_agent", "agreed_to_terms", "revoked", "revoked_at")
+
+    def __init__(self, db_path: str = "consents.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Transactions are opened explicitly, so check-then-insert can hold the write lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS consents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                consent_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                full_name TEXT,
+                email TEXT,
+                purpose TEXT NOT NULL,
+                consent_types TEXT,
+                duration_days INTEGER,
+                timestamp TEXT NOT NULL,
+                expires_at TEXT NOT NULL,
+                ip_address TEXT,
+                user_agent TEXT,
+                agreed_to_terms INTEGER NOT NULL DEFAULT 0,
+                revoked INTEGER NOT NULL DEFAULT 0,
+                revoked_at TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_consents_user_purpose ON consents (user_id, purpose)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_consents_consent_id ON consents (consent_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_consents_expires_at ON consents (expires_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS consent_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Append-only log of revocations; its id is the cursor for revocations_since
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS consent_revocations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                consent_id TEXT NOT NULL,
+                expires_at TEXT NOT NULL,
+                revoked_at TEXT NOT NULL
+            )
+        """)
+        if self._conn.execute("SELECT 1 FROM consent_revocations LIMIT 1").fetchone() is None:
+            # Databases created before the log existed may already hold revoked consents
+            self._conn.execute(
+                "INSERT INTO consent_revocations (consent_id, expires_at, revoked_at) "
+                "SELECT consent_id, expires_at, COALESCE(revoked_at, timestamp) FROM consents WHERE revoked = 1"
+            )
+
+    def create_unless_active(self, record: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so another process
+            # cannot insert between the check and the insert
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._find_active(record["user_id"], record["purpose"], now)
+                if existing is None:
+                    self._insert(record)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return existing
+
+    def find_active(self, user_id: str, purpose: str, now: datetime) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._find_active(user_id, purpose, now)
+
+    def revoke(self, user_id: str, consent_id: str, revoked_at: datetime) -> Optional[datetime]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expires_at = None
+                cursor = self._conn.execute(
+                    "UPDATE consents SET revoked = 1, revoked_at = COALESCE(revoked_at, ?) "
+                    "WHERE user_id = ? AND consent_id = ?",
+                    (revoked_at.isoformat(), user_id, consent_id)
+                )
+                if cursor.rowcount > 0:
+                    expires_at = self._conn.execute(
+                        "SELECT MAX(expires_at) FROM consents WHERE user_id = ? AND consent_id = ?",
+                        (user_id, consent_id)
+                    ).fetchone()[0]
+                    self._conn.execute(
+                        "INSERT INTO consent_revocations (consent_id, expires_at, revoked_at) VALUES (?, ?, ?)",
+                        (consent_id, expires_at, revoked_at.isoformat())
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return datetime.fromisoformat(expires_at) if expires_at is not None else None
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM consents WHERE expires_at <= ? AND revoked = 0", (now.isoformat(),)
+            )
+        return cursor.rowcount
+
+    def iter_active(self, now: datetime) -> Iterator[Tuple[str, str, str, datetime]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, purpose, consent_id, expires_at FROM consents WHERE revoked = 0 AND expires_at > ?",
+                (now.isoformat(),)
+            ).fetchall()
+        for user_id, purpose, consent_id, expires_at in rows:
+            yield user_id, purpose, consent_id, datetime.fromisoformat(expires_at)
+
+    def revocations_since(self, cursor: int) -> Tuple[List[Tuple[str, datetime]], int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, consent_id, expires_at FROM consent_revocations WHERE id > ? ORDER BY id", (cursor,)
+            ).fetchall()
+        if not rows:
+            return [], cursor
+        return [(row[1], datetime.fromisoformat(row[2])) for row in rows], rows[-1][0]
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """Copy every record from a JSON consent file once; returns the count copied
+
+        Runs in one transaction and is recorded in consent_meta, so calling it
+        again (or from another worker) does not duplicate records.
+        """
+        source = os.path.abspath(json_path)
+        with open(json_path, "r") as f:
+            records = json.load(f).get("consents", [])
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self._conn.execute(
+                    "SELECT 1 FROM consent_meta WHERE key = ?", (f"migrated:{source}",)
+                ).fetchone()
+                if done is None:
+                    for record in records:
+                        self._insert(record)
+                        if record.get("revoked"):
+                            self._conn.execute(
+                                "INSERT INTO consent_revocations (consent_id, expires_at, revoked_at) VALUES (?, ?, ?)",
+                                (record["consent_id"], record["expires_at"], record.get("revoked_at") or record["timestamp"])
+                            )
+                    self._conn.execute(
+                        "INSERT INTO consent_meta (key, value) VALUES (?, ?)",
+                        (f"migrated:{source}", datetime.now().isoformat())
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if done is not None:
+            return 0
+        logger.info(f"Migrated {len(records)} consent records from {json_path} to {self.db_path}")
+        return len(records)
+
+    def _find_active(self, user_id: str, purpose: str, now: datetime) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT consent_id, expires_at FROM consents "
+            "WHERE user_id = ? AND purpose = ? AND revoked = 0 AND expires_at > ? "
+            "ORDER BY expires_at DESC LIMIT 1",
+            (user_id, purpose, now.isoformat())
+        ).fetchone()
+        if row is None:
+            return None
+        return {"consent_id": row[0], "expires_at": datetime.fromisoformat(row[1])}
+
+    def _insert(self, record: Dict[str, Any]):
+        row = {column: record.get(column) for column in self.COLUMNS}
+        row["consent_types"] = json.dumps(row["consent_types"])
+        row["agreed_to_terms"] = int(bool(row["agreed_to_terms"]))
+        row["revoked"] = int(bool(row["revoked"]))
+        self._conn.execute(
+            f"INSERT INTO consents ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+            [row[column] for column in self.COLUMNS]
+        )
+
+
+def create_consent_store(backend: str, json_path: str = "consent_records.json",
+                         db_path: str = "consents.db") -> ConsentStore:
+    """Build the consent store selected by the CONSENT_STORE setting
+
+    The SQLite store imports an existing JSON consent file the first time
+    it sees it.
+    """
+    if backend == "sqlite":
+        logger.info(f"Using SQLite consent store at {db_path}")
+        store = SQLiteConsentStore(db_path)
+        if os.path.exists(json_path):
+            store.migrate_from_json(json_path)
+        return store
+    if backend != "json":
+        logger.warning(f"Unknown consent store '{backend}', using JSON store")
+    return JSONConsentStore(json_path)
+
+
+if __name__ == "__main__":
+    # One-shot migration: python -m app.utils.consent_store [consent_records.json] [consents.db]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    arguments = sys.argv[1:]
+    json_file = arguments[0] if arguments else "consent_records.json"
+    sqlite_file = arguments[1] if len(arguments) > 1 else "consents.db"
+    copied = SQLiteConsentStore(sqlite_file).migrate_from_json(json_file)
+    print(f"Copied {copied} consent records from {json_file} to {sqlite_file}")
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class InvalidConsentToken(ValueError):
+    """The token is malformed, forged, expired or revoked"""
+
+
+@dataclass
+class ConsentClaims:
+    consent_id: str
+    user_id: str
+    purpose: str
+    expires_at: datetime
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class ConsentTokenSigner:
+    """Issues and checks HMAC-SHA256 signed consent tokens.
+
+    A token is `<payload>.<signature>`, both base64url: the payload is the
+    compact JSON {c: consent_id, u: user_id, p: purpose, e: expiry as Unix
+    seconds}. Checking one needs only the secret, no storage lookup.
+    """
+
+    def __init__(self, secret: bytes):
+        self._secret = secret
+
+    def issue(self, consent_id: str, user_id: str, purpose: str, expires_at: datetime) -> str:
+        payload = json.dumps(
+            {"c": consent_id, "u": user_id, "p": purpose, "e": int(expires_at.timestamp())},
+            separators=(",", ":")
+        ).encode()
+        encoded = _b64encode(payload)
+        return f"{encoded}.{self._sign(encoded)}"
+
+    def verify(self, token: str, now: Optional[datetime] = None) -> ConsentClaims:
+        """Claims of a well-signed, unexpired token; raises InvalidConsentToken otherwise"""
+        encoded, _, signature = token.partition(".")
+        if not encoded or not signature or not hmac.compare_digest(signature, self._sign(encoded)):
+            raise InvalidConsentToken("Invalid consent token")
+        try:
+            payload = json.loads(_b64decode(encoded))
+            claims = ConsentClaims(
+                consent_id=payload["c"], user_id=payload["u"], purpose=payload["p"],
+                expires_at=datetime.fromtimestamp(payload["e"])
+            )
+        except (ValueError, KeyError, TypeError):
+            raise InvalidConsentToken("Invalid consent token")
+        if claims.expires_at <= (now or datetime.now()):
+            raise InvalidConsentToken("Consent token has expired")
+        return claims
+
+    def _sign(self, encoded: str) -> str:
+        return _b64encode(hmac.new(self._secret, encoded.encode(), hashlib.sha256).digest())
+
+
+class ConsentRevocations:
+    """In-memory set of revoked consent ids, kept in step with the consent store.
+
+    refresh() only asks the store for revocations recorded after the last one
+    it saw, so it stays cheap however many consents exist. Ids are dropped
+    once the consent would have expired anyway, since its tokens are then
+    rejected without the set.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._revoked: Dict[str, datetime] = {}
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def add(self, consent_id: str, expires_at: datetime):
+        """Record a revocation made by this process without waiting for refresh()"""
+        with self._lock:
+            self._revoked[consent_id] = expires_at
+
+    def refresh(self, now: Optional[datetime] = None) -> List[str]:
+        """Pull new revocations from the store; returns the newly revoked consent ids"""
+        now = now or datetime.now()
+        revocations, cursor = self.store.revocations_since(self._cursor)
+        with self._lock:
+            added = []
+            for consent_id, expires_at in revocations:
+                if expires_at > now:
+                    if consent_id not in self._revoked:
+                        added.append(consent_id)
+                    self._revoked[consent_id] = expires_at
+            self._cursor = cursor
+            for consent_id in [key for key, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[consent_id]
+        return added
+
+    def is_revoked(self, consent_id: str) -> bool:
+        return consent_id in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
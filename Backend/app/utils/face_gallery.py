@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FaceGallery:
+    """Persistent gallery of face embeddings with vectorized top-k search.
+
+    Embeddings are stored L2-normalized in one contiguous memory-mapped
+    matrix (float32 or float16), so cosine similarity against every stored
+    face is a single matrix product per chunk of rows. A SQLite side table
+    maps matrix rows to face ids and the consent each face was stored
+    under. Deleting a consent zeroes its rows, so they can never match
+    again, and rows whose consent has expired are masked out of searches.
+
+    Encodings whose length differs from the gallery dimension are reduced
+    with a fixed, seeded Gaussian random projection, which approximately
+    preserves cosine similarity.
+    """
+
+    def __init__(self, directory: str, dim: int = 256, dtype: str = "float32",
+                 chunk_rows: int = 65536):
+        self.directory = directory
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self._projections: Dict[int, np.ndarray] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._matrix_path = os.path.join(directory, "embeddings.bin")
+        self._conn = sqlite3.connect(os.path.join(directory, "faces.db"), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS faces (
+                row INTEGER PRIMARY KEY,
+                face_id TEXT NOT NULL UNIQUE,
+                consent_id TEXT,
+                image_digest TEXT,
+                expires_at REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_consent ON faces (consent_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS gallery_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO gallery_meta (key, value) VALUES ('layout', ?)", (f"{dim}:{self.dtype.name}",)
+        )
+        self._conn.commit()
+        (layout,) = self._conn.execute("SELECT value FROM gallery_meta WHERE key = 'layout'").fetchone()
+        if layout != f"{dim}:{self.dtype.name}":
+            raise ValueError(f"Face gallery in {directory} was created as {layout}, not {dim}:{self.dtype.name}")
+
+        (count,) = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM faces").fetchone()
+        self._count = count
+        self._expires_at = np.zeros(0, dtype=np.float64)
+        self._matrix = None
+        self._open_matrix(max(count, 1024))
+        if count:
+            expires = np.zeros(count, dtype=np.float64)
+            for row, expires_at in self._conn.execute("SELECT row, expires_at FROM faces"):
+                expires[row] = expires_at
+            self._expires_at[:count] = expires
+            logger.info(f"Loaded face gallery with {count} rows from {directory}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def normalize(self, encodings: Sequence[Sequence[float]]) -> np.ndarray:
+        """Project encodings to the gallery dimension and L2-normalize them"""
+        vectors = np.asarray(encodings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if vectors.shape[1] != self.dim:
+            vectors = vectors @ self._projection(vectors.shape[1])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add(self, encodings: Sequence[Sequence[float]], face_ids: List[str], expires_at: float,
+            consent_id: Optional[str] = None, image_digest: Optional[str] = None):
+        """Append faces; they stay searchable until expires_at or consent deletion"""
+        vectors = self.normalize(encodings)
+        now = time.time()
+        with self._lock:
+            start = self._count
+            end = start + len(face_ids)
+            if end > self._matrix.shape[0]:
+                self._open_matrix(max(end, 2 * self._matrix.shape[0]))
+            self._matrix[start:end] = vectors.astype(self.dtype)
+            self._matrix.flush()
+            self._expires_at[start:end] = expires_at
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO faces (row, face_id, consent_id, image_digest, expires_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (row, face_id, consent_id, image_digest, expires_at, now)
+                        for row, face_id in zip(range(start, end), face_ids)
+                    ]
+                )
+            self._count = end
+
+    def search(self, encodings: Sequence[Sequence[float]], top_k: int = 5,
+               threshold: float = 0.0) -> List[List[Tuple[str, float]]]:
+        """Top-k (face_id, cosine similarity) matches for each query encoding"""
+        queries = self.normalize(encodings)
+        with self._lock:
+            count = self._count
+            if count == 0 or len(queries) == 0:
+                return [[] for _ in range(len(queries))]
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            live = self._expires_at[:count] > time.time()
+
+            for start in range(0, count, self.chunk_rows):
+                end = min(start + self.chunk_rows, count)
+                # One product scores every query against the whole chunk
+                scores = queries @ np.asarray(self._matrix[start:end], dtype=np.float32).T
+                scores[:, ~live[start:end]] = -np.inf
+                k = min(top_k, end - start)
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+                best_rows = np.concatenate([best_rows, top + start], axis=1)
+                if best_scores.shape[1] > top_k:
+                    keep = np.argpartition(best_scores, -top_k, axis=1)[:, -top_k:]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            face_ids = self._face_ids(np.unique(best_rows[np.isfinite(best_scores)]))
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([
+                (face_ids[int(rows[i])], float(scores[i]))
+                for i in order
+                if np.isfinite(scores[i]) and scores[i] >= threshold and int(rows[i]) in face_ids
+            ])
+        return results
+
+    def delete_consent(self, consent_id: str) -> int:
+        """Erase every face stored under a consent; returns the count removed"""
+        with self._lock:
+            rows = [row for (row,) in self._conn.execute(
+                "SELECT row FROM faces WHERE consent_id = ?", (consent_id,)
+            )]
+            if not rows:
+                return 0
+            self._matrix[rows] = 0
+            self._matrix.flush()
+            self._expires_at[rows] = 0
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE faces SET face_id = 'deleted:' || row, consent_id = NULL, "
+                    "image_digest = NULL, expires_at = 0 WHERE consent_id = ?",
+                    (consent_id,)
+                )
+        logger.info(f"Deleted {len(rows)} gallery faces for consent {consent_id}")
+        return len(rows)
+
+    def _face_ids(self, rows: np.ndarray) -> Dict[int, str]:
+        face_ids = {}
+        rows = [int(row) for row in rows]
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            face_ids.update(self._conn.execute(
+                f"SELECT row, face_id FROM faces WHERE row IN ({', '.join('?' for _ in batch)}) "
+                "AND face_id NOT LIKE 'deleted:%'",
+                batch
+            ).fetchall())
+        return face_ids
+
+    def _projection(self, source_dim: int) -> np.ndarray:
+        if source_dim not in self._projections:
+            rng = np.random.default_rng(source_dim)
+            self._projections[source_dim] = (
+                rng.standard_normal((source_dim, self.dim)).astype(np.float32) / np.sqrt(self.dim)
+            )
+        return self._projections[source_dim]
+
+    def _open_matrix(self, capacity: int):
+        # Grow the backing file, then map it again at the new size
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        required = capacity * self.dim * self.dtype.itemsize
+        with open(self._matrix_path, "ab") as matrix_file:
+            if matrix_file.tell() < required:
+                matrix_file.truncate(required)
+        self._matrix = np.memmap(self._matrix_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        expires = np.zeros(capacity, dtype=np.float64)
+        expires[:len(self._expires_at)] = self._expires_at[:capacity]
+        self._expires_at = expires
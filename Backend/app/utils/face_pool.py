@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Optional, Tuple
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How long warm-up waits for every worker to start and load its models
+WARM_UP_TIMEOUT_SECONDS = 600
+
+# Per-process agent and warm-up barrier, set once by the pool initializer so models stay resident
+_worker_agent = None
+_worker_barrier = None
+
+def _init_worker(warm_up: bool, barrier):
+    global _worker_agent, _worker_barrier
+    # Imported here: the agent module imports this one
+    from ..agents.face_recognition_agent import FaceRecognitionAgent
+    _worker_agent = FaceRecognitionAgent()
+    _worker_barrier = barrier
+    if warm_up:
+        _worker_agent.warm_up()
+
+def _analyze_shared(shm_name: str, shape: Tuple[int, ...], dtype: str) -> Dict[str, Any]:
+    shm = SharedMemory(name=shm_name)
+    # Workers share the parent's resource tracker, and the parent unlinks the block
+    try:
+        # Copy out so no view outlives the mapping, whatever the analysis raises
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    return _worker_agent.analyze_faces_sync(image)
+
+def _worker_warm_up() -> Dict[str, Any]:
+    if _worker_agent.model_status["state"] != "ready":
+        # Pool created without warm-up, or loading failed in the initializer
+        _worker_agent.warm_up()
+    # Hold this worker until every other one has a warm-up task too, so no
+    # worker can take two of them and leave another one unchecked
+    _worker_barrier.wait(WARM_UP_TIMEOUT_SECONDS)
+    return dict(_worker_agent.model_status)
+
+
+class FaceWorkerPool:
+    """Runs the CPU-bound face pipeline in worker processes.
+
+    Each worker builds its own FaceRecognitionAgent once in the pool
+    initializer, and with warm_up also loads the models there, so every
+    worker (including ones started after a crash) has them resident before
+    its first task. Images are copied into a
+    shared memory block and only its name, shape and dtype are pickled.
+    Every task has a timeout; a task that is still queued when it expires
+    is cancelled, while one that is already running cannot be preempted and
+    is only counted.
+    """
+
+    def __init__(self, workers: int = 2, timeout_seconds: float = 60, warm_up: bool = False):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.warm_up_on_start = warm_up
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "restarts": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs threads (or TensorFlow) is unsafe
+                context = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.warm_up_on_start, context.Barrier(self.workers))
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = None
+                self._stats["restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def analyze(self, image: np.ndarray) -> Dict[str, Any]:
+        """Run FaceRecognitionAgent.analyze_faces_sync on a worker"""
+        executor = self._get_executor()
+        shm = SharedMemory(create=True, size=max(image.nbytes, 1))
+        self._in_flight += 1
+        self._stats["submitted"] += 1
+        try:
+            np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+            future = executor.submit(_analyze_shared, shm.name, image.shape, image.dtype.str)
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_seconds)
+            self._stats["completed"] += 1
+            return result
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"Face analysis did not finish within {self.timeout_seconds} seconds")
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start fresh processes for the next task
+            self._stats["failed"] += 1
+            self._restart(executor)
+            raise
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            shm.close()
+            shm.unlink()
+
+    def warm_up(self) -> Dict[str, Any]:
+        """Start every worker and load its models; returns the least ready status"""
+        executor = self._get_executor()
+        # The tasks wait on a barrier sized to the pool, so none of them can
+        # finish until each runs in its own worker: the pool has to start all of
+        # them, and every status returned comes from a different process
+        futures = [executor.submit(_worker_warm_up) for _ in range(self.workers)]
+        wait(futures)
+        statuses = [future.result() for future in futures]
+        failed = [status for status in statuses if status["state"] != "ready"]
+        return failed[0] if failed else statuses[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Worker count, queue depth and task counters"""
+        return {
+            **self._stats,
+            "workers": self.workers,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers)
+        }
+
+    def shutdown(self):
+        """Stop the worker processes, cancelling queued tasks"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
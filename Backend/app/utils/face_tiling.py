@@ -0,0 +1,79 @@
+from typing import List, Tuple
+import cv2
+import numpy as np
+
+# Mean subtracted by the OpenCV SSD face detector
+DETECTOR_MEAN = (104, 117, 123)
+
+def _grid(height: int, width: int, side: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    # Square tiles of `side` pixels overlapping by `overlap`, the last row and
+    # column aligned to the image edge
+    step = max(1, int(side * (1 - overlap)))
+    xs = list(range(0, max(width - side, 0) + 1, step))
+    ys = list(range(0, max(height - side, 0) + 1, step))
+    if xs[-1] + side < width:
+        xs.append(width - side)
+    if ys[-1] + side < height:
+        ys.append(height - side)
+    return [(x, y, min(side, width), min(side, height)) for y in ys for x in xs]
+
+def plan_tiles(height: int, width: int, tile_size: int = 600, overlap: float = 0.2,
+               max_tiles: int = 32) -> List[Tuple[int, int, int, int]]:
+    """(x, y, w, h) regions to run the detector on, coarsest scale first
+
+    The whole image is always the first region, so large faces are found at
+    full context. Candidate scales halve the tile side from half the image
+    down to about `tile_size`. Within `max_tiles`, the finest scale that fits
+    is kept first, since that is where small faces are found, then coarser
+    ones while they still fit. Small images therefore get a single pass.
+    On very large images the finest scales can need more tiles than the
+    cap allows, and those are skipped: raise `max_tiles` to reach `tile_size`.
+    """
+    levels = []
+    side = max(height, width) // 2
+    while side >= tile_size * 0.75:
+        levels.append(_grid(height, width, side, overlap))
+        side //= 2
+
+    budget = max_tiles - 1
+    chosen = []
+    for level in reversed(levels):
+        if len(level) <= budget:
+            chosen.append(level)
+            budget -= len(level)
+
+    tiles = [(0, 0, width, height)]
+    for level in reversed(chosen):
+        tiles.extend(level)
+    return tiles
+
+def detect_faces_tiled(net, image: np.ndarray, tiles: List[Tuple[int, int, int, int]],
+                       input_size: int = 300, confidence: float = 0.5,
+                       nms_threshold: float = 0.3) -> List[Tuple[int, int, int, int]]:
+    """Run an SSD face detector over every tile in one batch and merge the boxes
+
+    Returns (top, right, bottom, left) boxes in image coordinates after
+    non-maximum suppression across tiles and scales.
+    """
+    crops = [image[y:y + h, x:x + w] for x, y, w, h in tiles]
+    blob = cv2.dnn.blobFromImages(crops, 1.0, (input_size, input_size), DETECTOR_MEAN)
+    net.setInput(blob)
+    # DetectionOutput rows: [batch index, class, score, x1, y1, x2, y2], coordinates relative to the tile
+    detections = net.forward().reshape(-1, 7)
+    detections = detections[detections[:, 2] > confidence]
+    if len(detections) == 0:
+        return []
+
+    tile_boxes = np.asarray(tiles, dtype=np.float32)[detections[:, 0].astype(int)]
+    x1 = tile_boxes[:, 0] + np.clip(detections[:, 3], 0, 1) * tile_boxes[:, 2]
+    y1 = tile_boxes[:, 1] + np.clip(detections[:, 4], 0, 1) * tile_boxes[:, 3]
+    x2 = tile_boxes[:, 0] + np.clip(detections[:, 5], 0, 1) * tile_boxes[:, 2]
+    y2 = tile_boxes[:, 1] + np.clip(detections[:, 6], 0, 1) * tile_boxes[:, 3]
+
+    boxes = [[float(a), float(b), float(c - a), float(d - b)] for a, b, c, d in zip(x1, y1, x2, y2)]
+    scores = detections[:, 2].astype(float).tolist()
+    keep = np.asarray(cv2.dnn.NMSBoxes(boxes, scores, confidence, nms_threshold), dtype=int).ravel()
+    return [
+        (int(y1[i]), int(x2[i]), int(y2[i]), int(x1[i]))
+        for i in sorted(keep, key=lambda i: -scores[i])
+    ]
@@ -0,0 +1,84 @@
+import asyncio
+import random
+from typing import Optional
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+# httpx logs every request URL at INFO, query-string API keys included
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HTTPClient:
+    """Shared async HTTP client for calls to external services.
+
+    Wraps one httpx.AsyncClient so connections are pooled and kept alive
+    across agents and requests. Transport errors, timeouts and retryable
+    statuses are retried with exponential backoff and jitter; any other
+    non-2xx status raises httpx.HTTPStatusError.
+    """
+
+    def __init__(self, timeout: float = 15.0, connect_timeout: float = 5.0, max_retries: int = 2,
+                 backoff_seconds: float = 0.5, max_connections: int = 20,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so the pool belongs to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures; raises on error statuses"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_after(response) or self._backoff(attempt)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            return response
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_seconds * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _retry_after(self, response: httpx.Response) -> Optional[float]:
+        # Honour a numeric Retry-After, but never sleep longer than the call timeout
+        retry_after = response.headers.get("retry-after", "")
+        try:
+            return min(float(retry_after), self.timeout.read or 0.0)
+        except ValueError:
+            return None
@@ -0,0 +1,132 @@
+import io
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import cv2
+import numpy as np
+from PIL import Image
+from .image_metadata import ImageMetadata, parse_image_metadata, read_header_metadata
+from .image_utils import LLMImagePayload, compute_image_digest, prepare_llm_payload
+from .perceptual_hash import compute_hashes
+from ..config.settings import settings
+
+class ImageContext:
+    """One uploaded image, read once and decoded lazily for every agent.
+
+    Agents share the same instance for a request, so the file is read from
+    disk at most once and the pixel array, EXIF tags, digest and LLM payloads
+    are each computed on first use only.
+    """
+
+    def __init__(self, data: bytes, path: Optional[str] = None):
+        # BytesIO over an immutable bytes object shares its buffer, so the
+        # streams handed out below do not copy the image
+        self._bytes = bytes(data)
+        self.path = path
+        self._lock = threading.Lock()
+        self._value_locks: Dict[str, threading.Lock] = {}
+        self._lazy: Dict[str, Any] = {}
+
+    @classmethod
+    def from_path(cls, image_path: str) -> "ImageContext":
+        """Read an image file once into a new context"""
+        with open(image_path, "rb") as image_file:
+            return cls(image_file.read(), path=image_path)
+
+    @property
+    def data(self) -> memoryview:
+        """Raw encoded image bytes"""
+        return memoryview(self._bytes)
+
+    @property
+    def size(self) -> int:
+        return len(self._bytes)
+
+    def stream(self) -> io.BytesIO:
+        """A fresh file-like view over the raw bytes"""
+        return io.BytesIO(self._bytes)
+
+    @property
+    def digest(self) -> str:
+        """Content hash of the raw bytes"""
+        return self._get_lazy("digest", lambda: compute_image_digest(self._bytes))
+
+    @property
+    def array(self) -> np.ndarray:
+        """Read-only BGR pixel array, as cv2.imread would return it"""
+        def decode():
+            image = cv2.imdecode(np.frombuffer(self._bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("Could not decode image data")
+            # Shared between agents, so nobody may modify it in place
+            image.flags.writeable = False
+            return image
+        return self._get_lazy("array", decode)
+
+    @property
+    def metadata(self) -> ImageMetadata:
+        """EXIF, GPS, XMP, IPTC, ICC profile and thumbnail, read from the header only"""
+        def parse():
+            metadata = parse_image_metadata(self._bytes)
+            if metadata.format is None:
+                # Not a JPEG: PIL reads just the header until pixels are accessed
+                with self.open_image() as image:
+                    metadata = read_header_metadata(image)
+            return metadata
+        return self._get_lazy("metadata", parse)
+
+    @property
+    def perceptual_hashes(self) -> Tuple[int, int]:
+        """(pHash, dHash) for near-duplicate lookups"""
+        def compute():
+            with self.open_image() as image:
+                return compute_hashes(image)
+        return self._get_lazy("perceptual_hashes", compute)
+
+    @contextmanager
+    def as_path(self, suffix: str = ".jpg") -> Iterator[str]:
+        """Filesystem path for libraries that cannot read from memory
+        
+        Uses the original file when the context was loaded from one, otherwise
+        writes a temporary copy that is removed on exit.
+        """
+        if self.path and os.path.exists(self.path):
+            yield self.path
+            return
+        
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+            tmp_file.write(self._bytes)
+            tmp_path = tmp_file.name
+        try:
+            yield tmp_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    def open_image(self) -> Image.Image:
+        """Open the image with PIL; only the header is read until pixels are accessed"""
+        return Image.open(self.stream())
+
+    def llm_payload(self, high_detail: bool = False) -> LLMImagePayload:
+        """Encoded payload for vision models, built once per variant"""
+        return self._get_lazy(
+            f"llm_payload_{high_detail}",
+            lambda: prepare_llm_payload(
+                self._bytes,
+                max_edge=settings.LLM_IMAGE_MAX_EDGE,
+                quality=settings.LLM_IMAGE_QUALITY,
+                high_detail=high_detail
+            )
+        )
+
+    def _get_lazy(self, name: str, factory: Callable[[], Any]) -> Any:
+        # Agents may run in worker threads, so compute each value exactly once
+        # while letting different values be computed concurrently
+        with self._lock:
+            value_lock = self._value_locks.setdefault(name, threading.Lock())
+        with value_lock:
+            if name not in self._lazy:
+                self._lazy[name] = factory()
+            return self._lazy[name]
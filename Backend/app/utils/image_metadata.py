@@ -0,0 +1,262 @@
+import struct
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from PIL.ExifTags import GPSTAGS, TAGS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# TIFF pointer tags to the sub-IFDs that are followed
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+MAKER_NOTE = 0x927C
+THUMBNAIL_OFFSET = 0x0201
+THUMBNAIL_LENGTH = 0x0202
+
+# Tags exifread names differently from PIL
+EXIFREAD_TAG_NAMES = {THUMBNAIL_OFFSET: "JPEGInterchangeFormat", THUMBNAIL_LENGTH: "JPEGInterchangeFormatLength"}
+
+# TIFF field type -> (struct format, size in bytes)
+TIFF_TYPES = {
+    1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("I", 4), 5: ("II", 8), 6: ("b", 1),
+    7: ("s", 1), 8: ("h", 2), 9: ("i", 4), 10: ("ii", 8), 11: ("f", 4), 12: ("d", 8)
+}
+
+# Upper bound on entries read from one IFD, against corrupt counts
+MAX_IFD_ENTRIES = 512
+
+# IPTC IIM dataset numbers (record 2) worth reporting
+IPTC_TAGS = {
+    5: "object_name", 25: "keywords", 40: "special_instructions", 55: "date_created", 60: "time_created",
+    80: "by_line", 85: "by_line_title", 90: "city", 92: "sublocation", 95: "province_state",
+    100: "country_code", 101: "country", 105: "headline", 110: "credit", 115: "source",
+    116: "copyright_notice", 120: "caption", 122: "writer"
+}
+IPTC_REPEATABLE = {"keywords", "by_line", "by_line_title"}
+
+# Start-of-frame markers (all except DHT, JPG and DAC, which share the range)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+
+@dataclass
+class ImageMetadata:
+    """Header metadata of an image, collected without decoding any pixels"""
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    mode: Optional[str] = None
+    # Named as exifread does: "Image Make", "EXIF DateTimeOriginal", "Thumbnail Compression"
+    exif: Dict[str, Any] = field(default_factory=dict)
+    gps: Dict[str, Any] = field(default_factory=dict)
+    xmp: Optional[str] = None
+    iptc: Dict[str, Any] = field(default_factory=dict)
+    icc_profile: Optional[bytes] = None
+    thumbnail: Optional[bytes] = None
+    thumbnail_offset: Optional[int] = None
+    maker_note: Optional[bytes] = None
+    header_bytes: int = 0
+
+
+def parse_image_metadata(data, include_maker_note: bool = False) -> ImageMetadata:
+    """Read EXIF, GPS, XMP, IPTC, the ICC profile and the EXIF thumbnail in one pass
+
+    For JPEG only the marker segments before the start of scan are visited,
+    so the cost does not depend on the size of the compressed image data.
+    The MakerNote blob is skipped unless `include_maker_note` is set. Other
+    formats are left to read_header_metadata().
+    """
+    view = memoryview(data)
+    metadata = ImageMetadata()
+    if view[:2] != b"\xff\xd8":
+        return metadata
+
+    metadata.format = "JPEG"
+    icc_chunks: Dict[int, bytes] = {}
+    offset = 2
+    while offset + 4 <= len(view):
+        if view[offset] != 0xFF:
+            break
+        marker = view[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan: no more metadata segments
+            break
+        length = struct.unpack(">H", view[offset + 2:offset + 4])[0]
+        segment_offset = offset + 4
+        segment = view[segment_offset:offset + 2 + length]
+        offset += 2 + length
+
+        try:
+            if marker in SOF_MARKERS and len(segment) >= 6:
+                metadata.height, metadata.width = struct.unpack(">HH", segment[1:5])
+                metadata.mode = JPEG_MODES.get(segment[5])
+            elif marker == 0xE1 and segment[:6] == b"Exif\x00\x00":
+                _parse_tiff(segment[6:], metadata, include_maker_note, tiff_offset=segment_offset + 6)
+            elif marker == 0xE1 and segment[:29] == b"http://ns.adobe.com/xap/1.0/\x00":
+                metadata.xmp = bytes(segment[29:]).decode("utf-8", errors="replace")
+            elif marker == 0xE2 and segment[:12] == b"ICC_PROFILE\x00" and len(segment) > 14:
+                # Profiles over 64 KB are split across numbered APP2 chunks
+                icc_chunks[segment[12]] = bytes(segment[14:])
+            elif marker == 0xED and segment[:14] == b"Photoshop 3.0\x00":
+                metadata.iptc = _parse_photoshop_iptc(segment[14:])
+        except (struct.error, ValueError, IndexError) as e:
+            logger.warning(f"Skipping malformed JPEG segment 0x{marker:02X}: {str(e)}")
+
+    if icc_chunks:
+        metadata.icc_profile = b"".join(icc_chunks[index] for index in sorted(icc_chunks))
+    metadata.header_bytes = min(offset, len(view))
+    return metadata
+
+def read_header_metadata(image) -> ImageMetadata:
+    """Metadata of a non-JPEG image from an opened PIL image, which has only read its header"""
+    metadata = ImageMetadata(format=image.format, width=image.width, height=image.height, mode=image.mode)
+    exif = image.getexif()
+    for tag_id, value in exif.items():
+        if tag_id not in (EXIF_IFD_POINTER, GPS_IFD_POINTER):
+            metadata.exif[_exif_key("Image", tag_id)] = value
+    for tag_id, value in exif.get_ifd(EXIF_IFD_POINTER).items():
+        if tag_id != MAKER_NOTE:
+            metadata.exif[_exif_key("EXIF", tag_id)] = value
+    for tag_id, value in exif.get_ifd(GPS_IFD_POINTER).items():
+        metadata.gps[GPSTAGS.get(tag_id, str(tag_id))] = value
+    xmp = image.info.get("xmp") or image.info.get("XML:com.adobe.xmp")
+    if xmp:
+        metadata.xmp = xmp.decode("utf-8", errors="replace") if isinstance(xmp, bytes) else str(xmp)
+    metadata.icc_profile = image.info.get("icc_profile")
+    return metadata
+
+def icc_profile_description(profile: bytes) -> Optional[str]:
+    """The 'desc' tag of an ICC profile, e.g. 'sRGB IEC61966-2.1'"""
+    try:
+        count = struct.unpack(">I", profile[128:132])[0]
+        for index in range(min(count, 256)):
+            signature, offset, size = struct.unpack(">4sII", profile[132 + 12 * index:144 + 12 * index])
+            if signature != b"desc":
+                continue
+            element = profile[offset:offset + size]
+            if element[:4] == b"desc":
+                # ICC v2 textDescriptionType: ASCII length, then the string
+                length = struct.unpack(">I", element[8:12])[0]
+                return element[12:12 + length].rstrip(b"\x00").decode("latin-1")
+            if element[:4] == b"mluc":
+                # ICC v4 multiLocalizedUnicodeType: first record, UTF-16BE
+                length, start = struct.unpack(">II", element[20:28])
+                return element[start:start + length].decode("utf-16-be").rstrip("\x00")
+    except (struct.error, UnicodeDecodeError):
+        pass
+    return None
+
+def _exif_key(ifd_name: str, tag_id: int) -> str:
+    name = EXIFREAD_TAG_NAMES.get(tag_id) or TAGS.get(tag_id, f"Tag 0x{tag_id:04X}")
+    return f"{ifd_name} {name}"
+
+def _parse_tiff(tiff: memoryview, metadata: ImageMetadata, include_maker_note: bool, tiff_offset: int = 0):
+    byte_order = {b"II": "<", b"MM": ">"}.get(bytes(tiff[:2]))
+    if byte_order is None or struct.unpack(f"{byte_order}H", tiff[2:4])[0] != 42:
+        raise ValueError("Not a TIFF header")
+    visited = set()
+
+    ifd0, next_ifd = _read_ifd(tiff, byte_order, struct.unpack(f"{byte_order}I", tiff[4:8])[0], visited)
+    for tag_id, value in ifd0.items():
+        if tag_id not in (EXIF_IFD_POINTER, GPS_IFD_POINTER):
+            metadata.exif[_exif_key("Image", tag_id)] = value
+    if EXIF_IFD_POINTER in ifd0:
+        exif_ifd, _ = _read_ifd(tiff, byte_order, ifd0[EXIF_IFD_POINTER], visited,
+                                skip={MAKER_NOTE} if not include_maker_note else None)
+        maker_note = exif_ifd.pop(MAKER_NOTE, None)
+        if maker_note is not None:
+            # Stored as UNDEFINED by cameras, but some writers use BYTE
+            metadata.maker_note = maker_note if isinstance(maker_note, bytes) else bytes(maker_note)
+        for tag_id, value in exif_ifd.items():
+            metadata.exif[_exif_key("EXIF", tag_id)] = value
+    if GPS_IFD_POINTER in ifd0:
+        gps_ifd, _ = _read_ifd(tiff, byte_order, ifd0[GPS_IFD_POINTER], visited)
+        metadata.gps = {GPSTAGS.get(tag_id, str(tag_id)): value for tag_id, value in gps_ifd.items()}
+
+    if next_ifd:
+        # IFD1 describes the embedded thumbnail
+        ifd1, _ = _read_ifd(tiff, byte_order, next_ifd, visited)
+        for tag_id, value in ifd1.items():
+            metadata.exif[_exif_key("Thumbnail", tag_id)] = value
+        start, length = ifd1.get(THUMBNAIL_OFFSET), ifd1.get(THUMBNAIL_LENGTH)
+        if isinstance(start, int) and isinstance(length, int) and 0 < start and start + length <= len(tiff):
+            metadata.thumbnail = bytes(tiff[start:start + length])
+            metadata.thumbnail_offset = tiff_offset + start
+
+def _read_ifd(tiff: memoryview, byte_order: str, offset: int, visited: set,
+              skip: Optional[set] = None) -> Tuple[Dict[int, Any], int]:
+    # Returns ({tag id: value}, offset of the next IFD or 0)
+    if offset in visited or offset + 2 > len(tiff):
+        return {}, 0
+    visited.add(offset)
+    count = min(struct.unpack(f"{byte_order}H", tiff[offset:offset + 2])[0], MAX_IFD_ENTRIES)
+    entries: Dict[int, Any] = {}
+    for index in range(count):
+        entry = offset + 2 + 12 * index
+        if entry + 12 > len(tiff):
+            break
+        tag_id, field_type, components = struct.unpack(f"{byte_order}HHI", tiff[entry:entry + 8])
+        if field_type not in TIFF_TYPES or (skip and tag_id in skip):
+            continue
+        size = TIFF_TYPES[field_type][1] * components
+        if size <= 4:
+            start = entry + 8
+        else:
+            start = struct.unpack(f"{byte_order}I", tiff[entry + 8:entry + 12])[0]
+        if start + size > len(tiff):
+            continue
+        entries[tag_id] = _decode_value(tiff[start:start + size], byte_order, field_type, components)
+    end = offset + 2 + 12 * count
+    next_ifd = struct.unpack(f"{byte_order}I", tiff[end:end + 4])[0] if end + 4 <= len(tiff) else 0
+    return entries, next_ifd
+
+def _decode_value(raw: memoryview, byte_order: str, field_type: int, components: int) -> Any:
+    if field_type == 2:
+        return bytes(raw).split(b"\x00", 1)[0].decode("utf-8", errors="replace").strip()
+    if field_type == 7:
+        return bytes(raw)
+    fmt, _ = TIFF_TYPES[field_type]
+    values: List[Any] = list(struct.unpack(f"{byte_order}{fmt * components}", raw))
+    if field_type in (5, 10):
+        values = [
+            numerator / denominator if denominator else None
+            for numerator, denominator in zip(values[::2], values[1::2])
+        ]
+    return values[0] if len(values) == 1 else tuple(values)
+
+def _parse_photoshop_iptc(resources: memoryview) -> Dict[str, Any]:
+    # Photoshop image resources: '8BIM', id, padded Pascal name, size, padded data
+    offset = 0
+    while offset + 12 <= len(resources) and resources[offset:offset + 4] == b"8BIM":
+        resource_id = struct.unpack(">H", resources[offset + 4:offset + 6])[0]
+        name_length = resources[offset + 6]
+        offset += 6 + name_length + 1 + ((name_length + 1) % 2)
+        size = struct.unpack(">I", resources[offset:offset + 4])[0]
+        data = resources[offset + 4:offset + 4 + size]
+        offset += 4 + size + (size % 2)
+        if resource_id == 0x0404:
+            return _parse_iptc(data)
+    return {}
+
+def _parse_iptc(data: memoryview) -> Dict[str, Any]:
+    # IIM datasets: 0x1C, record, dataset, 2-byte size, value
+    iptc: Dict[str, Any] = {}
+    offset = 0
+    while offset + 5 <= len(data) and data[offset] == 0x1C:
+        record, dataset = data[offset + 1], data[offset + 2]
+        size = struct.unpack(">H", data[offset + 3:offset + 5])[0]
+        value = bytes(data[offset + 5:offset + 5 + size]).decode("utf-8", errors="replace")
+        offset += 5 + size
+        name = IPTC_TAGS.get(dataset) if record == 2 else None
+        if name in IPTC_REPEATABLE:
+            iptc.setdefault(name, []).append(value)
+        elif name:
+            iptc[name] = value
+    return iptc
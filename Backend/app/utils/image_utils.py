@@ -0,0 +1,114 @@
+import base64
+import io
+import time
+from dataclasses import dataclass
+from PIL import Image, ImageOps
+import xxhash
+
+# Formats Gemini accepts as inline image data
+LLM_SUPPORTED_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+
+
+@dataclass
+class LLMImagePayload:
+    """Encoded image ready to be inlined into a multimodal LLM request"""
+    mime_type: str
+    data: str
+    digest: str
+    variant: str
+    width: int
+    height: int
+    original_bytes: int
+    encoded_bytes: int
+    preprocess_seconds: float
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.data}"
+
+    @property
+    def cache_digest(self) -> str:
+        """Digest of the source image plus the encoding applied to it"""
+        return f"{self.digest}-{self.variant}"
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.encoded_bytes
+
+    def stats(self) -> dict:
+        return {
+            "mime_type": self.mime_type,
+            "variant": self.variant,
+            "width": self.width,
+            "height": self.height,
+            "original_bytes": self.original_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "bytes_saved": self.bytes_saved,
+            "preprocess_ms": round(self.preprocess_seconds * 1000, 2)
+        }
+
+
+def compute_image_digest(data: bytes) -> str:
+    """Fast content hash of the raw image bytes"""
+    return xxhash.xxh3_128_hexdigest(data)
+
+
+def prepare_llm_payload(image_bytes: bytes, max_edge: int = 1536, quality: int = 85,
+                        high_detail: bool = False) -> LLMImagePayload:
+    """Build the image payload sent to vision models
+
+    The image is orientation-corrected, downscaled so its long edge is at most
+    max_edge and re-encoded without metadata. In high-detail mode the original
+    bytes are sent unchanged (with their real MIME type) so small text keeps
+    its full resolution.
+    """
+    start_time = time.perf_counter()
+    digest = compute_image_digest(image_bytes)
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        mime_type = Image.MIME.get(img.format or "", "application/octet-stream")
+
+        if high_detail and mime_type in LLM_SUPPORTED_MIME_TYPES:
+            return LLMImagePayload(
+                mime_type=mime_type,
+                data=base64.b64encode(image_bytes).decode(),
+                digest=digest,
+                variant="original",
+                width=img.width,
+                height=img.height,
+                original_bytes=len(image_bytes),
+                encoded_bytes=len(image_bytes),
+                preprocess_seconds=time.perf_counter() - start_time
+            )
+
+        if not high_detail:
+            # Let the JPEG decoder scale down while decoding instead of afterwards
+            img.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(img)
+        if not high_detail:
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        buffer = io.BytesIO()
+        if has_alpha:
+            image.convert("RGBA").save(buffer, format="WEBP", quality=quality)
+            mime_type = "image/webp"
+        else:
+            image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+            mime_type = "image/jpeg"
+        encoded = buffer.getvalue()
+        width, height = image.size
+
+    variant = f"full-q{quality}" if high_detail else f"e{max_edge}-q{quality}"
+    return LLMImagePayload(
+        mime_type=mime_type,
+        data=base64.b64encode(encoded).decode(),
+        digest=digest,
+        variant=variant,
+        width=width,
+        height=height,
+        original_bytes=len(image_bytes),
+        encoded_bytes=len(encoded),
+        preprocess_seconds=time.perf_counter() - start_time
+    )
+
@@ -0,0 +1,187 @@
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+from .image_context import ImageContext
+from .job_store import JobStore
+from ..models.schemas import JobInfo
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+@dataclass
+class _QueuedJob:
+    job_id: str
+    image: ImageContext
+    enable_face_recognition: bool
+    consent_expires_at: Optional[datetime]
+    high_detail: Optional[bool]
+    consent_id: Optional[str]
+
+
+class JobManager:
+    """Runs analyses in the background on a fixed pool of workers.
+
+    Submitting only enqueues the image and returns a job id; at most
+    `workers` analyses run at a time and at most `queue_size` wait behind
+    them. Job state is written to the configured JobStore, while long-poll
+    waiters are woken through in-process events.
+    """
+
+    def __init__(self, workflow, store: JobStore, workers: int = 2, queue_size: int = 100,
+                 retention_seconds: int = 3600):
+        self.workflow = workflow
+        self.store = store
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self._queue: "asyncio.Queue[_QueuedJob]" = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._running = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def start(self):
+        """Start the worker tasks; safe to call more than once"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} analysis job workers")
+
+    async def fail_interrupted(self) -> int:
+        """Mark jobs a previous run left queued or running as failed
+        
+        Their workers died with that process, so without this a client
+        long-polling one would wait forever. Call at startup, before any
+        job is submitted; with several processes sharing a SQLite store this
+        also fails jobs the other processes are running.
+        """
+        interrupted = await asyncio.to_thread(
+            self.store.fail_unfinished, datetime.now(), "Analysis interrupted by a server restart"
+        )
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted analysis jobs as failed")
+        return interrupted
+
+    async def stop(self):
+        """Cancel the workers; queued jobs are abandoned"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, image: ImageContext, enable_face_recognition: bool = False,
+                     consent_expires_at: Optional[datetime] = None,
+                     high_detail: Optional[bool] = None, consent_id: Optional[str] = None) -> JobInfo:
+        """Queue an analysis; raises asyncio.QueueFull when the backlog is full"""
+        self.start()
+        if self._queue.full():
+            self._stats["rejected"] += 1
+            raise asyncio.QueueFull()
+
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.retention_seconds)
+        if enable_face_recognition and consent_expires_at is not None:
+            # Results holding face data must not outlive the consent behind them
+            expires_at = min(expires_at, consent_expires_at)
+
+        job = JobInfo(job_id=uuid.uuid4().hex, status="queued", created_at=now, expires_at=expires_at)
+        # Face results are tied to their consent so revoking it can remove them
+        await asyncio.to_thread(self.store.create, job, consent_id if enable_face_recognition else None)
+        self._done_events[job.job_id] = asyncio.Event()
+        self._queue.put_nowait(_QueuedJob(
+            job_id=job.job_id,
+            image=image,
+            enable_face_recognition=enable_face_recognition,
+            consent_expires_at=consent_expires_at,
+            high_detail=high_detail,
+            consent_id=consent_id
+        ))
+        self._stats["submitted"] += 1
+        return job
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[JobInfo]:
+        """Return a job's state, waiting up to `wait` seconds for it to finish"""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job.status in TERMINAL_STATUSES or wait <= 0:
+            return job
+
+        done_event = self._done_events.get(job_id)
+        if done_event is None:
+            # Queued by another process sharing the store; nothing to wait on here
+            return job
+        try:
+            await asyncio.wait_for(done_event.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def delete_expired(self) -> int:
+        """Remove jobs past their expiry from the store; returns the count removed"""
+        try:
+            removed = await asyncio.to_thread(self.store.delete_expired, datetime.now())
+        except Exception as e:
+            logger.warning(f"Failed to remove expired jobs: {str(e)}")
+            return 0
+        if removed:
+            logger.info(f"Removed {removed} expired analysis jobs")
+        return removed
+
+    async def delete_consent(self, consent_id: str) -> int:
+        """Remove the jobs, and so the face results, produced under a revoked consent
+        
+        A job still running under it finishes into a deleted record, so its
+        result is never stored.
+        """
+        removed = await asyncio.to_thread(self.store.delete_consent, consent_id)
+        if removed:
+            logger.info(f"Removed {removed} analysis jobs for revoked consent {consent_id}")
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        """Queue depth, busy workers and job counters"""
+        return {
+            **self._stats,
+            "queued": self._queue.qsize(),
+            "running": self._running,
+            "workers": self.workers
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            queued = await self._queue.get()
+            self._running += 1
+            try:
+                await self._run_job(queued)
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _run_job(self, queued: _QueuedJob):
+        await asyncio.to_thread(self.store.update, queued.job_id, status="running", started_at=datetime.now())
+        try:
+            result = await self.workflow.run_analysis(
+                queued.image,
+                enable_face_recognition=queued.enable_face_recognition,
+                consent_expires_at=queued.consent_expires_at,
+                high_detail=queued.high_detail,
+                consent_id=queued.consent_id
+            )
+            await asyncio.to_thread(
+                self.store.update, queued.job_id,
+                status="completed", finished_at=datetime.now(), result=result
+            )
+            self._stats["completed"] += 1
+        except Exception as e:
+            logger.error(f"Analysis job {queued.job_id} failed: {str(e)}")
+            await asyncio.to_thread(
+                self.store.update, queued.job_id,
+                status="failed", finished_at=datetime.now(), error=str(e)
+            )
+            self._stats["failed"] += 1
+        finally:
+            done_event = self._done_events.pop(queued.job_id, None)
+            if done_event is not None:
+                done_event.set()
@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+from ..models.schemas import JobInfo, OSINTResult
+
+logger = logging.getLogger(__name__)
+
+class JobStore:
+    """Where analysis job state lives.
+
+    Subclasses persist JobInfo records; the JobManager only ever talks to
+    this interface so the backend can be swapped through JOB_STORE.
+    """
+
+    def create(self, job: JobInfo, consent_id: Optional[str] = None):
+        """Store a new job; consent_id is the consent covering its face data, if any"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        raise NotImplementedError
+
+    def delete_expired(self, now: datetime) -> int:
+        """Remove jobs whose expires_at has passed; returns the count removed"""
+        raise NotImplementedError
+
+    def fail_unfinished(self, finished_at: datetime, error: str) -> int:
+        """Mark every queued or running job failed; returns the count marked"""
+        raise NotImplementedError
+
+    def delete_consent(self, consent_id: str) -> int:
+        """Remove every job run under a consent, with its face results; returns the count removed"""
+        raise NotImplementedError
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store, lost on restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, JobInfo] = {}
+        self._consents: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: JobInfo, consent_id: Optional[str] = None):
+        with self._lock:
+            self._jobs[job.job_id] = job
+            if consent_id is not None:
+                self._consents[job.job_id] = consent_id
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs[job_id] = job.model_copy(update=fields)
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.expires_at is not None and job.expires_at <= now
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._consents.pop(job_id, None)
+        return len(expired)
+
+    def fail_unfinished(self, finished_at: datetime, error: str) -> int:
+        with self._lock:
+            unfinished = [job_id for job_id, job in self._jobs.items() if job.status in ("queued", "running")]
+            for job_id in unfinished:
+                self._jobs[job_id] = self._jobs[job_id].model_copy(
+                    update={"status": "failed", "finished_at": finished_at, "error": error}
+                )
+        return len(unfinished)
+
+    def delete_consent(self, consent_id: str) -> int:
+        with self._lock:
+            job_ids = [job_id for job_id, job_consent in self._consents.items() if job_consent == consent_id]
+            for job_id in job_ids:
+                self._jobs.pop(job_id, None)
+                del self._consents[job_id]
+        return len(job_ids)
+
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a SQLite file, so job state survives restarts"""
+
+    COLUMNS = ("job_id", "status", "created_at", "started_at", "finished_at", "expires_at", "result", "error")
+
+    def __init__(self, db_path: str = "jobs.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                expires_at TEXT,
+                result TEXT,
+                error TEXT,
+                consent_id TEXT
+            )
+        """)
+        # Stores created before jobs recorded their consent
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "consent_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN consent_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_consent_id ON jobs (consent_id)")
+        self._conn.commit()
+
+    def create(self, job: JobInfo, consent_id: Optional[str] = None):
+        row = self._to_row(job.model_dump())
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}, consent_id) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)}, ?)",
+                [*(row[column] for column in self.COLUMNS), consent_id]
+            )
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(self.COLUMNS, row))
+        if record["result"] is not None:
+            record["result"] = OSINTResult.model_validate_json(record["result"])
+        return JobInfo.model_validate(record)
+
+    def update(self, job_id: str, **fields):
+        row = self._to_row(fields)
+        assignments = ", ".join(f"{column} = ?" for column in row)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?", [*row.values(), job_id]
+            )
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now.isoformat(),)
+            )
+        return cursor.rowcount
+
+    def fail_unfinished(self, finished_at: datetime, error: str) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                "WHERE status IN ('queued', 'running')",
+                (finished_at.isoformat(), error)
+            )
+        return cursor.rowcount
+
+    def delete_consent(self, consent_id: str) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE consent_id = ?", (consent_id,))
+        return cursor.rowcount
+
+    def _to_row(self, fields: dict) -> dict:
+        row = {}
+        for column, value in fields.items():
+            if column not in self.COLUMNS:
+                raise ValueError(f"Unknown job field: {column}")
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, OSINTResult):
+                value = value.model_dump_json()
+            elif isinstance(value, dict) and column == "result":
+                value = json.dumps(value, default=str)
+            row[column] = value
+        return row
+
+
+def create_job_store(backend: str, db_path: str = "jobs.db") -> JobStore:
+    """Build the job store selected by the JOB_STORE setting"""
+    if backend == "sqlite":
+        logger.info(f"Using SQLite job store at {db_path}")
+        return SQLiteJobStore(db_path)
+    if backend != "memory":
+        logger.warning(f"Unknown job store '{backend}', using in-memory store")
+    return InMemoryJobStore()
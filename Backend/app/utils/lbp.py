@@ -0,0 +1,95 @@
+from functools import lru_cache
+from typing import Tuple
+import numpy as np
+
+def n_bins(points: int, uniform: bool = True, rotation_invariant: bool = False) -> int:
+    """Number of distinct LBP labels for the given pattern settings"""
+    if uniform and rotation_invariant:
+        return points + 2
+    if uniform:
+        return points * (points - 1) + 3
+    return 1 << points
+
+@lru_cache(maxsize=None)
+def _neighbour_offsets(radius: float, points: int) -> Tuple[Tuple[float, float], ...]:
+    # (dy, dx) of each sample on the circle, counter-clockwise from the right;
+    # rounding keeps axis-aligned samples on exact pixels
+    angles = 2 * np.pi * np.arange(points) / points
+    return tuple(
+        (float(dy), float(dx))
+        for dy, dx in zip(np.round(-radius * np.sin(angles), 6), np.round(radius * np.cos(angles), 6))
+    )
+
+def _sample(padded: np.ndarray, pad: int, shape: Tuple[int, int], dy: float, dx: float) -> np.ndarray:
+    # Bilinear sample of the whole image shifted by (dy, dx), built from shifted views
+    height, width = shape
+    y0, x0 = int(np.floor(dy)), int(np.floor(dx))
+    fy, fx = dy - y0, dx - x0
+
+    def view(oy: int, ox: int) -> np.ndarray:
+        return padded[pad + oy:pad + oy + height, pad + ox:pad + ox + width]
+
+    if fy == 0 and fx == 0:
+        return view(y0, x0)
+    top = view(y0, x0) * (1 - fx) + view(y0, x0 + 1) * fx
+    if fy == 0:
+        return top
+    bottom = view(y0 + 1, x0) * (1 - fx) + view(y0 + 1, x0 + 1) * fx
+    return top * (1 - fy) + bottom * fy
+
+def lbp_codes(gray: np.ndarray, radius: float = 1, points: int = 8, uniform: bool = True,
+              rotation_invariant: bool = False) -> np.ndarray:
+    """Per-pixel LBP labels of a grayscale image
+
+    Each of `points` neighbours on a circle of `radius` is bilinearly sampled
+    for every pixel at once and compared against the centre. With `uniform`,
+    patterns with at most two 0/1 transitions keep a label of their own
+    (P * (P - 1) + 2 labels) and all others share one; adding
+    `rotation_invariant` collapses uniform patterns to their count of ones.
+    Without `uniform` the raw P-bit codes are returned.
+    """
+    gray = np.asarray(gray, dtype=np.float32)
+    pad = int(np.ceil(radius)) + 1
+    padded = np.pad(gray, pad, mode="edge")
+
+    # bits[k] is neighbour k >= centre, for every pixel
+    bits = np.stack([
+        _sample(padded, pad, gray.shape, dy, dx) >= gray
+        for dy, dx in _neighbour_offsets(float(radius), points)
+    ])
+
+    if not uniform:
+        weights = (1 << np.arange(points, dtype=np.int64)).reshape(-1, 1, 1)
+        return (bits * weights).sum(axis=0)
+
+    ones = bits.sum(axis=0)
+    transitions = (bits != np.roll(bits, 1, axis=0)).sum(axis=0)
+    is_uniform = transitions <= 2
+    if rotation_invariant:
+        return np.where(is_uniform, ones, points + 1)
+
+    # A uniform pattern is one run of ones; label it by run length and start
+    starts = np.argmax(bits & ~np.roll(bits, 1, axis=0), axis=0)
+    labels = np.where(ones == 0, 0, np.where(ones == points, 1, 2 + (ones - 1) * points + starts))
+    return np.where(is_uniform, labels, points * (points - 1) + 2)
+
+def lbp_histogram(gray: np.ndarray, radius: float = 1, points: int = 8, uniform: bool = True,
+                  rotation_invariant: bool = False, grid: Tuple[int, int] = (4, 4)) -> np.ndarray:
+    """Concatenated, L1-normalized LBP histograms over a grid of cells
+
+    Keeps the spatial layout of the texture (grid rows x columns cells), so
+    it works as a face descriptor of length rows * columns * n_bins.
+    """
+    codes = lbp_codes(gray, radius, points, uniform, rotation_invariant)
+    bins = n_bins(points, uniform, rotation_invariant)
+    rows, columns = grid
+    height, width = codes.shape
+
+    # Cell index of every pixel, so all histograms come from one bincount
+    cell_rows = np.minimum(np.arange(height) * rows // height, rows - 1)
+    cell_columns = np.minimum(np.arange(width) * columns // width, columns - 1)
+    cells = cell_rows[:, None] * columns + cell_columns[None, :]
+    hist = np.bincount((cells * bins + codes).ravel(), minlength=rows * columns * bins)
+    hist = hist.reshape(rows * columns, bins).astype(np.float32)
+    hist /= np.maximum(hist.sum(axis=1, keepdims=True), 1)
+    return hist.ravel()
@@ -0,0 +1,73 @@
+import copy
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str, str]
+
+class LLMResponseCache:
+    """Memoizes parsed LLM responses per agent.
+
+    Keys are (agent, model, prompt_version, input_digest) so one agent's
+    output is reused whenever its own inputs are unchanged, regardless of
+    what the rest of the pipeline did. Bumping an agent's PROMPT_VERSION
+    changes its keys, so stale responses are never hit again and simply age
+    out: entries are evicted LRU-first once either the entry count or the
+    approximate byte budget is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[int, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(agent: str, model: str, prompt_version: str, input_digest: str) -> CacheKey:
+        """Build the cache key for one agent call"""
+        return (agent, model, prompt_version, input_digest)
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """Return a copy of the cached response, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            value = entry[1]
+        # Callers are free to mutate what they get back
+        return copy.deepcopy(value)
+
+    def put(self, key: CacheKey, value: Any):
+        """Store a parsed response, evicting least recently used entries"""
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key[0]} response of {size} bytes")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[0]
+            self._entries[key] = (size, copy.deepcopy(value))
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current cache size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._total_bytes
+        return stats
@@ -0,0 +1,223 @@
+import itertools
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import logging
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+# 16-bit substrings for multi-index hashing
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+
+def _dct_matrix(size: int) -> np.ndarray:
+    # Orthonormal DCT-II basis, so a 2D DCT is two matrix products
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+_DCT_32 = _dct_matrix(32)
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+def dhash(gray: Image.Image) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail"""
+    pixels = np.asarray(gray.resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+def phash(gray: Image.Image) -> int:
+    """64-bit DCT hash: low 8x8 frequencies of a 32x32 thumbnail against their median"""
+    pixels = np.asarray(gray.resize((32, 32), Image.Resampling.BOX), dtype=np.float64)
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8]
+    # The DC term only reflects overall brightness, so leave it out of the median
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+def compute_hashes(image: Image.Image) -> Tuple[int, int]:
+    """(pHash, dHash) of a PIL image"""
+    # Hashes only need a tiny thumbnail, so let JPEG decode at reduced size
+    image.draft("L", (64, 64))
+    gray = image.convert("L")
+    return phash(gray), dhash(gray)
+
+@lru_cache(maxsize=None)
+def _probe_masks(radius: int) -> np.ndarray:
+    # Every substring XOR mask with at most `radius` bits set
+    return np.array([
+        sum(1 << bit for bit in bits)
+        for r in range(radius + 1)
+        for bits in itertools.combinations(range(CHUNK_BITS), r)
+    ], dtype=np.int64)
+
+
+@dataclass
+class HashMatch:
+    digest: str
+    phash_distance: int
+    dhash_distance: int
+    first_seen: float
+
+
+class PerceptualHashIndex:
+    """Persistent near-duplicate index over 64-bit perceptual hashes.
+
+    Uses multi-index hashing: each pHash is split into four 16-bit
+    substrings, and every substring gets a bucket table (row ids sorted by
+    substring value plus bucket offsets). By pigeonhole, a hash within
+    Hamming distance r of the query matches it within r // 4 bits on at
+    least one substring, so a query only probes a few buckets per table and
+    checks the candidates with a vectorized popcount. New entries go to a
+    small pending buffer that is scanned directly and folded into the
+    tables once it grows. Entries are persisted to SQLite and loaded at
+    startup.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, pending_limit: int = 4096):
+        self.db_path = db_path
+        self.pending_limit = pending_limit
+        self._lock = threading.Lock()
+        self._phashes = np.zeros(0, dtype=np.uint64)
+        self._dhashes = np.zeros(0, dtype=np.uint64)
+        self._first_seen = np.zeros(0, dtype=np.float64)
+        self._digests: List[str] = []
+        self._digest_rows = {}
+        self._indexed = 0
+        self._tables: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._conn = None
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS phash_index (
+                    digest TEXT PRIMARY KEY,
+                    phash INTEGER NOT NULL,
+                    dhash INTEGER NOT NULL,
+                    first_seen REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, digest: str, phash_value: int, dhash_value: int, first_seen: Optional[float] = None) -> bool:
+        """Add an image's hashes; returns False if the digest is already indexed"""
+        first_seen = first_seen or time.time()
+        with self._lock:
+            if digest in self._digest_rows:
+                return False
+            self._append([digest], [phash_value], [dhash_value], [first_seen])
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO phash_index (digest, phash, dhash, first_seen) VALUES (?, ?, ?, ?)",
+                        (digest, _to_signed(phash_value), _to_signed(dhash_value), first_seen)
+                    )
+            if len(self._digests) - self._indexed >= self.pending_limit:
+                self._rebuild_tables()
+        return True
+
+    def add_many(self, digests: List[str], phashes: np.ndarray, dhashes: np.ndarray,
+                 first_seen: Optional[np.ndarray] = None):
+        """Bulk load entries (not persisted); used by benchmarks and migrations"""
+        if first_seen is None:
+            first_seen = np.full(len(digests), time.time())
+        with self._lock:
+            self._append(digests, phashes, dhashes, first_seen)
+            self._rebuild_tables()
+
+    def search(self, phash_value: int, dhash_value: int, max_distance: int = 10,
+               limit: int = 10) -> List[HashMatch]:
+        """Indexed images within max_distance bits of the pHash, closest first"""
+        with self._lock:
+            candidates = self._candidates(phash_value, max_distance)
+            if candidates.size == 0:
+                return []
+            phash_distances = np.bitwise_count(self._phashes[candidates] ^ np.uint64(phash_value))
+            keep = phash_distances <= max_distance
+            candidates, phash_distances = candidates[keep], phash_distances[keep]
+            dhash_distances = np.bitwise_count(self._dhashes[candidates] ^ np.uint64(dhash_value))
+            order = np.lexsort((dhash_distances, phash_distances))[:limit]
+            return [
+                HashMatch(
+                    digest=self._digests[candidates[i]],
+                    phash_distance=int(phash_distances[i]),
+                    dhash_distance=int(dhash_distances[i]),
+                    first_seen=float(self._first_seen[candidates[i]])
+                )
+                for i in order
+            ]
+
+    def _candidates(self, phash_value: int, max_distance: int) -> np.ndarray:
+        pending = np.arange(self._indexed, len(self._digests))
+        if max_distance >= HASH_BITS // 2:
+            # Too loose for the substring tables to prune anything
+            return np.arange(len(self._digests))
+
+        masks = _probe_masks(max_distance // CHUNKS)
+        found = [pending]
+        for chunk, (rows, offsets) in enumerate(self._tables):
+            probes = ((phash_value >> (chunk * CHUNK_BITS)) & 0xFFFF) ^ masks
+            starts, lengths = offsets[probes], offsets[probes + 1] - offsets[probes]
+            total = int(lengths.sum())
+            if total:
+                # Gather every probed bucket at once: positions start + 0..length-1
+                bucket_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                found.append(rows[bucket_starts + np.arange(total)])
+        return np.unique(np.concatenate(found))
+
+    def _append(self, digests, phashes, dhashes, first_seen):
+        start = len(self._digests)
+        end = start + len(digests)
+        if end > len(self._phashes):
+            # Grow geometrically so single inserts stay amortized O(1)
+            capacity = max(end, 2 * len(self._phashes), 1024)
+            self._phashes = np.resize(self._phashes, capacity)
+            self._dhashes = np.resize(self._dhashes, capacity)
+            self._first_seen = np.resize(self._first_seen, capacity)
+        self._phashes[start:end] = np.asarray(phashes, dtype=np.uint64)
+        self._dhashes[start:end] = np.asarray(dhashes, dtype=np.uint64)
+        self._first_seen[start:end] = np.asarray(first_seen, dtype=np.float64)
+        self._digests.extend(digests)
+        for row, digest in enumerate(digests, start):
+            self._digest_rows[digest] = row
+
+    def _rebuild_tables(self):
+        tables = []
+        phashes = self._phashes[:len(self._digests)]
+        for chunk in range(CHUNKS):
+            values = ((phashes >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.int64)
+            rows = np.argsort(values, kind="stable")
+            offsets = np.zeros((1 << CHUNK_BITS) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(values, minlength=1 << CHUNK_BITS), out=offsets[1:])
+            tables.append((rows, offsets))
+        self._tables = tables
+        self._indexed = len(self._digests)
+
+    def _load(self):
+        rows = self._conn.execute("SELECT digest, phash, dhash, first_seen FROM phash_index").fetchall()
+        if not rows:
+            return
+        digests, phashes, dhashes, first_seen = zip(*rows)
+        self._append(
+            list(digests),
+            np.array(phashes, dtype=np.int64).view(np.uint64),
+            np.array(dhashes, dtype=np.int64).view(np.uint64),
+            first_seen
+        )
+        self._rebuild_tables()
+        logger.info(f"Loaded {len(rows)} perceptual hashes from {self.db_path}")
+
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
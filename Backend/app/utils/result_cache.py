@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import logging
+from ..models.schemas import OSINTResult
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """Content-addressed cache of OSINT results.
+
+    Entries live in a bounded in-memory LRU tier and, when a cache directory
+    is configured, in an on-disk tier that survives restarts. Every entry
+    carries its own expiry so results containing face data can be bounded by
+    the consent that allowed them to be produced.
+    """
+
+    def __init__(self, max_entries: int = 256, cache_dir: Optional[str] = None,
+                 ttl_seconds: int = 86400):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[float, OSINTResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(digest: str, enable_face_recognition: bool, pipeline_version: str,
+                 high_detail: bool = False, consent_id: Optional[str] = None) -> str:
+        """Build the cache key for an image digest and analysis options
+
+        Results with face data are keyed by the consent that allowed them, so
+        they are never served under another consent and can be dropped with it.
+        """
+        face_flag = "face1" if enable_face_recognition else "face0"
+        key = f"v{pipeline_version}-{digest}-{face_flag}"
+        if enable_face_recognition and consent_id:
+            key = f"{key}{ResultCache._consent_marker(consent_id)}"
+        return f"{key}-hd" if high_detail else key
+
+    def get(self, key: str) -> Optional[OSINTResult]:
+        """Return a cached result, checking memory first and then disk"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return result
+                del self._memory[key]
+
+        disk_entry = self._read_disk(key, now)
+        with self._lock:
+            if disk_entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._put_memory(key, *disk_entry)
+        return disk_entry[1]
+
+    def put(self, key: str, result: OSINTResult, expires_at: Optional[float] = None):
+        """Store a result; expires_at can only shorten the configured TTL"""
+        ttl_expiry = time.time() + self.ttl_seconds
+        expires_at = min(expires_at, ttl_expiry) if expires_at is not None else ttl_expiry
+
+        with self._lock:
+            self._put_memory(key, expires_at, result)
+            self._stats["stores"] += 1
+        self._write_disk(key, expires_at, result)
+
+    def invalidate(self, key: str):
+        """Drop a single entry from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        path = self._disk_path(key)
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+    def invalidate_consent(self, consent_id: str) -> int:
+        """Drop every entry produced under a consent; returns the count removed"""
+        marker = self._consent_marker(consent_id)
+        with self._lock:
+            keys = [key for key in self._memory if marker in key]
+            for key in keys:
+                del self._memory[key]
+        removed = set(keys)
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json") and marker in name:
+                    os.unlink(os.path.join(self.cache_dir, name))
+                    removed.add(name[:-len(".json")])
+        return len(removed)
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    os.unlink(os.path.join(self.cache_dir, name))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current memory tier size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def _consent_marker(consent_id: str) -> str:
+        return f"-consent-{consent_id}"
+
+    def _put_memory(self, key: str, expires_at: float, result: OSINTResult):
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, OSINTResult]]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            if entry["expires_at"] <= now:
+                os.unlink(path)
+                return None
+            return entry["expires_at"], OSINTResult.model_validate(entry["result"])
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, expires_at: float, result: OSINTResult):
+        path = self._disk_path(key)
+        if not path:
+            return
+        try:
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"expires_at": expires_at, "result": result.model_dump(mode="json")}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {key}: {str(e)}")
@@ -0,0 +1,82 @@
+"""Consent lookup and expiry sweep cost of the in-memory consent index at a million consents.
+
+Compares against the linear scan over all records that the JSON consent
+store does for every check.
+
+Run from the Backend directory: python -m benchmarks.consent_index_benchmark
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+from app.utils.consent_index import ConsentIndex
+
+PURPOSES = ["investigation", "research", "security", "verification"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--consents", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--scans", type=int, default=5)
+    parser.add_argument("--due", type=float, default=0.01, help="fraction of consents expiring before the sweep")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    # Expiries spread over 30 days after `now`; the first `due` fraction falls within the first minute
+    offsets = np.sort(rng.uniform(0, 30 * 86400, args.consents))
+    due = int(args.consents * args.due)
+    offsets[:due] = np.linspace(1, 60, due)
+    rng.shuffle(offsets)
+    rows = [
+        (f"user_{i}", PURPOSES[i % len(PURPOSES)], f"{i:016x}", now + timedelta(seconds=float(offset)))
+        for i, offset in enumerate(offsets)
+    ]
+
+    index = ConsentIndex()
+    start = time.perf_counter()
+    index.load(rows)
+    load_seconds = time.perf_counter() - start
+    # Measured on a second copy, since tracing slows the load down
+    tracemalloc.start()
+    ConsentIndex().load(rows)
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"Loaded {len(index)} consents in {load_seconds:.2f} s, {memory / 2**20:.0f} MiB peak")
+
+    users = rng.integers(0, args.consents, args.lookups)
+    start = time.perf_counter()
+    hits = sum(index.get(f"user_{i}", PURPOSES[i % len(PURPOSES)], now) is not None for i in users)
+    lookup_us = (time.perf_counter() - start) / args.lookups * 1e6
+    print(f"{args.lookups} lookups, {hits} hits: {lookup_us:.2f} us each")
+
+    # What the JSON store does per check: walk every record and parse its expiry
+    records = [
+        {"user_id": user_id, "purpose": purpose, "consent_id": consent_id, "revoked": False,
+         "expires_at": expires_at.isoformat()}
+        for user_id, purpose, consent_id, expires_at in rows
+    ]
+    start = time.perf_counter()
+    for i in users[:args.scans]:
+        user_id, purpose = f"user_{i}", PURPOSES[i % len(PURPOSES)]
+        for record in records:
+            if record["user_id"] == user_id and record["purpose"] == purpose and not record["revoked"]:
+                if datetime.fromisoformat(record["expires_at"]) > now:
+                    break
+    scan_ms = (time.perf_counter() - start) / args.scans * 1e3
+    print(f"Linear scan: {scan_ms:.1f} ms per lookup ({scan_ms * 1e3 / lookup_us:.0f}x slower)")
+
+    # Revoke 1% so the sweep also meets stale heap entries
+    for i in rng.choice(args.consents, args.consents // 100, replace=False):
+        index.remove(f"{i:016x}")
+    start = time.perf_counter()
+    expired = index.sweep(now + timedelta(seconds=61))
+    print(f"Sweep removed {len(expired)} due consents in {(time.perf_counter() - start) * 1e3:.1f} ms, "
+          f"{len(index)} left")
+    start = time.perf_counter()
+    index.sweep(now + timedelta(seconds=62))
+    print(f"Sweep with nothing due: {(time.perf_counter() - start) * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    main()
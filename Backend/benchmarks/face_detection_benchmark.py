@@ -0,0 +1,51 @@
+"""Cost and recall of tiled DNN face detection against a single 300x300 pass.
+
+Needs the OpenCV SSD face detector files the agent loads. Run from the
+Backend directory:
+    python -m benchmarks.face_detection_benchmark --image crowd.jpg
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.utils.face_tiling import plan_tiles, detect_faces_tiled
+
+def measure(net, image, tiles, runs: int):
+    faces = detect_faces_tiled(net, image, tiles)
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        detect_faces_tiled(net, image, tiles)
+        latencies.append(time.perf_counter() - start)
+    return faces, np.median(latencies) * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="opencv_face_detector_uint8.pb")
+    parser.add_argument("--config", default="opencv_face_detector.pbtxt")
+    parser.add_argument("--image", help="photo to count faces in; random noise at several sizes otherwise")
+    parser.add_argument("--tile-size", type=int, default=600)
+    parser.add_argument("--max-tiles", type=int, default=32)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    net = cv2.dnn.readNetFromTensorflow(args.model, args.config)
+    if args.image:
+        images = [(args.image, cv2.imread(args.image))]
+    else:
+        rng = np.random.default_rng(0)
+        images = [
+            (f"{width}x{height} noise", rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+            for width, height in [(640, 480), (2000, 1500), (4000, 3000), (8000, 6000)]
+        ]
+
+    for name, image in images:
+        height, width = image.shape[:2]
+        tiles = plan_tiles(height, width, args.tile_size, max_tiles=args.max_tiles)
+        single_faces, single_ms = measure(net, image, tiles[:1], args.runs)
+        tiled_faces, tiled_ms = measure(net, image, tiles, args.runs)
+        print(f"{name}: single pass {len(single_faces)} faces in {single_ms:.1f} ms, "
+              f"{len(tiles)} tiles {len(tiled_faces)} faces in {tiled_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Top-k search latency of the face gallery at a million faces.
+
+Run from the Backend directory: python -m benchmarks.face_gallery_benchmark
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.utils.face_gallery import FaceGallery
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--faces", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        gallery = FaceGallery(directory, dim=args.dim, dtype=args.dtype)
+        expires_at = time.time() + 3600
+        start = time.perf_counter()
+        batch = 100_000
+        for offset in range(0, args.faces, batch):
+            count = min(batch, args.faces - offset)
+            embeddings = rng.standard_normal((count, args.dim)).astype(np.float32)
+            gallery.add(embeddings, [f"face-{offset + i}" for i in range(count)], expires_at, consent_id="bench")
+        print(f"Stored {args.faces} {args.dtype} embeddings in {time.perf_counter() - start:.2f} s")
+
+        # Queries are noisy copies of stored faces, so each has a true match
+        targets = rng.integers(0, args.faces, args.queries)
+        latencies = []
+        found = 0
+        for target in targets:
+            stored = np.asarray(gallery._matrix[target], dtype=np.float32)
+            query = stored + rng.normal(0, 0.02, args.dim).astype(np.float32)
+            start = time.perf_counter()
+            matches = gallery.search([query], top_k=args.top_k)[0]
+            latencies.append(time.perf_counter() - start)
+            found += bool(matches) and matches[0][0] == f"face-{target}"
+
+        latencies_ms = np.array(latencies) * 1e3
+        print(f"{args.queries} top-{args.top_k} queries, {found} found their source face")
+        print(f"p50 {np.percentile(latencies_ms, 50):.1f} ms, p99 {np.percentile(latencies_ms, 99):.1f} ms, "
+              f"max {latencies_ms.max():.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Import-time budget for the API: fails if importing app.main is too slow
+or eagerly pulls in a heavyweight optional dependency.
+
+Run from the Backend directory: python -m benchmarks.import_time_check
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Loaded on first use only; importing any of these at startup is a regression
+LAZY_MODULES = ("deepface", "tensorflow", "keras", "torch")
+
+CHECK_SCRIPT = (
+    "import sys, app.main; "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=5.0, help="seconds allowed for importing app.main")
+    parser.add_argument("--top", type=int, default=10, help="slowest root packages to list")
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=backend_dir)
+    env.setdefault("GOOGLE_API_KEY", "import-time-check")
+
+    # Run in a scratch directory so the app's local stores are not touched
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHECK_SCRIPT],
+            cwd=directory, env=env, capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        print(completed.stderr[-2000:])
+        sys.exit(f"Importing app.main failed with exit code {completed.returncode}")
+
+    # -X importtime lines: "import time: self [us] | cumulative | package";
+    # report third-party root packages wherever in the tree they were first imported
+    top_level = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        package = package.strip()
+        if "." not in package and package != "app" and not package.startswith("_"):
+            top_level.append((int(cumulative), package))
+    top_level.sort(reverse=True)
+
+    print(f"Imported app.main in {elapsed:.2f} s (budget {args.budget:.2f} s)")
+    for cumulative, package in top_level[:args.top]:
+        print(f"  {cumulative / 1e6:6.2f} s  {package}")
+
+    eager = [module for module in completed.stdout.strip().split(",") if module]
+    if eager:
+        sys.exit(f"Heavyweight modules imported at startup: {', '.join(eager)}")
+    if elapsed > args.budget:
+        sys.exit(f"Import time {elapsed:.2f} s exceeds the {args.budget:.2f} s budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Query latency of the perceptual-hash index at a million entries.
+
+Run from the Backend directory: python -m benchmarks.phash_index_benchmark
+"""
+import argparse
+import time
+import numpy as np
+from app.utils.perceptual_hash import PerceptualHashIndex
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--distance", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    phashes = rng.integers(0, 2 ** 64, args.entries, dtype=np.uint64)
+    dhashes = rng.integers(0, 2 ** 64, args.entries, dtype=np.uint64)
+
+    index = PerceptualHashIndex()
+    start = time.perf_counter()
+    index.add_many([f"{i:032x}" for i in range(args.entries)], phashes, dhashes)
+    print(f"Indexed {args.entries} hashes in {time.perf_counter() - start:.2f} s")
+
+    # Half the queries are planted near-duplicates, half random misses
+    targets = rng.integers(0, args.entries, args.queries)
+    queries = []
+    for i, target in enumerate(targets):
+        if i % 2:
+            queries.append(int(rng.integers(0, 2 ** 64, dtype=np.uint64)))
+        else:
+            flips = rng.choice(64, size=rng.integers(0, args.distance + 1), replace=False)
+            queries.append(int(phashes[target]) ^ int(sum(1 << int(bit) for bit in flips)))
+
+    latencies = []
+    found = 0
+    for query in queries:
+        start = time.perf_counter()
+        found += bool(index.search(query, 0, max_distance=args.distance))
+        latencies.append(time.perf_counter() - start)
+
+    latencies_us = np.array(latencies) * 1e6
+    print(f"{args.queries} queries at distance <= {args.distance}, {found} with matches")
+    print(f"p50 {np.percentile(latencies_us, 50):.0f} us, p99 {np.percentile(latencies_us, 99):.0f} us, "
+          f"max {latencies_us.max():.0f} us")
+
+if __name__ == "__main__":
+    main()
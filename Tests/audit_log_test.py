@@ -0,0 +1,224 @@
+import os
+import time
+from datetime import date, datetime
+import pytest
+from app.utils import audit_log
+from app.utils.audit_log import AuditLogWriter, iter_audit_records
+
+
+class FakeDate(date):
+    """date whose today() the test controls"""
+    current = date(2026, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(audit_log, "date", FakeDate)
+    FakeDate.current = date(2026, 3, 1)
+    return FakeDate
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = os.fsync
+
+    def counting_fsync(fd):
+        calls.append(fd)
+        real_fsync(fd)
+
+    monkeypatch.setattr(audit_log.os, "fsync", counting_fsync)
+    return calls
+
+
+def make_writer(directory, **kwargs) -> AuditLogWriter:
+    # A long flush interval so only explicit flush() and close() calls write batches
+    options = {"flush_interval": 3600, "compress": False, **kwargs}
+    return AuditLogWriter(str(directory), **options)
+
+
+def segments(directory):
+    return sorted(os.listdir(directory))
+
+
+def record(number):
+    return {"user_id": f"user_{number}", "action": "face_recognition", "number": number}
+
+
+def test_records_round_trip_in_order(tmp_path, clock):
+    writer = make_writer(tmp_path)
+    for number in range(5):
+        writer.write(record(number))
+    writer.close()
+
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == list(range(5))
+    assert segments(tmp_path) == ["audit-20260301-000000.jsonl"]
+
+
+def test_rotates_by_size(tmp_path, clock):
+    line_bytes = len(b'{"user_id":"user_0","action":"face_recognition","number":0}\n')
+    writer = make_writer(tmp_path, max_bytes=line_bytes * 2)
+    for number in range(5):
+        writer.write(record(number))
+    writer.close()
+
+    assert segments(tmp_path) == [
+        "audit-20260301-000000.jsonl", "audit-20260301-000001.jsonl", "audit-20260301-000002.jsonl"
+    ]
+    assert writer.get_stats()["rotations"] == 2
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == list(range(5))
+
+
+def test_record_larger_than_max_bytes_gets_its_own_segment(tmp_path, clock):
+    writer = make_writer(tmp_path, max_bytes=10)
+    writer.write(record(0))
+    writer.write(record(1))
+    writer.close()
+
+    assert len(segments(tmp_path)) == 2
+
+
+def test_rotates_at_midnight(tmp_path, clock):
+    writer = make_writer(tmp_path)
+    writer.write(record(0))
+    writer.flush()
+    clock.current = date(2026, 3, 2)
+    writer.write(record(1))
+    writer.close()
+
+    assert segments(tmp_path) == ["audit-20260301-000000.jsonl", "audit-20260302-000000.jsonl"]
+    since = [entry["number"] for entry in iter_audit_records(str(tmp_path), since=datetime(2026, 3, 2))]
+    assert since == [1]
+
+
+def test_daily_rotation_can_be_disabled(tmp_path, clock):
+    writer = make_writer(tmp_path, rotate_daily=False)
+    writer.write(record(0))
+    writer.flush()
+    clock.current = date(2026, 3, 2)
+    writer.write(record(1))
+    writer.close()
+
+    assert segments(tmp_path) == ["audit-20260301-000000.jsonl"]
+
+
+def test_restart_appends_to_todays_segment(tmp_path, clock):
+    first = make_writer(tmp_path)
+    first.write(record(0))
+    first.close()
+
+    second = make_writer(tmp_path)
+    second.write(record(1))
+    second.close()
+
+    assert segments(tmp_path) == ["audit-20260301-000000.jsonl"]
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == [0, 1]
+
+
+def test_restart_continues_sequence_after_rotated_segments(tmp_path, clock):
+    pytest.importorskip("zstandard")
+    line_bytes = len(b'{"user_id":"user_0","action":"face_recognition","number":0}\n')
+    first = make_writer(tmp_path, max_bytes=line_bytes, compress=True)
+    for number in range(3):
+        first.write(record(number))
+    first.close()
+    assert segments(tmp_path) == [
+        "audit-20260301-000000.jsonl.zst", "audit-20260301-000001.jsonl.zst", "audit-20260301-000002.jsonl"
+    ]
+
+    # The active segment is continued; compressed ones are never reopened
+    second = make_writer(tmp_path, max_bytes=line_bytes, compress=True)
+    second.write(record(3))
+    second.close()
+
+    assert segments(tmp_path)[-2:] == ["audit-20260301-000002.jsonl.zst", "audit-20260301-000003.jsonl"]
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == [0, 1, 2, 3]
+
+
+def test_restart_compresses_segments_left_from_earlier_days(tmp_path, clock):
+    pytest.importorskip("zstandard")
+    first = make_writer(tmp_path)
+    first.write(record(0))
+    first.close()
+
+    clock.current = date(2026, 3, 5)
+    second = make_writer(tmp_path, compress=True)
+    second.write(record(1))
+    second.close()
+
+    assert segments(tmp_path) == ["audit-20260301-000000.jsonl.zst", "audit-20260305-000000.jsonl"]
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == [0, 1]
+
+
+def test_reader_spans_plain_and_compressed_segments(tmp_path, clock):
+    zstandard = pytest.importorskip("zstandard")
+    writer = make_writer(tmp_path, compress=True)
+    for day in (1, 2, 3):
+        clock.current = date(2026, 3, day)
+        writer.write(record(day))
+        writer.flush()
+    writer.close()
+
+    names = segments(tmp_path)
+    assert names == [
+        "audit-20260301-000000.jsonl.zst", "audit-20260302-000000.jsonl.zst", "audit-20260303-000000.jsonl"
+    ]
+    with open(tmp_path / names[0], "rb") as f:
+        assert b'"number":1' in zstandard.ZstdDecompressor().stream_reader(f).read()
+    assert writer.get_stats()["compressed"] == 2
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == [1, 2, 3]
+
+
+def test_reader_skips_partial_last_line(tmp_path, clock):
+    writer = make_writer(tmp_path)
+    writer.write(record(0))
+    writer.close()
+    with open(tmp_path / "audit-20260301-000000.jsonl", "ab") as f:
+        f.write(b'{"user_id":"us')
+
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == [0]
+
+
+def test_batch_durability_fsyncs_once_per_flush(tmp_path, clock, fsyncs):
+    writer = make_writer(tmp_path)
+    for number in range(10):
+        writer.write(record(number))
+    assert not os.path.exists(tmp_path / "audit-20260301-000000.jsonl")
+
+    writer.flush()
+
+    assert len(fsyncs) == 1
+    assert writer.get_stats()["written"] == 10
+    writer.close()
+
+
+def test_record_durability_fsyncs_each_record_before_returning(tmp_path, clock, fsyncs):
+    writer = make_writer(tmp_path, durability="record")
+    for number in range(3):
+        writer.write(record(number))
+        # Durable without any flush: readable from the file straight away
+        assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == list(range(number + 1))
+
+    assert len(fsyncs) == 3
+    writer.close()
+
+
+def test_background_thread_flushes(tmp_path, clock):
+    writer = make_writer(tmp_path, flush_interval=0.01)
+    writer.write(record(0))
+    for _ in range(200):
+        if writer.get_stats()["written"]:
+            break
+        time.sleep(0.01)
+
+    assert [entry["number"] for entry in iter_audit_records(str(tmp_path))] == [0]
+    writer.close()
+
+
+def test_rejects_unknown_durability(tmp_path):
+    with pytest.raises(ValueError):
+        AuditLogWriter(str(tmp_path), durability="never")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend is imported as the `app` package, as uvicorn does from the Backend directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Backend"))
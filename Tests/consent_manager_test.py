@@ -0,0 +1,77 @@
+import pytest
+from app.models.schemas import ConsentForm
+from app.utils.audit_log import AuditLogWriter
+from app.utils.consent_manager import ConsentManager
+from app.utils.consent_store import JSONConsentStore, SQLiteConsentStore
+from app.utils.consent_token import ConsentTokenSigner, InvalidConsentToken
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def manager(request, tmp_path):
+    if request.param == "json":
+        store = JSONConsentStore(str(tmp_path / "consents.json"))
+    else:
+        store = SQLiteConsentStore(str(tmp_path / "consents.db"))
+    audit_log = AuditLogWriter(str(tmp_path / "audit"))
+    yield ConsentManager(store=store, audit_log=audit_log, token_signer=ConsentTokenSigner(b"secret"))
+    audit_log.close()
+
+
+def consent_form(user_id="user_1", purpose="investigation"):
+    return ConsentForm(
+        user_id=user_id, full_name="Test User", email="test@example.com", purpose=purpose,
+        consent_types=["face_recognition"], agreed_to_terms=True
+    )
+
+
+def test_consent_ids_are_unique_per_consent(manager):
+    first = manager.validate_consent(consent_form(purpose="investigation"))
+    second = manager.validate_consent(consent_form(purpose="research"))
+
+    assert first["consent_id"] != second["consent_id"]
+
+
+def test_existing_consent_is_reused(manager):
+    first = manager.validate_consent(consent_form())
+    second = manager.validate_consent(consent_form())
+
+    assert second["message"] == "Valid consent already exists"
+    assert second["consent_id"] == first["consent_id"]
+
+
+def test_revoke_then_reconsent_same_day(manager):
+    first = manager.validate_consent(consent_form())
+    assert manager.revoke_consent("user_1", first["consent_id"])
+    with pytest.raises(InvalidConsentToken):
+        manager.verify_consent_token(first["consent_token"])
+    assert manager.get_active_consent("user_1", "investigation") is None
+
+    second = manager.validate_consent(consent_form())
+
+    assert second["consent_id"] != first["consent_id"]
+    assert manager.verify_consent_token(second["consent_token"]).consent_id == second["consent_id"]
+    assert manager.get_active_consent("user_1", "investigation")["consent_id"] == second["consent_id"]
+    assert manager.revoke_consent("user_1", second["consent_id"])
+    with pytest.raises(InvalidConsentToken):
+        manager.verify_consent_token(second["consent_token"])
+    revoked, _ = manager.store.revocations_since(0)
+    assert sorted(consent_id for consent_id, _ in revoked) == sorted([first["consent_id"], second["consent_id"]])
+
+
+def test_revoking_unknown_consent_fails(manager):
+    manager.validate_consent(consent_form())
+
+    assert not manager.revoke_consent("user_1", "missing")
+    assert not manager.revoke_consent("user_2", manager.get_active_consent("user_1", "investigation")["consent_id"])
+
+
+def test_revocation_reaches_other_workers_on_refresh(manager):
+    issued = manager.validate_consent(consent_form())
+    other = ConsentManager(store=manager.store, audit_log=manager.audit_log, token_signer=manager.token_signer)
+    assert other.verify_consent_token(issued["consent_token"]).user_id == "user_1"
+
+    manager.revoke_consent("user_1", issued["consent_id"])
+    assert other.refresh_revocations() == 1
+
+    with pytest.raises(InvalidConsentToken):
+        other.verify_consent_token(issued["consent_token"])
@@ -0,0 +1,47 @@
+from app.utils.face_tiling import plan_tiles
+
+
+def tile_sides(tiles):
+    return sorted({w for _, _, w, _ in tiles[1:]}, reverse=True)
+
+
+def test_small_image_gets_a_single_pass():
+    assert plan_tiles(480, 640, tile_size=600) == [(0, 0, 640, 480)]
+
+
+def test_full_frame_comes_first_then_coarse_to_fine():
+    tiles = plan_tiles(3000, 4000, tile_size=600, max_tiles=32)
+
+    assert tiles[0] == (0, 0, 4000, 3000)
+    sides = [w for _, _, w, _ in tiles[1:]]
+    assert sides == sorted(sides, reverse=True)
+    assert tile_sides(tiles) == [2000, 1000]
+
+
+def test_tiles_cover_the_image():
+    tiles = plan_tiles(3000, 4000, tile_size=600, max_tiles=32)
+
+    for side in tile_sides(tiles):
+        level = [tile for tile in tiles[1:] if tile[2] == side]
+        assert max(x + w for x, _, w, _ in level) == 4000
+        assert max(y + h for _, y, _, h in level) == 3000
+
+
+def test_budget_prefers_the_finest_level_that_fits():
+    # 8000x6000: 6 tiles at side 4000, 20 at 2000, far more at 1000 and 500
+    assert tile_sides(plan_tiles(6000, 8000, tile_size=600, max_tiles=32)) == [4000, 2000]
+    # Not enough room for both levels: the finer one wins over the coarser one
+    tiles = plan_tiles(6000, 8000, tile_size=600, max_tiles=24)
+    assert tile_sides(tiles) == [2000]
+    assert len(tiles) == 21
+
+
+def test_budget_is_respected():
+    for max_tiles in (1, 5, 16, 32, 100, 400):
+        assert len(plan_tiles(6000, 8000, tile_size=600, max_tiles=max_tiles)) <= max(max_tiles, 1)
+
+
+def test_large_budget_reaches_the_target_scale():
+    tiles = plan_tiles(6000, 8000, tile_size=600, max_tiles=1000)
+
+    assert tile_sides(tiles)[-1] == 500
@@ -0,0 +1,187 @@
+import asyncio
+import httpx
+import pytest
+from app.utils import http_client as http_client_module
+from app.utils.http_client import HTTPClient
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Delays the client backed off for, without actually sleeping"""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(http_client_module.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def mock_client(responses, **kwargs) -> HTTPClient:
+    """Client whose transport replies with each response (or raises each exception) in turn"""
+    responses = list(responses)
+
+    def handler(request):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return HTTPClient(transport=httpx.MockTransport(handler), **kwargs)
+
+
+class LocalServer:
+    """Minimal keep-alive HTTP/1.1 server counting connections and requests"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.mark.asyncio
+async def test_retries_retryable_status(sleeps):
+    client = mock_client([httpx.Response(503), httpx.Response(502), httpx.Response(200, text="ok")],
+                         max_retries=2, backoff_seconds=0.5)
+
+    response = await client.get("https://example.com/")
+
+    assert response.text == "ok"
+    assert len(sleeps) == 2
+    # Exponential backoff with jitter between half and the full step
+    assert 0.25 <= sleeps[0] <= 0.5 and 0.5 <= sleeps[1] <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(sleeps):
+    client = mock_client([httpx.Response(503)] * 3, max_retries=2)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get("https://example.com/")
+    assert len(sleeps) == 2
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors(sleeps):
+    client = mock_client([httpx.Response(404)], max_retries=2)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get("https://example.com/")
+    assert sleeps == []
+
+
+@pytest.mark.asyncio
+async def test_honours_retry_after(sleeps):
+    client = mock_client([httpx.Response(429, headers={"Retry-After": "3"}), httpx.Response(200)], timeout=10.0)
+
+    await client.get("https://example.com/")
+
+    assert sleeps == [3.0]
+
+
+@pytest.mark.asyncio
+async def test_caps_retry_after_at_timeout(sleeps):
+    client = mock_client([httpx.Response(429, headers={"Retry-After": "120"}), httpx.Response(200)], timeout=10.0)
+
+    await client.get("https://example.com/")
+
+    assert sleeps == [10.0]
+
+
+@pytest.mark.asyncio
+async def test_non_numeric_retry_after_falls_back_to_backoff(sleeps):
+    client = mock_client(
+        [httpx.Response(503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), httpx.Response(200)],
+        backoff_seconds=0.5
+    )
+
+    await client.get("https://example.com/")
+
+    assert 0.25 <= sleeps[0] <= 0.5
+
+
+@pytest.mark.asyncio
+async def test_retries_transport_errors(sleeps):
+    client = mock_client([httpx.ConnectError("refused"), httpx.ReadTimeout("slow"), httpx.Response(200)],
+                         max_retries=2)
+
+    response = await client.get("https://example.com/")
+
+    assert response.status_code == 200
+    assert len(sleeps) == 2
+
+
+@pytest.mark.asyncio
+async def test_raises_last_transport_error(sleeps):
+    client = mock_client([httpx.ConnectError("refused")] * 2, max_retries=1)
+
+    with pytest.raises(httpx.ConnectError):
+        await client.get("https://example.com/")
+
+
+@pytest.mark.asyncio
+async def test_read_timeout_against_slow_server():
+    async with LocalServer(delay=0.5) as server:
+        client = HTTPClient(timeout=0.1, max_retries=1, backoff_seconds=0.0)
+        with pytest.raises(httpx.ReadTimeout):
+            await client.get(server.url)
+        await client.aclose()
+
+    assert server.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_reuses_connections():
+    async with LocalServer() as server:
+        client = HTTPClient()
+        for _ in range(5):
+            await client.get(server.url)
+        await client.aclose()
+
+    assert server.requests == 5
+    assert server.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_bounds_concurrent_connections():
+    async with LocalServer(delay=0.05) as server:
+        client = HTTPClient(max_connections=2)
+        await asyncio.gather(*(client.get(server.url) for _ in range(10)))
+        await client.aclose()
+
+    assert server.requests == 10
+    assert server.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_recreates_client_after_close():
+    client = mock_client([httpx.Response(200), httpx.Response(200)])
+    await client.get("https://example.com/")
+    first = client.client
+    await client.aclose()
+
+    await client.get("https://example.com/")
+
+    assert client.client is not first
@@ -0,0 +1,212 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.models.schemas import GeolocationInfo, ImageAnalysis, JobInfo, MetadataInfo, OSINTResult
+from app.utils.image_context import ImageContext
+from app.utils.job_manager import JobManager
+from app.utils.job_store import InMemoryJobStore, SQLiteJobStore
+
+
+class FakeWorkflow:
+    """Stands in for OSINTWorkflow; each run waits for `release` unless it is already set"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.release = asyncio.Event()
+        self.release.set()
+        self.calls = []
+
+    async def run_analysis(self, image, **options):
+        self.calls.append(options)
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("analysis exploded")
+        return OSINTResult(
+            image_analysis=ImageAnalysis(), metadata=MetadataInfo(), geolocation=GeolocationInfo(),
+            processing_time=0.1, report_summary="report"
+        )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+async def wait_for_status(manager, job_id, status):
+    for _ in range(200):
+        job = await manager.get(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}, last {job.status}")
+
+
+@pytest.mark.asyncio
+async def test_submitted_job_completes(store):
+    manager = JobManager(FakeWorkflow(), store)
+
+    job = await manager.submit(ImageContext(b"image"), high_detail=True)
+    assert job.status == "queued"
+
+    finished = await manager.get(job.job_id, wait=5)
+    assert finished.status == "completed"
+    assert finished.result.report_summary == "report"
+    assert finished.started_at <= finished.finished_at
+    assert manager.workflow.calls[0]["high_detail"] is True
+    assert manager.get_stats()["completed"] == 1
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_analysis_marks_job_failed(store):
+    manager = JobManager(FakeWorkflow(fail=True), store)
+
+    job = await manager.submit(ImageContext(b"image"))
+
+    finished = await manager.get(job.job_id, wait=5)
+    assert finished.status == "failed"
+    assert finished.error == "analysis exploded"
+    assert finished.result is None
+    assert manager.get_stats()["failed"] == 1
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_long_poll_wakes_when_job_finishes(store):
+    workflow = FakeWorkflow()
+    workflow.release.clear()
+    manager = JobManager(workflow, store)
+    job = await manager.submit(ImageContext(b"image"))
+    await wait_for_status(manager, job.job_id, "running")
+
+    poll = asyncio.create_task(manager.get(job.job_id, wait=10))
+    await asyncio.sleep(0.05)
+    assert not poll.done()
+    workflow.release.set()
+
+    finished = await asyncio.wait_for(poll, timeout=2)
+    assert finished.status == "completed"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_long_poll_returns_current_state_on_timeout(store):
+    workflow = FakeWorkflow()
+    workflow.release.clear()
+    manager = JobManager(workflow, store)
+    job = await manager.submit(ImageContext(b"image"))
+
+    polled = await manager.get(job.job_id, wait=0.05)
+
+    assert polled.status in ("queued", "running")
+    assert await manager.get("missing", wait=0.05) is None
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions(store):
+    workflow = FakeWorkflow()
+    workflow.release.clear()
+    manager = JobManager(workflow, store, workers=1, queue_size=1)
+    running = await manager.submit(ImageContext(b"one"))
+    await wait_for_status(manager, running.job_id, "running")
+    queued = await manager.submit(ImageContext(b"two"))
+
+    with pytest.raises(asyncio.QueueFull):
+        await manager.submit(ImageContext(b"three"))
+
+    stats = manager.get_stats()
+    assert (stats["queued"], stats["running"], stats["rejected"]) == (1, 1, 1)
+    workflow.release.set()
+    assert (await manager.get(queued.job_id, wait=5)).status == "completed"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_expired_jobs_are_deleted(store):
+    manager = JobManager(FakeWorkflow(), store, retention_seconds=0)
+    job = await manager.submit(ImageContext(b"image"))
+    await manager.get(job.job_id, wait=5)
+
+    assert await manager.delete_expired() == 1
+    assert await manager.get(job.job_id) is None
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_face_jobs_expire_with_their_consent(store):
+    manager = JobManager(FakeWorkflow(), store, retention_seconds=3600)
+    consent_expires_at = datetime.now() + timedelta(minutes=5)
+
+    with_faces = await manager.submit(ImageContext(b"a"), enable_face_recognition=True,
+                                      consent_expires_at=consent_expires_at, consent_id="c1")
+    without_faces = await manager.submit(ImageContext(b"b"), consent_expires_at=consent_expires_at)
+
+    assert with_faces.expires_at == consent_expires_at
+    assert without_faces.expires_at > consent_expires_at + timedelta(minutes=50)
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_revoked_consent_deletes_its_jobs(store):
+    manager = JobManager(FakeWorkflow(), store)
+    revoked = await manager.submit(ImageContext(b"a"), enable_face_recognition=True, consent_id="c1")
+    other = await manager.submit(ImageContext(b"b"), enable_face_recognition=True, consent_id="c2")
+    await manager.get(revoked.job_id, wait=5)
+    await manager.get(other.job_id, wait=5)
+
+    assert await manager.delete_consent("c1") == 1
+
+    assert await manager.get(revoked.job_id) is None
+    assert (await manager.get(other.job_id)).status == "completed"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_running_during_revoke_never_stores_its_result(store):
+    workflow = FakeWorkflow()
+    workflow.release.clear()
+    manager = JobManager(workflow, store)
+    job = await manager.submit(ImageContext(b"a"), enable_face_recognition=True, consent_id="c1")
+    await wait_for_status(manager, job.job_id, "running")
+
+    await manager.delete_consent("c1")
+    workflow.release.set()
+    for _ in range(200):
+        if manager.get_stats()["completed"] == 1:
+            break
+        await asyncio.sleep(0.01)
+
+    assert manager.get_stats()["completed"] == 1
+    assert await manager.get(job.job_id) is None
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_jobs_are_failed_at_startup(store):
+    now = datetime.now()
+    store.create(JobInfo(job_id="queued", status="queued", created_at=now))
+    store.create(JobInfo(job_id="running", status="running", created_at=now, started_at=now))
+    store.create(JobInfo(job_id="done", status="completed", created_at=now, finished_at=now))
+    manager = JobManager(FakeWorkflow(), store)
+
+    assert await manager.fail_interrupted() == 2
+
+    for job_id in ("queued", "running"):
+        job = store.get(job_id)
+        assert job.status == "failed" and "restart" in job.error
+    assert store.get("done").status == "completed"
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job = JobInfo(job_id="a", status="queued", created_at=datetime.now())
+    SQLiteJobStore(path).create(job, consent_id="c1")
+
+    reopened = SQLiteJobStore(path)
+    reopened.update("a", status="completed", finished_at=datetime.now())
+
+    assert reopened.get("a").status == "completed"
+    assert reopened.delete_consent("c1") == 1
@@ -0,0 +1,96 @@
+import json
+from app.utils.llm_cache import LLMResponseCache
+
+
+def key(name, prompt_version="1"):
+    return LLMResponseCache.make_key("image_analyzer", "gemini", prompt_version, name)
+
+
+def size_of(value):
+    return len(json.dumps(value, default=str))
+
+
+def test_hit_returns_stored_value():
+    cache = LLMResponseCache()
+    cache.put(key("a"), {"objects_detected": ["car"]})
+
+    assert cache.get(key("a")) == {"objects_detected": ["car"]}
+    assert cache.get(key("b")) is None
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used_over_entry_limit():
+    cache = LLMResponseCache(max_entries=2)
+    cache.put(key("a"), 1)
+    cache.put(key("b"), 2)
+    cache.get(key("a"))
+    cache.put(key("c"), 3)
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == 1
+    assert cache.get(key("c")) == 3
+    assert cache.get_stats()["entries"] == 2
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_evicts_least_recently_used_over_byte_limit():
+    value = {"text": "x" * 100}
+    cache = LLMResponseCache(max_bytes=size_of(value) * 2)
+    cache.put(key("a"), value)
+    cache.put(key("b"), value)
+    cache.get(key("a"))
+    cache.put(key("c"), value)
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == value
+    assert cache.get_stats()["bytes"] == size_of(value) * 2
+
+
+def test_large_value_evicts_several_entries():
+    small, large = {"text": "x"}, {"text": "x" * 100}
+    cache = LLMResponseCache(max_bytes=size_of(large) + size_of(small))
+    for name in "abc":
+        cache.put(key(name), small)
+    cache.put(key("large"), large)
+
+    assert [cache.get(key(name)) for name in "abc"] == [None, None, small]
+    assert cache.get_stats()["evictions"] == 2
+    assert cache.get_stats()["bytes"] == size_of(large) + size_of(small)
+
+
+def test_value_over_byte_limit_is_not_cached():
+    cache = LLMResponseCache(max_bytes=10)
+    cache.put(key("a"), {"text": "x" * 100})
+
+    assert cache.get(key("a")) is None
+    assert cache.get_stats()["bytes"] == 0
+
+
+def test_replacing_entry_updates_byte_count():
+    cache = LLMResponseCache()
+    cache.put(key("a"), {"text": "x" * 100})
+    cache.put(key("a"), {"text": "x"})
+
+    assert cache.get_stats()["entries"] == 1
+    assert cache.get_stats()["bytes"] == size_of({"text": "x"})
+
+
+def test_returned_values_are_isolated_copies():
+    cache = LLMResponseCache()
+    stored = {"objects_detected": ["car"], "colors": {"dominant": "red"}}
+    cache.put(key("a"), stored)
+    stored["objects_detected"].append("put-side change")
+
+    first = cache.get(key("a"))
+    first["objects_detected"].append("tree")
+    first["colors"]["dominant"] = "blue"
+
+    assert cache.get(key("a")) == {"objects_detected": ["car"], "colors": {"dominant": "red"}}
+
+
+def test_prompt_version_bump_misses_old_entries():
+    cache = LLMResponseCache()
+    cache.put(key("a", prompt_version="1"), 1)
+
+    assert cache.get(key("a", prompt_version="2")) is None
@@ -0,0 +1,151 @@
+from math import comb
+import numpy as np
+import pytest
+from PIL import Image
+from app.utils.perceptual_hash import (
+    CHUNKS, CHUNK_BITS, HASH_BITS, PerceptualHashIndex, _probe_masks, compute_hashes
+)
+
+RADII = [0, 3, 4, 7, 10, 15, 31, 32]
+
+
+def random_hashes(rng, count):
+    return rng.integers(0, 1 << 63, size=count, dtype=np.uint64) * np.uint64(2) + rng.integers(0, 2, size=count, dtype=np.uint64)
+
+
+def flip_bits(rng, value, count):
+    for bit in rng.choice(HASH_BITS, size=count, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+
+def brute_force(phashes, query, radius):
+    distances = [bin(int(value) ^ query).count("1") for value in phashes]
+    return {f"img_{row}" for row, distance in enumerate(distances) if distance <= radius}
+
+
+def found(index, query, radius):
+    return {match.digest for match in index.search(query, 0, max_distance=radius, limit=len(index))}
+
+
+def neighbourhood(rng, queries, per_query=20):
+    # Uniform random hashes sit ~32 bits apart, so plant entries at every distance around each query
+    return [flip_bits(rng, query, int(rng.integers(0, 20))) for query in queries for _ in range(per_query)]
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 3])
+def test_probe_masks_enumerate_every_substring_within_radius(radius):
+    masks = _probe_masks(radius)
+
+    assert len(masks) == sum(comb(CHUNK_BITS, r) for r in range(radius + 1))
+    assert len(set(masks.tolist())) == len(masks)
+    assert all(0 <= mask < 1 << CHUNK_BITS for mask in masks.tolist())
+    assert max(bin(mask).count("1") for mask in masks.tolist()) == radius
+
+
+def test_bucket_gather_matches_naive_bucket_scan():
+    rng = np.random.default_rng(1)
+    # Few distinct substring values, so buckets hold many rows each
+    phashes = rng.integers(0, 4, size=(3000, CHUNKS), dtype=np.uint64)
+    phashes = sum(phashes[:, chunk] << np.uint64(chunk * CHUNK_BITS) for chunk in range(CHUNKS))
+    index = PerceptualHashIndex()
+    index.add_many([f"img_{row}" for row in range(len(phashes))], phashes, phashes)
+
+    for query in [0, 1, 0x0003_0002_0001_0000, int(phashes[7])]:
+        for radius in (0, 4, 8):
+            masks = _probe_masks(radius // CHUNKS).tolist()
+            expected = {
+                row for row, value in enumerate(phashes.tolist())
+                for chunk in range(CHUNKS)
+                if ((value ^ query) >> (chunk * CHUNK_BITS)) & 0xFFFF in masks
+            }
+            assert set(index._candidates(query, radius).tolist()) == expected
+
+
+@pytest.mark.parametrize("radius", RADII)
+def test_search_matches_brute_force(radius):
+    rng = np.random.default_rng(radius)
+    queries = [int(value) for value in random_hashes(rng, 10)]
+    phashes = np.concatenate([random_hashes(rng, 2000), np.array(neighbourhood(rng, queries), dtype=np.uint64)])
+    index = PerceptualHashIndex()
+    index.add_many([f"img_{row}" for row in range(len(phashes))], phashes, phashes)
+
+    for query in queries:
+        assert found(index, query, radius) == brute_force(phashes, query, radius)
+
+
+def test_search_covers_pending_entries_before_and_after_rebuild():
+    rng = np.random.default_rng(7)
+    queries = [int(value) for value in random_hashes(rng, 5)]
+    phashes = [int(value) for value in random_hashes(rng, 1000)] + neighbourhood(rng, queries)
+    index = PerceptualHashIndex()
+    index.add_many([f"img_{row}" for row in range(len(phashes))], np.array(phashes, dtype=np.uint64),
+                   np.array(phashes, dtype=np.uint64))
+
+    # Stop one short of the 4096-entry rebuild so the new entries are only in the pending buffer
+    extra = neighbourhood(rng, queries, per_query=(index.pending_limit - 1) // len(queries))
+    extra += [int(value) for value in random_hashes(rng, index.pending_limit - 1 - len(extra))]
+    for row, value in enumerate(extra, len(phashes)):
+        assert index.add(f"img_{row}", value, value)
+    phashes += extra
+    assert index._indexed == len(phashes) - (index.pending_limit - 1)
+    for query in queries:
+        for radius in RADII:
+            assert found(index, query, radius) == brute_force(phashes, query, radius)
+
+    index.add(f"img_{len(phashes)}", queries[0], queries[0])
+    phashes.append(queries[0])
+    assert index._indexed == len(phashes)
+    for query in queries:
+        for radius in RADII:
+            assert found(index, query, radius) == brute_force(phashes, query, radius)
+
+
+def test_search_orders_by_phash_then_dhash_distance():
+    index = PerceptualHashIndex()
+    index.add("far", 0b111, 0)
+    index.add("near_dhash_far", 0b1, 0b11)
+    index.add("near", 0b1, 0b1)
+    index.add("exact", 0, 0b1111)
+
+    matches = index.search(0, 0, max_distance=3)
+
+    assert [match.digest for match in matches] == ["exact", "near", "near_dhash_far", "far"]
+    assert [match.phash_distance for match in matches] == [0, 1, 1, 3]
+    assert [match.digest for match in index.search(0, 0, max_distance=3, limit=2)] == ["exact", "near"]
+
+
+def test_duplicate_digest_is_not_added_twice():
+    index = PerceptualHashIndex()
+
+    assert index.add("img", 1, 1)
+    assert not index.add("img", 2, 2)
+    assert len(index) == 1
+
+
+def test_index_reloads_from_sqlite(tmp_path):
+    db_path = str(tmp_path / "phash.db")
+    # Top bit set: stored as a negative SQLite integer
+    high = (1 << 63) | 0b1011
+    index = PerceptualHashIndex(db_path)
+    index.add("high", high, high, first_seen=100.0)
+    index.add("low", 0b1011, 0, first_seen=200.0)
+
+    reloaded = PerceptualHashIndex(db_path)
+
+    assert len(reloaded) == 2
+    matches = reloaded.search(high, high, max_distance=0)
+    assert [(match.digest, match.dhash_distance, match.first_seen) for match in matches] == [("high", 0, 100.0)]
+    assert [match.digest for match in reloaded.search(0b1011, 0, max_distance=1)] == ["low", "high"]
+
+
+def test_near_duplicate_images_hash_close():
+    blocks = np.random.default_rng(3).integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+    image = Image.fromarray(blocks, "RGB").resize((256, 256), Image.Resampling.BILINEAR)
+    resized = image.resize((200, 180))
+
+    original_phash, original_dhash = compute_hashes(image)
+    resized_phash, resized_dhash = compute_hashes(resized)
+
+    assert bin(original_phash ^ resized_phash).count("1") <= 6
+    assert bin(original_dhash ^ resized_dhash).count("1") <= 6
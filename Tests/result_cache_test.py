@@ -0,0 +1,48 @@
+import pytest
+from app.models.schemas import GeolocationInfo, ImageAnalysis, MetadataInfo, OSINTResult
+from app.utils.result_cache import ResultCache
+
+
+def make_result(faces=0):
+    return OSINTResult(
+        image_analysis=ImageAnalysis(faces_count=faces), metadata=MetadataInfo(),
+        geolocation=GeolocationInfo(), processing_time=1.0, report_summary="report"
+    )
+
+
+@pytest.fixture(params=[False, True], ids=["memory", "disk"])
+def cache(request, tmp_path):
+    return ResultCache(cache_dir=str(tmp_path) if request.param else None)
+
+
+def test_face_results_are_keyed_by_consent():
+    first = ResultCache.make_key("abc", True, "1", consent_id="c1")
+    second = ResultCache.make_key("abc", True, "1", consent_id="c2")
+
+    assert first != second
+    assert ResultCache.make_key("abc", False, "1", consent_id="c1") == ResultCache.make_key("abc", False, "1")
+
+
+def test_invalidate_consent_drops_only_its_entries(cache):
+    revoked = ResultCache.make_key("abc", True, "1", consent_id="c1")
+    revoked_hd = ResultCache.make_key("def", True, "1", high_detail=True, consent_id="c1")
+    other = ResultCache.make_key("abc", True, "1", consent_id="c2")
+    without_faces = ResultCache.make_key("abc", False, "1")
+    for key in (revoked, revoked_hd, other, without_faces):
+        cache.put(key, make_result())
+
+    assert cache.invalidate_consent("c1") == 2
+
+    assert cache.get(revoked) is None
+    assert cache.get(revoked_hd) is None
+    assert cache.get(other) is not None
+    assert cache.get(without_faces) is not None
+
+
+def test_invalidate_consent_reaches_disk_tier(tmp_path):
+    key = ResultCache.make_key("abc", True, "1", consent_id="c1")
+    ResultCache(cache_dir=str(tmp_path)).put(key, make_result(faces=1))
+    # Another worker sharing the directory revokes the consent
+    ResultCache(cache_dir=str(tmp_path)).invalidate_consent("c1")
+
+    assert ResultCache(cache_dir=str(tmp_path)).get(key) is None
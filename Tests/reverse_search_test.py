@@ -0,0 +1,116 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.agents.reverse_search import ReverseSearchAgent
+from app.agents.search_engines import create_engines
+from app.config.settings import settings
+from app.utils.http_client import HTTPClient
+from app.utils.image_context import ImageContext
+
+
+@pytest.fixture(autouse=True)
+def search_settings(monkeypatch):
+    monkeypatch.setattr(settings, "IMGBB_BASE_URL", "https://imgbb.test")
+    monkeypatch.setattr(settings, "SERPER_BASE_URL", "https://serper.test")
+    monkeypatch.setattr(settings, "SERPAPI_BASE_URL", "https://serpapi.test")
+    monkeypatch.setattr(settings, "IMG_BB_API_KEY", "imgbb-key")
+    monkeypatch.setattr(settings, "SERPER_API_KEY", "serper-key")
+    monkeypatch.setattr(settings, "SERPAPI_API_KEY", "serpapi-key")
+    monkeypatch.setattr(settings, "REVERSE_SEARCH_ENGINE_TIMEOUT_SECONDS", 0.5)
+
+
+def make_agent(handler) -> ReverseSearchAgent:
+    http_client = HTTPClient(transport=httpx.MockTransport(handler), backoff_seconds=0.0)
+    return ReverseSearchAgent(http_client, create_engines(["google", "yandex"], http_client))
+
+
+def lens_response():
+    return httpx.Response(200, json={"organic": [
+        {"link": "https://example.com/a", "title": "A", "source": "Example"},
+        {"link": "https://news.test/b", "title": "B"}
+    ]})
+
+
+def yandex_response():
+    return httpx.Response(200, json={"image_results": [{"link": "https://example.com/a/", "title": "A"}]})
+
+
+@pytest.mark.asyncio
+async def test_searches_every_engine_through_the_shared_client():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.host == "imgbb.test":
+            return httpx.Response(200, json={"data": {"url": "https://i.imgbb.test/image.jpg"}})
+        if request.url.host == "serper.test":
+            assert request.headers["X-API-KEY"] == "serper-key"
+            assert json.loads(request.content) == {"url": "https://i.imgbb.test/image.jpg"}
+            return lens_response()
+        assert request.url.params["engine"] == "yandex_images"
+        return yandex_response()
+
+    results, stats = await make_agent(handler).search_with_stats(ImageContext(b"image bytes"))
+
+    assert [result["url"] for result in results] == ["https://example.com/a", "https://news.test/b"]
+    assert {name: engine["status"] for name, engine in stats["engines"].items()} == {"google": "ok", "yandex": "ok"}
+    assert [request.url.host for request in requests].count("imgbb.test") == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_retries_transient_failures():
+    attempts = {"serper.test": 0}
+
+    def handler(request):
+        if request.url.host == "imgbb.test":
+            return httpx.Response(200, json={"data": {"url": "https://i.imgbb.test/image.jpg"}})
+        if request.url.host == "serper.test":
+            attempts["serper.test"] += 1
+            if attempts["serper.test"] == 1:
+                return httpx.Response(503)
+            return lens_response()
+        raise httpx.ConnectError("refused")
+
+    results, stats = await make_agent(handler).search_with_stats(ImageContext(b"image bytes"))
+
+    assert attempts["serper.test"] == 2
+    assert len(results) == 2
+    assert stats["failed_engines"] == ["yandex"]
+
+
+@pytest.mark.asyncio
+async def test_slow_engine_misses_its_deadline():
+    async def handler(request):
+        if request.url.host == "imgbb.test":
+            return httpx.Response(200, json={"data": {"url": "https://i.imgbb.test/image.jpg"}})
+        if request.url.host == "serpapi.test":
+            await asyncio.sleep(5)
+        return lens_response() if request.url.host == "serper.test" else yandex_response()
+
+    results, stats = await make_agent(handler).search_with_stats(ImageContext(b"image bytes"))
+
+    assert stats["late_engines"] == ["yandex"]
+    assert stats["engines"]["yandex"]["latency_ms"] < 2000
+    assert len(results) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", [httpx.Response(401), httpx.Response(500), httpx.ConnectError("refused")],
+                         ids=["401", "500", "connect-error"])
+async def test_engine_failures_never_log_api_keys(failure, caplog):
+    def handler(request):
+        if request.url.host == "imgbb.test":
+            return httpx.Response(200, json={"data": {"url": "https://i.imgbb.test/image.jpg"}})
+        if request.url.host == "serpapi.test":
+            if isinstance(failure, Exception):
+                raise failure
+            return failure
+        return lens_response()
+
+    with caplog.at_level("INFO"):
+        _, stats = await make_agent(handler).search_with_stats(ImageContext(b"image bytes"))
+
+    assert stats["failed_engines"] == ["yandex"]
+    assert "serpapi-key" not in caplog.text
+    assert "Reverse search engine yandex failed" in caplog.text
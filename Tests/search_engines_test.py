@@ -0,0 +1,172 @@
+import asyncio
+import httpx
+import pytest
+from app.agents import search_engines
+from app.agents.reverse_search import ENGINE_HIT_WEIGHT, ReverseSearchAgent
+from app.agents.search_engines import ImageHost, SearchEngine, create_engines, register_engine
+from app.config.settings import settings
+from app.utils.http_client import HTTPClient
+from app.utils.image_context import ImageContext
+
+
+class StubEngine(SearchEngine):
+    """Engine returning fixed hits, configured unless told otherwise"""
+    hits = []
+    configured = True
+
+    def is_configured(self) -> bool:
+        return self.configured
+
+    async def search(self, image: ImageContext):
+        return list(self.hits)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A registry holding only the stub engines registered by the test"""
+    monkeypatch.setattr(search_engines, "ENGINE_REGISTRY", {})
+    return search_engines.ENGINE_REGISTRY
+
+
+def stub_engine(name, hits=(), configured=True):
+    return register_engine(name)(type(f"Stub_{name}", (StubEngine,), {"hits": list(hits), "configured": configured}))
+
+
+def hit(url, title=None, source=None):
+    return {"url": url, "title": title, "source": source}
+
+
+def test_register_engine_names_and_registers(registry):
+    engine_class = stub_engine("stub")
+
+    assert registry == {"stub": engine_class}
+    assert engine_class.name == "stub"
+
+
+def test_create_engines_skips_unknown_and_unconfigured(registry):
+    stub_engine("first")
+    stub_engine("unconfigured", configured=False)
+    stub_engine("second")
+
+    engines = create_engines(["second", "missing", "unconfigured", "first"], HTTPClient())
+
+    assert [engine.name for engine in engines] == ["second", "first"]
+    # Engines built together share one image host, and so one upload per image
+    assert engines[0].image_host is engines[1].image_host
+
+
+def test_builtin_engines_need_their_api_keys(monkeypatch):
+    monkeypatch.setattr(settings, "SERPER_API_KEY", "key")
+    monkeypatch.setattr(settings, "SERPAPI_API_KEY", None)
+
+    assert [engine.name for engine in create_engines(["google", "yandex"], HTTPClient())] == ["google"]
+
+
+@pytest.mark.asyncio
+async def test_agent_merges_stub_engines(registry):
+    stub_engine("first", [hit("https://example.com/a", "A"), hit("https://example.com/b")])
+    stub_engine("second", [hit("https://www.example.com/a/"), hit("https://example.com/c", "C")])
+    http_client = HTTPClient()
+    agent = ReverseSearchAgent(http_client, create_engines(["first", "second"], http_client))
+
+    results, stats = await agent.search_with_stats(ImageContext(b"image bytes"))
+
+    assert [result["url"] for result in results] == [
+        "https://example.com/a", "https://example.com/b", "https://example.com/c"
+    ]
+    assert results[0]["engines"] == ["first", "second"]
+    assert stats["engines"]["first"]["status"] == "ok"
+    assert stats["engines"]["second"]["results"] == 2
+
+
+def test_merge_deduplicates_normalized_urls():
+    agent = ReverseSearchAgent(HTTPClient(), engines=[])
+
+    results = agent._merge_results({
+        "first": [hit("https://www.Example.com/page/?utm_source=x&b=2&a=1", source="Example")],
+        "second": [hit("http://example.com/page?a=1&b=2&fbclid=y", "Page"), hit(None, "no url")]
+    })
+
+    assert len(results) == 1
+    assert results[0]["url"] == "https://www.Example.com/page/?utm_source=x&b=2&a=1"
+    assert results[0]["source"] == "Example"
+    assert results[0]["title"] == "Page"
+    assert results[0]["engines"] == ["first", "second"]
+
+
+def test_merge_scores_by_rank_and_engine_agreement():
+    agent = ReverseSearchAgent(HTTPClient(), engines=[])
+
+    results = agent._merge_results({
+        "first": [hit("https://a.test/"), hit("https://b.test/"), hit("https://a.test/")],
+        "second": [hit("https://a.test/")]
+    })
+    scores = {result["url"]: result["similarity_score"] for result in results}
+
+    # A repeated hit from the same engine is not counted twice
+    assert scores["https://a.test/"] == round(1 - (1 - ENGINE_HIT_WEIGHT) ** 2, 4)
+    assert scores["https://b.test/"] == round(ENGINE_HIT_WEIGHT / (1 + 1 / 5), 4)
+    assert [result["url"] for result in results] == ["https://a.test/", "https://b.test/"]
+
+
+def image_host(handler, **kwargs) -> ImageHost:
+    return ImageHost(HTTPClient(transport=httpx.MockTransport(handler), backoff_seconds=0.0), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_image_host_shares_one_upload_per_image():
+    uploads = []
+
+    async def handler(request):
+        uploads.append(request)
+        number = len(uploads)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"data": {"url": f"https://i.imgbb.test/{number}.jpg"}})
+
+    host = image_host(handler)
+    first, second = ImageContext(b"first image"), ImageContext(b"second image")
+
+    urls = await asyncio.gather(host.url_for(first), host.url_for(first), host.url_for(second))
+
+    assert urls[0] == urls[1] != urls[2]
+    assert len(uploads) == 2
+    assert b"first image" in uploads[0].content
+    assert await host.url_for(first) == urls[0]
+    assert len(uploads) == 2
+
+
+@pytest.mark.asyncio
+async def test_image_host_retries_failed_upload_on_next_request():
+    responses = [httpx.Response(200, json={"data": {}}), httpx.Response(200, json={"data": {"url": "https://i/1"}})]
+    host = image_host(lambda request: responses.pop(0))
+    image = ImageContext(b"image bytes")
+
+    with pytest.raises(ValueError):
+        await host.url_for(image)
+
+    assert await host.url_for(image) == "https://i/1"
+
+
+@pytest.mark.asyncio
+async def test_image_host_upload_survives_a_cancelled_caller():
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"data": {"url": "https://i/1"}})
+
+    host = image_host(handler)
+    image = ImageContext(b"image bytes")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(host.url_for(image), timeout=0.01)
+
+    assert await host.url_for(image) == "https://i/1"
+
+
+@pytest.mark.asyncio
+async def test_image_host_forgets_oldest_uploads():
+    host = image_host(lambda request: httpx.Response(200, json={"data": {"url": "https://i/1"}}), max_entries=2)
+
+    for data in (b"one", b"two", b"three"):
+        await host.url_for(ImageContext(data))
+
+    assert list(host._uploads) == [ImageContext(b"two").digest, ImageContext(b"three").digest]
@@ -3,17 +3,19 @@ import { Container, Typography, Paper, Box, Grid } from '@mui/material';
 import ImageUpload from './components/ImageUpload';
 import AnalysisResults from './components/AnalysisResults';
 import FaceRecognitionResults from './components/FaceRecognitionResults';
-import { analyzeImage } from './services/api';
+import { analyzeImage, anonymizeImage } from './services/api';
 
 function App() {
   const [loading, setLoading] = useState(false);
   const [results, setResults] = useState(null);
   const [error, setError] = useState(null);
+  const [uploadedFile, setUploadedFile] = useState(null);
 
   const handleImageUpload = async (file, options = {}) => {
     setLoading(true);
     setError(null);
     setResults(null);
+    setUploadedFile(file);
 
     try {
       const analysisResults = await analyzeImage(file, options);
@@ -26,7 +28,19 @@ function App() {
   };
 
   const handleAnonymization = async () => {
-    console.log('Generating anonymized version...');
+    if (!uploadedFile) return;
+    try {
+      // Face boxes from the analysis are reused server-side, so this is quick
+      const blob = await anonymizeImage(uploadedFile);
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `anonymized-${uploadedFile.name.replace(/\.[^.]+$/, '')}.jpg`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      setError(err.message);
+    }
   };
 
   return (
@@ -4,7 +4,7 @@ const API_BASE_URL = 'http://localhost:8000';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
-  timeout: 300000, // 5 minutes for image analysis
+  timeout: 60000, // Analyses run as background jobs, so no request waits for the whole pipeline
 });
 
 // Request interceptor for logging
@@ -45,8 +45,13 @@ export const analyzeImage = async (file, options = {}) => {
     formData.append('user_id', options.userId);
   }
 
+  // Signed token from validateConsent; lets the server check consent without a lookup
+  if (options.consentToken) {
+    formData.append('consent_token', options.consentToken);
+  }
+
   try {
-    const response = await api.post('/api/analyze-image', formData, {
+    const response = await api.post('/api/jobs', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
@@ -57,15 +62,52 @@ export const analyzeImage = async (file, options = {}) => {
         console.log(`Upload Progress: ${percentCompleted}%`);
       },
     });
-    return response.data;
+    return await waitForJob(response.data.job_id);
   } catch (error) {
     if (error.response) {
       throw new Error(error.response.data.detail || 'Analysis failed');
     } else if (error.request) {
       throw new Error('No response from server. Please check your connection.');
     } else {
-      throw new Error('Request failed');
+      throw new Error(error.message || 'Request failed');
+    }
+  }
+};
+
+// Long-poll a background analysis job until it completes
+const JOB_POLL_WAIT_SECONDS = 25;
+
+const waitForJob = async (jobId) => {
+  for (;;) {
+    const response = await api.get(`/api/jobs/${jobId}`, {
+      params: { wait: JOB_POLL_WAIT_SECONDS },
+    });
+    const job = response.data;
+    if (job.status === 'completed') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Analysis failed');
+    }
+  }
+};
+
+export const anonymizeImage = async (file, mode = 'blur') => {
+  const formData = new FormData();
+  formData.append('file', file);
+  formData.append('mode', mode);
+
+  try {
+    const response = await api.post('/api/anonymize', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+      responseType: 'blob',
+    });
+    return response.data;
+  } catch (error) {
+    if (error.response) {
+      throw new Error('Anonymization failed');
     }
+    throw new Error('Anonymization request failed');
   }
 };
 